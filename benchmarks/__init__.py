@@ -0,0 +1,9 @@
+"""
+Benchmarks for document_merger. Run them from the repository root as modules, e.g. python -m benchmarks.suite, so that
+they import the package from src rather than an installed copy.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
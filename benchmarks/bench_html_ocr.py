@@ -0,0 +1,84 @@
+"""
+Benchmarks the OCR annotation pass of Converter.ocr_html on HTML documents with many large inline base64 images.
+
+Every image is pre-populated in ocr_map, so tesseract is never run and only the cost of scanning the document and
+inserting the OCR text is measured. If the annotation pass is linear, the time per MB stays roughly constant as the
+number of images grows.
+
+Usage: python -m benchmarks.bench_html_ocr [--images 50 100 200 400] [--image-kb 1024] [--legacy]
+"""
+
+import re
+import time
+import argparse
+import tempfile
+
+from . import corpus
+
+
+def make_html(converter, image_count, image_kb):
+    """Returns an HTML document with image_count unique inline images of roughly image_kb kilobytes each"""
+    base64_images = corpus.make_large_base64_images(image_count, image_kb)
+    for i, b64_img in enumerate(base64_images):
+        # every image is already in ocr_map, so tesseract is never run
+        converter.ocr_map[converter.hash_base64_image(b64_img)] = {
+            "text": f"text of image {i}",
+            "ignore": False,
+            "seen": False,
+        }
+    return corpus.make_html(base64_images)
+
+
+def legacy_ocr_html(converter, html_text):
+    """The previous annotation pass, which rescanned and rebuilt the document for every image"""
+    base64_image_regex = r"\".*?base64, ?([^\"]*)\"[^>]*>"
+    base64_images = re.findall(base64_image_regex, html_text)
+    for i, b64_img in enumerate(base64_images):
+        ocr_text = converter.ocr_map[converter.hash_base64_image(b64_img)]["text"]
+        base64_image_end_indexes = list(
+            m.end(0) for m in re.finditer(base64_image_regex, html_text)
+        )
+        html_text = (
+            html_text[: base64_image_end_indexes[i]]
+            + " OCR text: '"
+            + ocr_text
+            + "'"
+            + html_text[base64_image_end_indexes[i] :]
+        )
+    return html_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--images", type=int, nargs="+", default=[50, 100, 200, 400])
+    parser.add_argument("--image-kb", type=int, default=1024)
+    parser.add_argument(
+        "--legacy", action="store_true", help="also time the previous implementation"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        converter = corpus.make_converter(temp_dir)
+
+        print(f"{'images':>8} | {'size (MB)':>10} | {'time (s)':>9} | {'s/MB':>7}")
+        for image_count in args.images:
+            html_text = make_html(converter, image_count, args.image_kb)
+            size_mb = len(html_text) / 1024 / 1024
+
+            implementations = [("ocr_html", converter.ocr_html)]
+            if args.legacy:
+                implementations.append(
+                    ("legacy", lambda text: legacy_ocr_html(converter, text))
+                )
+
+            for name, implementation in implementations:
+                start_time = time.perf_counter()
+                implementation(html_text)
+                elapsed = time.perf_counter() - start_time
+                print(
+                    f"{image_count:>8} | {size_mb:>10.1f} | {elapsed:>9.3f} | {elapsed / size_mb:>7.4f} {name}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmarks OCRPreprocessor against OCR of the unprocessed image.
+
+The corpus is generated 4K slide renders (a title and bullet points on a coloured slide with a wide border) or the
+images in --corpus. Each image is OCR'd as is and after preprocessing. The report gives the time spent on each
+preprocessing step, the OCR latency of both, and the similarity of the preprocessed OCR text to the baseline OCR text
+(and to the rendered text for generated images), so the steps and sizes can be tuned without losing recognition quality.
+Without --tesseract only the preprocessing is timed.
+
+Usage: python -m benchmarks.bench_ocr_preprocessing [--count 10] [--corpus DIR] [--tesseract PATH]
+    [--steps grayscale downscale binarize crop] [--max-size 2000]
+"""
+
+import os
+import re
+import time
+import random
+import difflib
+import argparse
+from collections import Counter
+
+from PIL import Image
+import pytesseract
+
+from document_merger.OCRPreprocessor import OCRPreprocessor
+
+from .corpus import make_slide
+
+
+def normalise(text):
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def similarity(a, b):
+    return difflib.SequenceMatcher(None, normalise(a), normalise(b)).ratio()
+
+
+def load_corpus(args):
+    if args.corpus:
+        corpus = []
+        for file in sorted(os.listdir(args.corpus)):
+            with Image.open(os.path.join(args.corpus, file)) as img:
+                img.load()
+                corpus.append((img, None))
+        return corpus
+    rng = random.Random(args.seed)
+    return [make_slide(rng) for _ in range(args.count)]
+
+
+def timed_ocr(img):
+    start_time = time.perf_counter()
+    text = pytesseract.image_to_string(img)
+    return text, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--count", type=int, default=10, help="generated slides")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", help="directory of images")
+    parser.add_argument("--tesseract", help="location of the tesseract executable")
+    parser.add_argument("--steps", nargs="+", default=list(OCRPreprocessor.all_steps))
+    parser.add_argument("--max-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    preprocessor = OCRPreprocessor(steps=args.steps, max_size=args.max_size)
+    if args.tesseract:
+        pytesseract.pytesseract.tesseract_cmd = args.tesseract
+
+    step_times = Counter()
+    baseline_time = 0
+    processed_time = 0
+    baseline_similarity = []
+    truth_similarity = []
+    for img, truth in corpus:
+        processed, timings = preprocessor.process(img)
+        step_times.update(timings)
+        if not args.tesseract:
+            continue
+
+        baseline_text, seconds = timed_ocr(img)
+        baseline_time += seconds
+        processed_text, seconds = timed_ocr(processed)
+        processed_time += seconds + sum(timings.values())
+
+        baseline_similarity.append(similarity(processed_text, baseline_text))
+        if truth is not None:
+            truth_similarity.append(
+                (similarity(baseline_text, truth), similarity(processed_text, truth))
+            )
+
+    print(f"images: {len(corpus)}")
+    for step in preprocessor.steps:
+        print(f"  {step:<10} {step_times[step] / len(corpus) * 1000:>8.1f} ms/image")
+    if not args.tesseract:
+        return
+
+    print(
+        f"OCR latency, unprocessed:  {baseline_time / len(corpus) * 1000:.0f} ms/image"
+    )
+    print(
+        f"OCR latency, preprocessed: {processed_time / len(corpus) * 1000:.0f} ms/image "
+        f"(including preprocessing, {baseline_time / processed_time:.2f}x faster)"
+    )
+    print(
+        f"similarity to unprocessed text: {sum(baseline_similarity) / len(baseline_similarity):.3f}"
+    )
+    if truth_similarity:
+        print(
+            f"similarity to rendered text: "
+            f"{sum(b for b, _ in truth_similarity) / len(truth_similarity):.3f} unprocessed, "
+            f"{sum(p for _, p in truth_similarity) / len(truth_similarity):.3f} preprocessed"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmarks the time taken to import document_merger, which is paid by every run and every worker process.
+
+Each run imports the package in a new Python process with -X importtime, so nothing is already imported. The import
+time is the median of --runs runs. The modules with the longest cumulative import time are listed, along with any of
+the conversion and OCR dependencies that the import loaded, which should only be imported when a file that needs them is
+converted (see ConverterRegistry). The exit code is 1 if the median is above --max-ms.
+
+Usage: python -m benchmarks.bench_startup [--runs 10] [--top 15] [--max-ms MS]
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import importlib.util
+import subprocess
+
+# dependencies that are only needed by some conversions, or for OCR and image prompts
+HEAVY_MODULES = (
+    "pdf2docx",
+    "fitz",
+    "pymupdf",
+    "mammoth",
+    "PIL",
+    "numpy",
+    "pytesseract",
+    "tkinter",
+    "comtypes",
+)
+
+# the directory containing the package that benchmarks/__init__.py put on the path, found without importing it
+SRC_PATH = os.path.dirname(
+    os.path.dirname(importlib.util.find_spec("document_merger").origin)
+)
+
+
+def import_times():
+    """Imports document_merger in a new process, returns {module: cumulative microseconds} and the modules it loaded"""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys, document_merger; print(' '.join(sys.modules))",
+        ],
+        env={**os.environ, "PYTHONPATH": SRC_PATH},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    # lines look like "import time:       self [us] |  cumulative | imported package", nested imports are indented
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        times[module.strip()] = int(cumulative)
+    return times, set(result.stdout.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10, help="imports to time")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument(
+        "--max-ms", type=float, help="fail if the median import time is above this"
+    )
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.runs)]
+    totals = [times["document_merger"] / 1000 for times, _ in runs]
+    median = statistics.median(totals)
+
+    # the last run, when the operating system has the files cached
+    times, modules = runs[-1]
+    print(
+        f"import document_merger: {median:.1f} ms median, {min(totals):.1f} ms fastest ({args.runs} runs)"
+    )
+    print("Slowest modules (cumulative):")
+    for module, microseconds in sorted(times.items(), key=lambda item: -item[1])[
+        : args.top
+    ]:
+        print(f"  {microseconds / 1000:>9.1f} ms  {module}")
+
+    loaded = [module for module in HEAVY_MODULES if module in modules]
+    print(f"Heavy dependencies imported: {', '.join(loaded) if loaded else 'none'}")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"Median import time is above {args.max_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
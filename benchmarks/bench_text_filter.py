@@ -0,0 +1,101 @@
+"""
+Benchmarks the text likelihood filter that lets Converter.image_ocr skip OCR on images that are unlikely to contain text.
+
+The corpus is either generated (rendered text in several sizes and colours, and photo-like noise, gradients, solid fills
+and shapes without text) or read from a directory with "text" and "no_text" subdirectories of real images. For each image
+the filter decision is compared with its label. The false-skip rate is the fraction of text images that would not be
+OCR'd, the time saved is the OCR time of the skipped non-text images minus the time spent running the filter on every
+image. OCR time is measured with tesseract if --tesseract is given, otherwise --ocr-ms is assumed per image.
+
+Usage: python -m benchmarks.bench_text_filter [--count 100] [--corpus DIR] [--tesseract PATH] [--ocr-ms 300]
+"""
+
+import os
+import time
+import random
+import argparse
+
+from PIL import Image
+import pytesseract
+
+from document_merger.TextLikelihoodFilter import TextLikelihoodFilter
+
+from .corpus import make_text_image, make_non_text_image
+
+
+def generated_corpus(count, seed):
+    rng = random.Random(seed)
+    corpus = [(make_text_image(rng), True) for _ in range(count // 2)]
+    corpus += [(make_non_text_image(rng), False) for _ in range(count - count // 2)]
+    return corpus
+
+
+def directory_corpus(path):
+    corpus = []
+    for subdirectory, has_text in (("text", True), ("no_text", False)):
+        directory = os.path.join(path, subdirectory)
+        for file in sorted(os.listdir(directory)):
+            with Image.open(os.path.join(directory, file)) as img:
+                corpus.append((img.convert("RGB"), has_text))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--count", type=int, default=100, help="generated images")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--corpus", help="directory with text and no_text subdirectories of images"
+    )
+    parser.add_argument("--tesseract", help="measure OCR time with this tesseract")
+    parser.add_argument(
+        "--ocr-ms", type=float, default=300, help="assumed OCR time per image"
+    )
+    args = parser.parse_args()
+
+    corpus = (
+        directory_corpus(args.corpus)
+        if args.corpus
+        else generated_corpus(args.count, args.seed)
+    )
+    text_filter = TextLikelihoodFilter()
+
+    filter_time = 0
+    skipped = {True: 0, False: 0}
+    skipped_ocr_time = 0
+    for img, has_text in corpus:
+        start_time = time.perf_counter()
+        likely_text = text_filter(img)
+        filter_time += time.perf_counter() - start_time
+
+        if not likely_text:
+            skipped[has_text] += 1
+            if args.tesseract:
+                pytesseract.pytesseract.tesseract_cmd = args.tesseract
+                start_time = time.perf_counter()
+                pytesseract.image_to_string(img)
+                skipped_ocr_time += time.perf_counter() - start_time
+            else:
+                skipped_ocr_time += args.ocr_ms / 1000
+
+    text_count = sum(1 for _, has_text in corpus if has_text)
+    non_text_count = len(corpus) - text_count
+    false_skip_rate = skipped[True] / text_count if text_count else 0
+    skip_rate = skipped[False] / non_text_count if non_text_count else 0
+
+    print(
+        f"images:             {len(corpus)} ({text_count} text, {non_text_count} non-text)"
+    )
+    print(f"filter time:        {filter_time / len(corpus) * 1000:.2f} ms/image")
+    print(f"non-text skipped:   {skipped[False]} ({skip_rate:.1%})")
+    print(
+        f"text skipped:       {skipped[True]} ({false_skip_rate:.1%} false-skip rate)"
+    )
+    print(
+        f"time saved:         {skipped_ocr_time - filter_time:.2f} s "
+        f"({skipped_ocr_time:.2f} s of OCR skipped, {filter_time:.2f} s filtering)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Generators for the synthetic corpora that the benchmarks run on: images, HTML documents with inline base64 images, DOCX
+files with embedded images, and nested directory trees of input files. Everything is generated locally from a seed, so a
+corpus is the same on every machine.
+"""
+
+import os
+import sys
+import base64
+import random
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from document_merger import Converter, DocumentMergerConfig
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog lecture slide summary figure table results method "
+    "introduction analysis conclusion week assignment due revision exam notes example definition"
+).split()
+
+
+def make_config(temp_dir, **config_values):
+    """Returns a DocumentMergerConfig that keeps everything in temp_dir, with its files initialised"""
+    config_values = {
+        "analysis_path": temp_dir,
+        "temp_file_path": os.path.join(temp_dir, "temp"),
+        "cache_file_path": os.path.join(temp_dir, "cache", "cache.json"),
+        # tesseract is never started by the benchmarks unless they are given its location
+        "tesseract_path": sys.executable,
+        "print_status_table": False,
+        **config_values,
+    }
+    config = DocumentMergerConfig(**config_values)
+    config.initialise_files()
+    return config
+
+
+def make_converter(temp_dir, **config_values):
+    return Converter(make_config(temp_dir, **config_values))
+
+
+def make_sentence(rng, min_words=3, max_words=9):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+
+def make_png(rng, width=400, height=300):
+    """Returns the bytes of a PNG with a few lines of text, unique to the state of rng"""
+    img = Image.new(
+        "RGB", (width, height), tuple(rng.randint(200, 255) for _ in range(3))
+    )
+    draw = ImageDraw.Draw(img)
+    for y in range(10, height - 20, 30):
+        draw.text((10, y), make_sentence(rng), fill=(0, 0, 0))
+    buffer = BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def make_text_image(rng):
+    width, height = rng.choice([(640, 480), (800, 200), (400, 300), (1024, 768)])
+    background = rng.randint(200, 255) if rng.random() < 0.8 else rng.randint(0, 60)
+    foreground = 255 - background
+    img = Image.new("RGB", (width, height), (background,) * 3)
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=rng.choice([14, 18, 24, 32, 48]))
+
+    y = rng.randint(5, 30)
+    while y < height - 20:
+        line = make_sentence(rng, 2, 8)
+        draw.text((rng.randint(5, 40), y), line, fill=(foreground,) * 3, font=font)
+        y += int(font.size * rng.uniform(1.3, 2.5))
+    return img
+
+
+def make_non_text_image(rng):
+    width, height = rng.choice([(640, 480), (800, 600), (400, 300), (1024, 768)])
+    kind = rng.choice(["photo", "gradient", "solid", "shapes"])
+
+    if kind == "photo":
+        # smooth random texture, upscaled noise looks like an out of focus photo
+        noise = Image.effect_noise((width // 16, height // 16), rng.randint(40, 90))
+        img = noise.resize((width, height), Image.BICUBIC).convert("RGB")
+    elif kind == "gradient":
+        img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    elif kind == "solid":
+        img = Image.new(
+            "RGB", (width, height), tuple(rng.randint(0, 255) for _ in range(3))
+        )
+    else:
+        img = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(img)
+        for _ in range(rng.randint(1, 4)):
+            x, y = rng.randint(0, width // 2), rng.randint(0, height // 2)
+            size = rng.randint(min(width, height) // 4, min(width, height) // 2)
+            colour = tuple(rng.randint(0, 200) for _ in range(3))
+            draw.ellipse((x, y, x + size, y + size), fill=colour)
+        img = img.filter(ImageFilter.GaussianBlur(1))
+    return img
+
+
+def make_slide(rng, size=(3840, 2160)):
+    """Returns a slide render and the text on it"""
+    width, height = size
+    img = Image.new("RGB", size, (240, 240, 240))
+    draw = ImageDraw.Draw(img)
+    # the slide itself, inset from the edge of the render
+    margin = rng.randint(100, 300)
+    slide_colour = rng.choice([(255, 255, 255), (250, 245, 230), (230, 240, 255)])
+    draw.rectangle((margin, margin, width - margin, height - margin), fill=slide_colour)
+
+    lines = []
+    title_font = ImageFont.load_default(size=120)
+    title = make_sentence(rng, 2, 4).title()
+    draw.text((margin + 80, margin + 60), title, fill=(20, 20, 80), font=title_font)
+    lines.append(title)
+
+    font = ImageFont.load_default(size=rng.choice([56, 64, 72]))
+    y = margin + 280
+    while y < height - margin - 150:
+        line = make_sentence(rng)
+        draw.text((margin + 140, y), line, fill=(30, 30, 30), font=font)
+        lines.append(line)
+        y += int(font.size * 1.6)
+    return img, "\n".join(lines)
+
+
+def make_large_base64_images(image_count, image_kb):
+    """
+    Returns image_count unique base64 strings of roughly image_kb kilobytes each. They are random bytes rather than
+    valid images, which is enough for the parts of the pipeline that only hash and copy images.
+    """
+    payload = base64.b64encode(os.urandom(image_kb * 768)).decode()
+    # a unique prefix per image gives each one a different hash
+    # 9 bytes encode to 12 characters without padding
+    return [
+        base64.b64encode(f"{i:09}".encode()).decode() + payload
+        for i in range(image_count)
+    ]
+
+
+def make_html(base64_images, rng=None):
+    """Returns an HTML document with a paragraph of text before each of the inline base64 PNG images"""
+    rng = rng or random.Random(0)
+    return "".join(
+        f'<p>{make_sentence(rng)}</p><p><img src="data:image/png;base64,{b64_image}" /></p>'
+        for b64_image in base64_images
+    )
+
+
+def write_html_files(directory, file_count, images_per_file, seed=0):
+    """Writes file_count HTML documents with images_per_file unique valid PNG images each, returns their paths"""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(file_count):
+        images = [
+            base64.b64encode(make_png(rng)).decode() for _ in range(images_per_file)
+        ]
+        path = os.path.join(directory, f"document {i}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_html(images, rng))
+        paths.append(path)
+    return paths
+
+
+def write_docx_files(directory, file_count, images_per_file, seed=0):
+    """Writes file_count DOCX documents with a paragraph and a unique PNG image per image, returns their paths"""
+    # python-docx is installed with pdf2docx
+    import docx
+    from docx.shared import Inches
+
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(file_count):
+        document = docx.Document()
+        document.add_heading(make_sentence(rng, 2, 4).title(), level=1)
+        for _ in range(images_per_file):
+            document.add_paragraph(make_sentence(rng, 10, 30))
+            document.add_picture(BytesIO(make_png(rng)), width=Inches(4))
+        path = os.path.join(directory, f"document {i}.docx")
+        document.save(path)
+        paths.append(path)
+    return paths
+
+
+def write_tree(
+    root,
+    course_count=3,
+    depth=2,
+    directories_per_level=3,
+    files_per_directory=5,
+    file_kb=16,
+    ignored_dir_names=("temp", "__pycache__"),
+    seed=0,
+):
+    """
+    Writes a tree of course directories, each with nested subdirectories of HTML inputs plus files that discovery must
+    leave out (unsupported types and the contents of ignored directories). Returns the course directory paths.
+    """
+    rng = random.Random(seed)
+    padding = "x" * (file_kb * 1024)
+
+    def write_files(directory):
+        os.makedirs(directory, exist_ok=True)
+        for i in range(files_per_directory):
+            with open(os.path.join(directory, f"notes {i}.html"), "w") as f:
+                f.write(f"<p>{make_sentence(rng)}</p><!-- {rng.random()} {padding} -->")
+        with open(os.path.join(directory, "data.csv"), "w") as f:
+            f.write("a,b\n1,2\n")
+
+    def write_level(directory, level):
+        write_files(directory)
+        for ignored_dir_name in ignored_dir_names:
+            write_files(os.path.join(directory, ignored_dir_name))
+        if level < depth:
+            for i in range(directories_per_level):
+                write_level(os.path.join(directory, f"week {i}"), level + 1)
+
+    course_paths = []
+    for i in range(course_count):
+        course_path = os.path.join(root, f"course {i}")
+        write_level(course_path, 1)
+        course_paths.append(course_path)
+    return course_paths
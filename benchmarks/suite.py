@@ -0,0 +1,425 @@
+"""
+Times each stage of the conversion pipeline on generated corpora with a cold and a warm cache, and compares the results
+with a stored baseline.
+
+Stages:
+    docx_to_html: Converter._DOCX_to_HTML on DOCX files with embedded images. Warm is Converter.convert on the same files
+        once they are in the cache, i.e. the cost of a rerun.
+    html_ocr: Converter.HTML_ocr on HTML files with inline images. Cold OCRs every image, warm finds every image in
+        ocr_map. Tesseract is replaced by an engine that returns fixed text unless --tesseract is given, so cold measures
+        the decoding, hashing and annotation around OCR.
+    merge_html_files: DocumentMerger.merge_html_files on the converted HTML files, with the imageless version. Warm is a
+        repeat run, the operating system's file cache can't be dropped so cold is only the first run.
+    check_if_file_already_processed: Converter.check_if_file_already_processed on every file of a directory tree. Cold
+        hashes every file, warm is a new run that reuses the stored file fingerprints.
+    discovery: DocumentMerger.discover_input_files on every course of the tree, which is the discovery done by
+        process_subdirectory. Warm is a repeat run.
+    process_subdirectory: DocumentMerger.process_subdirectory on every course of the tree. Warm is a new run in which every
+        directory is unchanged. A run that doesn't write the merged file of every course is an error.
+
+Each timing is the fastest of --repeat runs, each on a fresh copy of the corpus and cache. Results are written as JSON
+with --output. With --baseline, any stage that is more than --threshold slower than the baseline (and slower by more
+than --min-seconds, to ignore noise on very fast stages) is reported, and the exit code is 1.
+
+Usage: python -m benchmarks.suite [--output results.json] [--baseline baseline.json] [--threshold 0.2]
+    [--stages html_ocr discovery] [--repeat 3] [--scale 1] [--tesseract PATH]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+from document_merger import DocumentMerger
+from document_merger.OCREngine import OCREngine
+
+from . import corpus
+
+
+class FixedTextEngine(OCREngine):
+    """Returns the same text for every image, so that OCR stages can be timed without tesseract"""
+
+    def recognize(self, img):
+        return "benchmark text"
+
+
+class Benchmark:
+    """
+    Runs the stages in a temporary directory. Each stage method returns {"cold": seconds, "warm": seconds}.
+    scale (float): multiplies the size of every corpus
+    repeat (int): runs of each timing, the fastest is kept
+    tesseract_path (str | None): location of tesseract for the OCR stages, None uses FixedTextEngine
+    """
+
+    def __init__(self, temp_dir, scale=1, repeat=3, tesseract_path=None):
+        self.temp_dir = temp_dir
+        self.scale = scale
+        self.repeat = repeat
+        self.tesseract_path = tesseract_path
+        self.run_count = 0
+
+    def count(self, n):
+        return max(1, round(n * self.scale))
+
+    def parameters(self):
+        return {
+            "scale": self.scale,
+            "repeat": self.repeat,
+            "tesseract": bool(self.tesseract_path),
+        }
+
+    def fresh_dir(self, name):
+        # every run gets its own directory, so no run sees the cache or outputs of another
+        self.run_count += 1
+        path = os.path.join(self.temp_dir, f"{name} {self.run_count}")
+        os.makedirs(path)
+        return path
+
+    def make_config(self, run_dir, **config_values):
+        if self.tesseract_path:
+            config_values["tesseract_path"] = self.tesseract_path
+        return corpus.make_config(run_dir, **config_values)
+
+    def make_merger(self, run_dir, **config_values):
+        merger = DocumentMerger(self.make_config(run_dir, **config_values))
+        if not self.tesseract_path:
+            merger.converter.ocr_engine = FixedTextEngine()
+        return merger
+
+    def fastest(self, run):
+        """Returns the fastest time of run(), which sets up a fresh run and returns the function to time"""
+        times = []
+        for _ in range(self.repeat):
+            timed = run()
+            start_time = time.perf_counter()
+            timed()
+            times.append(time.perf_counter() - start_time)
+        return min(times)
+
+    def cold_and_warm(self, setup, cold, warm):
+        """
+        setup() returns the state of a fresh run, cold(state) and warm(state) return the function to time. warm is called
+        after the cold function has run on the same state.
+        """
+
+        def cold_run():
+            return cold(setup())
+
+        def warm_run():
+            state = setup()
+            cold(state)()
+            return warm(state)
+
+        return {"cold": self.fastest(cold_run), "warm": self.fastest(warm_run)}
+
+    def convert_all(self, converter, input_paths, output_dir):
+        for input_path in input_paths:
+            converter.convert(
+                input_path,
+                os.path.join(output_dir, os.path.basename(input_path)),
+                output_type="html",
+                make_output_dirs=True,
+            )
+
+    def docx_to_html(self):
+        docx_dir = os.path.join(self.temp_dir, "docx corpus")
+        docx_paths = corpus.write_docx_files(
+            docx_dir, self.count(10), images_per_file=5
+        )
+
+        def setup():
+            run_dir = self.fresh_dir("docx_to_html")
+            return run_dir, self.make_merger(run_dir).converter
+
+        def cold(state):
+            run_dir, converter = state
+
+            def run():
+                for docx_path in docx_paths:
+                    output_path = os.path.join(
+                        run_dir,
+                        converter.change_ext(os.path.basename(docx_path), "html"),
+                    )
+                    converter._DOCX_to_HTML(docx_path, output_path)
+
+            return run
+
+        def warm(state):
+            run_dir, converter = state
+            return lambda: self.convert_all(converter, docx_paths, run_dir)
+
+        return self.cold_and_warm(setup, cold, warm)
+
+    def html_ocr(self):
+        html_dir = os.path.join(self.temp_dir, "html corpus")
+        html_paths = corpus.write_html_files(
+            html_dir, self.count(10), images_per_file=20
+        )
+
+        def setup():
+            run_dir = self.fresh_dir("html_ocr")
+            converter = self.make_merger(run_dir).converter
+            return run_dir, converter
+
+        def copies(run_dir, name):
+            # HTML_ocr rewrites the file it is given
+            paths = []
+            for html_path in html_paths:
+                path = os.path.join(run_dir, f"{name} {os.path.basename(html_path)}")
+                shutil.copy(html_path, path)
+                paths.append(path)
+            return paths
+
+        def cold(state):
+            run_dir, converter = state
+            paths = copies(run_dir, "cold")
+            return lambda: [converter.HTML_ocr(path) for path in paths]
+
+        def warm(state):
+            run_dir, converter = state
+            paths = copies(run_dir, "warm")
+            return lambda: [converter.HTML_ocr(path) for path in paths]
+
+        return self.cold_and_warm(setup, cold, warm)
+
+    def merge_html_files(self):
+        html_dir = os.path.join(self.temp_dir, "merge corpus")
+        html_paths = corpus.write_html_files(
+            html_dir, self.count(40), images_per_file=10, seed=1
+        )
+
+        def setup():
+            run_dir = self.fresh_dir("merge_html_files")
+            merger = self.make_merger(run_dir, create_imageless_version=True)
+            return run_dir, merger
+
+        def merge(state):
+            run_dir, merger = state
+            return lambda: merger.merge_html_files(
+                html_paths, os.path.join(run_dir, "merged.html")
+            )
+
+        return self.cold_and_warm(setup, merge, merge)
+
+    def tree(self):
+        tree_dir = os.path.join(self.temp_dir, "tree corpus")
+        if not os.path.exists(tree_dir):
+            corpus.write_tree(
+                tree_dir,
+                course_count=self.count(3),
+                directories_per_level=3,
+                depth=3,
+                files_per_directory=self.count(5),
+            )
+        return tree_dir
+
+    def check_if_file_already_processed(self):
+        tree_dir = self.tree()
+        file_paths = [
+            os.path.join(root, file)
+            for root, _, files in os.walk(tree_dir)
+            for file in files
+        ]
+
+        def setup():
+            run_dir = self.fresh_dir("check_if_file_already_processed")
+            return run_dir, self.make_merger(run_dir).converter
+
+        def cold(state):
+            _, converter = state
+
+            def run():
+                for file_path in file_paths:
+                    converter.check_if_file_already_processed(file_path)
+                    converter.map_processed_file(file_path, file_path + ".html")
+
+            return run
+
+        def warm(state):
+            run_dir, converter = state
+            converter.write_to_cache_file()
+            converter.close()
+            # a new run, which only has the stored cache
+            converter = self.make_merger(run_dir).converter
+            return lambda: [
+                converter.check_if_file_already_processed(file_path)
+                for file_path in file_paths
+            ]
+
+        return self.cold_and_warm(setup, cold, warm)
+
+    def discovery(self):
+        tree_dir = self.tree()
+        course_paths = [os.path.join(tree_dir, d) for d in sorted(os.listdir(tree_dir))]
+
+        def setup():
+            run_dir = self.fresh_dir("discovery")
+            return self.make_merger(
+                run_dir, analysis_path=tree_dir, ignored_dirs=("temp", "__pycache__")
+            )
+
+        def discover(merger):
+            return lambda: [
+                merger.discover_input_files(course_path) for course_path in course_paths
+            ]
+
+        return self.cold_and_warm(setup, discover, discover)
+
+    def process_subdirectory(self):
+        tree_dir = self.tree()
+
+        def setup():
+            # the merged files are written into the tree, so each run has its own copy
+            run_dir = self.fresh_dir("process_subdirectory")
+            analysis_path = os.path.join(run_dir, "tree")
+            shutil.copytree(tree_dir, analysis_path)
+            return run_dir, analysis_path
+
+        def run_all(run_dir, analysis_path):
+            merger = self.make_merger(
+                run_dir,
+                analysis_path=analysis_path,
+                ignored_dirs=("temp", "__pycache__"),
+            )
+
+            def run():
+                current_dir = os.getcwd()
+                # process_subdirectory is given directory names relative to the analysis path, as in start()
+                os.chdir(analysis_path)
+                try:
+                    dir_names = sorted(os.listdir("."))
+                    for dir_name in dir_names:
+                        merger.process_subdirectory(dir_name)
+                    merger.converter.write_to_cache_file()
+                finally:
+                    merger.converter.close()
+                    os.chdir(current_dir)
+
+                # a run that didn't merge every course would time less than the whole stage
+                missing = [
+                    dir_name
+                    for dir_name in dir_names
+                    if not os.path.exists(
+                        merger.merged_file_paths(os.path.join(analysis_path, dir_name))[
+                            0
+                        ]
+                    )
+                ]
+                if missing:
+                    raise RuntimeError(
+                        f"process_subdirectory didn't merge {', '.join(missing)}"
+                    )
+
+            return run
+
+        def cold(state):
+            return run_all(*state)
+
+        def warm(state):
+            return run_all(*state)
+
+        return self.cold_and_warm(setup, cold, warm)
+
+    stages = (
+        "docx_to_html",
+        "html_ocr",
+        "merge_html_files",
+        "check_if_file_already_processed",
+        "discovery",
+        "process_subdirectory",
+    )
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """Returns a list of (stage, mode, baseline seconds, seconds) that are slower than the baseline allows"""
+    regressions = []
+    for stage, timings in results["stages"].items():
+        for mode, seconds in timings.items():
+            baseline_seconds = baseline.get("stages", {}).get(stage, {}).get(mode)
+            if baseline_seconds is None:
+                continue
+            if (
+                seconds > baseline_seconds * (1 + threshold)
+                and seconds - baseline_seconds > min_seconds
+            ):
+                regressions.append((stage, mode, baseline_seconds, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stages", nargs="+", default=list(Benchmark.stages))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1, help="corpus size multiplier")
+    parser.add_argument("--tesseract", help="location of tesseract for the OCR stages")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%"
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.005,
+        help="slowdowns smaller than this are never regressions",
+    )
+    args = parser.parse_args()
+
+    for stage in args.stages:
+        if stage not in Benchmark.stages:
+            parser.error(
+                f"Unknown stage '{stage}' (stages are {', '.join(Benchmark.stages)})"
+            )
+
+    with tempfile.TemporaryDirectory(prefix="document-merger-bench-") as temp_dir:
+        benchmark = Benchmark(
+            temp_dir,
+            scale=args.scale,
+            repeat=args.repeat,
+            tesseract_path=args.tesseract,
+        )
+        results = {
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "processor": platform.processor(),
+            },
+            "parameters": benchmark.parameters(),
+            "stages": {},
+        }
+
+        print(f"{'stage':<34} | {'cold (s)':>9} | {'warm (s)':>9}")
+        for stage in args.stages:
+            timings = getattr(benchmark, stage)()
+            results["stages"][stage] = timings
+            print(f"{stage:<34} | {timings['cold']:>9.4f} | {timings['warm']:>9.4f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("parameters") != results["parameters"]:
+            print("Warning: the baseline was run with different parameters")
+
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        for stage, mode, baseline_seconds, seconds in regressions:
+            print(
+                f"Regression: {stage} ({mode}) took {seconds:.4f} s, baseline {baseline_seconds:.4f} s "
+                f"({seconds / baseline_seconds - 1:+.0%})"
+            )
+        if regressions:
+            sys.exit(1)
+        print(
+            f"No regressions against {args.baseline} (threshold {args.threshold:.0%})"
+        )
+
+
+if __name__ == "__main__":
+    main()
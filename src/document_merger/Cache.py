@@ -0,0 +1,289 @@
+import os
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+
+
+class CacheBackend:
+    """Base class of the stores that persist the cache maps of a Converter between runs.
+
+    Every backend stores the maps named in tables. load() returns a mapping object for each of them, which the
+    converter reads and writes like a dict, and save() persists any changes that the mapping objects haven't already
+    persisted themselves.
+
+    shared_between_processes (bool): Whether worker processes can open the cache themselves and see each other's writes,
+        rather than having the maps handed to them by the main process.
+    """
+
+    tables = (
+        "ocr_map",
+        "file_path_map",
+        "processed_file_hashes",
+        "file_fingerprints",
+        "directory_manifests",
+        "perceptual_image_keys",
+        "review_queue",
+        "last_used",
+        "output_hashes",
+    )
+    shared_between_processes = False
+
+    def load(self):
+        raise NotImplementedError
+
+    def save(self, maps):
+        raise NotImplementedError
+
+    def compact(self, maps):
+        """Saves maps and reclaims the space of removed entries, see CacheMaintenance"""
+        self.save(maps)
+
+    def size_on_disk(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JSONCache(CacheBackend):
+    """Stores every map in a single JSON file, which is read in full on load and rewritten in full on save.
+
+    path (str): location of the JSON file
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        maps = {table: {} for table in self.tables}
+
+        with open(self.path, "r") as f:
+            try:
+                cache_data = json.load(f)
+
+                for table in self.tables:
+                    maps[table] = cache_data.get(table, {})
+
+            except json.decoder.JSONDecodeError:
+                # exited halfway through writing to the file, so just reset it to {}
+                if len(f.read()) == 0:
+                    with open(self.path, "w") as f:
+                        f.write("{}")
+                    print("JSON decode error on cache JSON, file has been reset")
+                else:
+                    print(f"JSON decode error on cache JSON, path {self.path}")
+                    exit()
+
+        return maps
+
+    def save(self, maps):
+        with open(self.path, "w") as cache_file:
+            cache_file.write(
+                json.dumps(
+                    {table: dict(maps[table]) for table in self.tables}, indent=4
+                )
+            )
+
+    def size_on_disk(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+
+class SQLiteTable(MutableMapping):
+    """A dict-like view of one table of a SQLiteCache. Every write is upserted and committed immediately.
+
+    Keys are stored as strings, values are stored as JSON. Values are copies, so a value that is changed after being read
+    must be assigned back to be saved.
+    """
+
+    def __init__(self, cache, name):
+        self.cache = cache
+        self.name = name
+
+    def __getitem__(self, key):
+        row = self.cache.fetchone(
+            f"SELECT value FROM {self.name} WHERE key = ?", (str(key),)
+        )
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __setitem__(self, key, value):
+        self.cache.execute(
+            f"INSERT INTO {self.name} (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (str(key), json.dumps(value)),
+        )
+
+    def __delitem__(self, key):
+        if (
+            self.cache.execute(f"DELETE FROM {self.name} WHERE key = ?", (str(key),))
+            == 0
+        ):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return (
+            self.cache.fetchone(f"SELECT 1 FROM {self.name} WHERE key = ?", (str(key),))
+            is not None
+        )
+
+    def __iter__(self):
+        return iter(
+            [row[0] for row in self.cache.fetchall(f"SELECT key FROM {self.name}")]
+        )
+
+    def __len__(self):
+        return self.cache.fetchone(f"SELECT COUNT(*) FROM {self.name}")[0]
+
+    def update(self, other=(), /, **kwargs):
+        # one transaction for the whole batch instead of one per entry
+        items = other.items() if hasattr(other, "items") else other
+        rows = [(str(k), json.dumps(v)) for k, v in items]
+        rows.extend((str(k), json.dumps(v)) for k, v in kwargs.items())
+        self.cache.executemany(
+            f"INSERT INTO {self.name} (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            rows,
+        )
+
+    def delete_many(self, keys):
+        # one transaction for the whole batch, keys that aren't stored are ignored
+        self.cache.executemany(
+            f"DELETE FROM {self.name} WHERE key = ?", [(str(k),) for k in keys]
+        )
+
+    def entry_sizes(self):
+        """Returns {key: size in bytes of the stored key and value}, without decoding the values"""
+        return dict(
+            self.cache.fetchall(
+                f"SELECT key, LENGTH(CAST(key AS BLOB)) + LENGTH(CAST(value AS BLOB)) FROM {self.name}"
+            )
+        )
+
+
+class SQLiteCache(CacheBackend):
+    """Stores each map in its own table of a SQLite database in WAL mode.
+
+    Entries are looked up by primary key and upserted one at a time as they change, so loading doesn't read the whole
+    cache and a crash only loses the entry being written. Each process opens its own connection, so worker processes
+    can share the same database.
+
+    path (str): location of the SQLite database
+    json_path (str | None): location of a JSON cache to copy into the database the first time it is opened
+    """
+
+    shared_between_processes = True
+
+    def __init__(self, path, json_path=None):
+        self.path = path
+        self.json_path = json_path
+        # the connection is shared by the OCR threads of a converter
+        self.lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # autocommit, every statement is its own transaction unless one is opened explicitly
+        self.connection = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self.execute("PRAGMA journal_mode = WAL")
+        self.execute("PRAGMA synchronous = NORMAL")
+
+        self.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        for table in self.tables:
+            self.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+
+        self.migrate_json_cache()
+
+    # results are fetched while holding the lock, as the connection is shared between threads
+    def execute(self, sql, parameters=()):
+        """Runs a statement, returning the number of rows it changed"""
+        with self.lock:
+            return self.connection.execute(sql, parameters).rowcount
+
+    def executemany(self, sql, rows):
+        with self.lock:
+            with self.transaction():
+                self.connection.executemany(sql, rows)
+
+    def fetchone(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchone()
+
+    def fetchall(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def transaction(self):
+        # sqlite3.Connection as a context manager commits on success and rolls back on error
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def migrate_json_cache(self):
+        """Copies the contents of json_path into the database, once. The JSON file is left untouched."""
+        if not self.json_path or not os.path.exists(self.json_path):
+            return
+
+        with self.lock:
+            # the write lock is held for the whole check and copy, so only one process performs the migration
+            with self.transaction():
+                if (
+                    self.connection.execute(
+                        "SELECT 1 FROM meta WHERE key = 'migrated_json_cache'"
+                    ).fetchone()
+                    is not None
+                ):
+                    return
+
+                maps = JSONCache(self.json_path).load()
+                for table in self.tables:
+                    self.connection.executemany(
+                        f"INSERT OR IGNORE INTO {table} (key, value) VALUES (?, ?)",
+                        ((str(k), json.dumps(v)) for k, v in maps[table].items()),
+                    )
+                self.connection.execute(
+                    "INSERT INTO meta (key, value) VALUES ('migrated_json_cache', ?)",
+                    (os.path.abspath(self.json_path),),
+                )
+            print(f"Migrated JSON cache {self.json_path} to {self.path}")
+
+    def load(self):
+        return {table: SQLiteTable(self, table) for table in self.tables}
+
+    def save(self, maps):
+        # maps that are views of this database are already saved, anything else (e.g. a plain dict) is copied in
+        for table in self.tables:
+            if not isinstance(maps[table], SQLiteTable):
+                SQLiteTable(self, table).update(maps[table])
+        self.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def compact(self, maps):
+        self.save(maps)
+        # rebuilds the database without the pages freed by removed entries, then empties the write-ahead log
+        self.execute("VACUUM")
+        self.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def size_on_disk(self):
+        return sum(
+            os.path.getsize(path)
+            for path in (self.path, f"{self.path}-wal", f"{self.path}-shm")
+            if os.path.exists(path)
+        )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def create_cache(config):
+    """Returns the cache backend selected by config.cache_backend"""
+    if config.cache_backend == "sqlite":
+        json_path = None
+        if config.cache_file_path.lower().endswith(".json"):
+            json_path = config.cache_file_path
+        return SQLiteCache(config.sqlite_cache_path, json_path=json_path)
+    return JSONCache(config.cache_file_path)
@@ -0,0 +1,335 @@
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+
+from .Cache import JSONCache, SQLiteCache, SQLiteTable
+
+# tables whose entries are evicted by age and size. Their use is recorded in last_used by Converter.record_cache_use
+EVICTABLE_TABLES = (
+    "ocr_map",
+    "file_path_map",
+    "processed_file_hashes",
+    "file_fingerprints",
+)
+
+
+class CacheMaintenance:
+    """Keeps the cache maps of a Converter from growing without bound.
+
+    prune() removes the entries that can no longer be used: mapped outputs and fingerprinted files that no longer exist,
+    manifests of deleted merged files, and perceptual keys of OCR results that are gone. evict() removes the entries of
+    ocr_map, file_path_map, processed_file_hashes and file_fingerprints that haven't been used for max_age_days, then the
+    least recently used of them until the cache is within max_size bytes. Entries from before uses were recorded count as
+    used when they are first seen here. OCR results that were decided on with show_image, or are waiting for review, are
+    never evicted, as they can't be recreated without the user.
+
+    cache (CacheBackend): the store of the maps
+    maps (dict[str, MutableMapping]): the maps loaded from cache, see Converter.cache_maps
+    """
+
+    def __init__(self, cache, maps):
+        self.cache = cache
+        self.maps = maps
+        # table: {key: size}, kept up to date by remove() and add(), so that entries are only measured once
+        self.sizes = {}
+
+    def entry_sizes(self, table):
+        """Returns {key: approximate size in bytes of the stored entry} of a table"""
+        if table not in self.sizes:
+            cache_map = self.maps[table]
+            if isinstance(cache_map, SQLiteTable):
+                self.sizes[table] = cache_map.entry_sizes()
+            else:
+                self.sizes[table] = {
+                    key: len(json.dumps(key)) + len(json.dumps(value))
+                    for key, value in cache_map.items()
+                }
+        return self.sizes[table]
+
+    def add(self, table, entries):
+        """Adds entries to a table"""
+        self.maps[table].update(entries)
+        if table in self.sizes:
+            self.sizes[table].update(
+                (key, len(json.dumps(key)) + len(json.dumps(value)))
+                for key, value in entries.items()
+            )
+
+    def remove(self, table, keys):
+        """Removes keys from a table, returns the number removed"""
+        cache_map = self.maps[table]
+        if isinstance(cache_map, SQLiteTable):
+            cache_map.delete_many(keys)
+        else:
+            for key in keys:
+                cache_map.pop(key, None)
+        sizes = self.sizes.get(table)
+        if sizes is not None:
+            for key in keys:
+                sizes.pop(key, None)
+        return len(keys)
+
+    def stats(self):
+        """Returns {table: (number of entries, size in bytes)}"""
+        stats = {}
+        for table in self.cache.tables:
+            sizes = self.entry_sizes(table)
+            stats[table] = (len(sizes), sum(sizes.values()))
+        return stats
+
+    def prune(self):
+        """Removes the entries that refer to files or entries that no longer exist. Returns the number removed from each table"""
+        removed = Counter()
+
+        # inputs that were deleted, and outputs that were deleted e.g. with the temporary files
+        removed["file_path_map"] = self.remove(
+            "file_path_map",
+            [
+                input_path
+                for input_path, output_path in self.maps["file_path_map"].items()
+                if not os.path.exists(input_path) or not os.path.exists(output_path)
+            ],
+        )
+        removed["processed_file_hashes"] = self.remove(
+            "processed_file_hashes",
+            [
+                file_hash
+                for file_hash, output_path in self.maps["processed_file_hashes"].items()
+                if not os.path.exists(output_path)
+            ],
+        )
+        removed["file_fingerprints"] = self.remove(
+            "file_fingerprints",
+            [
+                path
+                for path in self.maps["file_fingerprints"]
+                if not os.path.exists(path)
+            ],
+        )
+        removed["directory_manifests"] = self.remove(
+            "directory_manifests",
+            [
+                path
+                for path in self.maps["directory_manifests"]
+                if not os.path.exists(path)
+            ],
+        )
+
+        # outputs that were deleted, or that no input or content maps to any more
+        mapped_outputs = set(self.maps["file_path_map"].values())
+        mapped_outputs.update(self.maps["processed_file_hashes"].values())
+        removed["output_hashes"] = self.remove(
+            "output_hashes",
+            [
+                output_path
+                for output_path in self.maps["output_hashes"]
+                if output_path not in mapped_outputs or not os.path.exists(output_path)
+            ],
+        )
+
+        ocr_keys = set(self.maps["ocr_map"])
+        removed["perceptual_image_keys"] = self.remove(
+            "perceptual_image_keys",
+            [
+                perceptual_key
+                for perceptual_key, image_key in self.maps[
+                    "perceptual_image_keys"
+                ].items()
+                if image_key not in ocr_keys
+            ],
+        )
+
+        existing = {
+            f"{table}/{key}" for table in EVICTABLE_TABLES for key in self.maps[table]
+        }
+        removed["last_used"] = self.remove(
+            "last_used", [key for key in self.maps["last_used"] if key not in existing]
+        )
+        return +removed
+
+    def protected_keys(self):
+        """Returns the keys of ocr_map that are never evicted"""
+        protected = set(self.maps["review_queue"])
+        protected.update(
+            image_key
+            for image_key, ocr_entry in self.maps["ocr_map"].items()
+            if ocr_entry.get("seen")
+        )
+        return protected
+
+    def evict(self, max_age_days=None, max_size=None):
+        """
+        Removes the entries that haven't been used for max_age_days, then the least recently used entries until the cache
+        is within max_size. Returns the number removed from each table.
+        max_age_days (float | None): age in days of the last use of entries to remove, None doesn't evict by age
+        max_size (int | None): size in bytes the stored entries of all tables should fit in, None doesn't evict by size
+        """
+        removed = Counter()
+        if max_age_days is None and max_size is None:
+            return removed
+
+        now = int(time.time())
+        last_used = dict(self.maps["last_used"].items())
+        last_used_sizes = self.entry_sizes("last_used")
+        protected = self.protected_keys()
+
+        # (time of last use, table, key, size including its last_used entry) of each evictable entry
+        candidates = []
+        first_seen = {}
+        for table in EVICTABLE_TABLES:
+            for key, size in self.entry_sizes(table).items():
+                if table == "ocr_map" and key in protected:
+                    continue
+                used_key = f"{table}/{key}"
+                if used_key not in last_used:
+                    first_seen[used_key] = now
+                candidates.append(
+                    (
+                        last_used.get(used_key, now),
+                        table,
+                        key,
+                        size + last_used_sizes.get(used_key, 0),
+                    )
+                )
+        if first_seen:
+            self.add("last_used", first_seen)
+        candidates.sort()
+
+        evicted = set()
+        if max_age_days is not None:
+            cutoff = now - max_age_days * 24 * 60 * 60
+            evicted.update(
+                (table, key) for used, table, key, _ in candidates if used < cutoff
+            )
+
+        if max_size is not None:
+            total_size = sum(size for _, size in self.stats().values())
+            total_size -= sum(
+                size for _, table, key, size in candidates if (table, key) in evicted
+            )
+            for _, table, key, size in candidates:
+                if total_size <= max_size:
+                    break
+                if (table, key) not in evicted:
+                    evicted.add((table, key))
+                    total_size -= size
+
+        # a path mapping is only trusted while the fingerprint that detects changes to the file is stored
+        evicted.update(
+            ("file_path_map", key)
+            for table, key in list(evicted)
+            if table == "file_fingerprints" and key in self.maps["file_path_map"]
+        )
+
+        keys_by_table = {table: [] for table in EVICTABLE_TABLES}
+        for table, key in evicted:
+            keys_by_table[table].append(key)
+        for table, keys in keys_by_table.items():
+            removed[table] = self.remove(table, keys)
+        removed["last_used"] = self.remove(
+            "last_used", [f"{table}/{key}" for table, key in evicted]
+        )
+        return +removed
+
+    def maintain(self, max_age_days=None, max_size=None, compact=False):
+        """
+        Evicts entries by age and size, prunes the entries left unusable, and saves the cache. Returns a report of the
+        sizes before and after and the entries removed.
+        max_age_days (float | None): see evict
+        max_size (int | None): see evict
+        compact (bool): Flag to also reclaim the space of the removed entries on disk, which rewrites the whole cache
+        """
+        before = self.stats()
+        size_on_disk = self.cache.size_on_disk()
+        # stale entries are removed first, so that they don't count towards max_size
+        removed = self.prune()
+        removed.update(self.evict(max_age_days, max_size))
+        # evicted OCR results leave perceptual keys pointing at nothing
+        removed.update(self.prune())
+        if compact:
+            self.cache.compact(self.maps)
+        else:
+            self.cache.save(self.maps)
+        return self.report(before, self.stats(), removed, size_on_disk)
+
+    def report(self, before, after, removed, size_on_disk_before=None):
+        """
+        Returns a description of the cache: the entries and size of each table, and what was removed.
+        before (dict[str, tuple[int, int]]): stats() before maintenance
+        after (dict[str, tuple[int, int]] | None): stats() after maintenance, None to only describe before
+        removed (Counter): entries removed from each table
+        size_on_disk_before (int | None): size of the cache file before maintenance
+        """
+        lines = ["Cache:"]
+        for table, (entries, size) in before.items():
+            line = f"  {table:<24} {entries:>9} entries {size / 1024 / 1024:>9.1f} MB"
+            if after is not None:
+                entries_after, size_after = after[table]
+                line += f"  ->  {entries_after:>9} entries {size_after / 1024 / 1024:>9.1f} MB"
+            lines.append(line)
+        if removed:
+            lines.append(
+                "Removed: "
+                + ", ".join(f"{count} from {table}" for table, count in removed.items())
+            )
+
+        size_on_disk = self.cache.size_on_disk()
+        if size_on_disk_before is not None and size_on_disk_before != size_on_disk:
+            lines.append(
+                f"Size on disk: {size_on_disk_before / 1024 / 1024:.1f} MB -> {size_on_disk / 1024 / 1024:.1f} MB"
+            )
+        else:
+            lines.append(f"Size on disk: {size_on_disk / 1024 / 1024:.1f} MB")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Reports on, prunes, evicts from and compacts a document merger cache"
+    )
+    parser.add_argument(
+        "cache", help="location of the cache, a .json file or a .sqlite3 database"
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="only report on the cache, without changing it",
+    )
+    parser.add_argument(
+        "--max-age-days",
+        type=float,
+        help="evict entries that haven't been used for this many days",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=float,
+        help="evict the least recently used entries until the cache fits in this many MB",
+    )
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.cache):
+        parser.error(f"Cache '{args.cache}' doesn't exist")
+    if args.cache.lower().endswith(".json"):
+        cache = JSONCache(args.cache)
+    else:
+        cache = SQLiteCache(args.cache)
+
+    try:
+        maintenance = CacheMaintenance(cache, cache.load())
+        if args.stats:
+            print(maintenance.report(maintenance.stats(), None, Counter()))
+        else:
+            max_size = None
+            if args.max_size is not None:
+                max_size = int(args.max_size * 1024 * 1024)
+            print(maintenance.maintain(args.max_age_days, max_size, compact=True))
+    finally:
+        cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,28 @@
 from .StatusTable import StatusTable
+from .OCRPool import OCRPool
+from .Cache import create_cache
+from .OfficeConverterPool import OfficeConverterPool, OfficeProcess
+from .ImageIdentity import ImageIdentity
+from .OCREngine import create_ocr_engine
+from .Instrumentation import Instrumentation
+from .ConverterRegistry import default_registry
 
 import os
 import re
-import json
-import zlib  # adler32 hashing
+import time
 import hashlib  # file_digest sha256 hashing
-import shutil  # for copy
+import logging
+import functools
+import threading
+from collections import Counter
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import Future
 
-import comtypes.client
-
-from pdf2docx import Converter as pdf2docx_Converter
-import mammoth
-
-import base64
-from PIL import Image, ImageTk
-import pytesseract
 from io import BytesIO
 
-import tkinter as tk
-from tkinter import simpledialog
+# pdf2docx, mammoth, PIL and tkinter are imported where they are used, so that importing the package stays fast and
+# doesn't need the dependencies of conversions that aren't used
 
 # TODO: keep track of all the files that have been created and optionally delete them if the program exits prematurely
 # TODO: make this consistent, log errors instead of breaking
@@ -37,43 +41,120 @@ from tkinter import simpledialog
 # alternatively, just add proper prodedure to the start and end functions that is mentioned in the above todo
 # TODO: test file hashing
 
+# number of bytes hashed from each end of a file by Converter.generate_partial_file_hash
+PARTIAL_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def _import_pdf2docx():
+    """Returns pdf2docx's Converter class. Importing pdf2docx sets the root logger to INFO, which would undo the level set
+    by DocumentMerger, so the level is restored"""
+    level = logging.getLogger().level
+    from pdf2docx import Converter as pdf2docx_Converter
+
+    logging.getLogger().setLevel(level)
+    return pdf2docx_Converter
+
+
+def _parse_pdf_pages(input_file_path, page_indexes, json_path):
+    """Parses some of the pages of a PDF in a worker process of Converter._pdf2docx_convert, saving them to json_path"""
+    cv = _import_pdf2docx()(input_file_path)
+    settings = cv.default_settings
+
+    cv.load_pages()
+    for page in cv.pages:
+        page.skip_parsing = True
+    for i in page_indexes:
+        cv.pages[i].skip_parsing = False
+
+    cv.parse_document(**settings).parse_pages(**settings).serialize(json_path)
+    cv.close()
+
+
+# matches the base64 data of an inline image, up to the end of its image tag
+base64_image_regex = re.compile(r"base64, ?([^\"]*)\"[^>]*>")
+
 
 class Converter:
-    def __init__(self, config):
+    def __init__(self, config, load_cache=True):
         self.config = config
         self.created_files = []
-        self.supported_input_types = ["pdf", "html", "pptx", "docx"]
-        self.supported_output_types = ["html"]
-        self.status_table = StatusTable(print_output=self.config.print_status_table)
+        # the conversion between each pair of file types, see ConverterRegistry
+        self.registry = default_registry
+        self.status_table = StatusTable(
+            self.config.print_status_table,
+            mode=self.config.status_mode,
+            refresh_rate=self.config.status_refresh_rate,
+            summary_interval=self.config.status_summary_interval,
+        )
 
         self.ocr_map = {}
         self.file_path_map = {}
         self.processed_file_hashes = {}
+        # path: {"stat": [size, mtime_ns, inode], "hash": content hash}, the content hash is reused while the stat is unchanged
+        self.file_fingerprints = {}
+        # merged file path: {"inputs": [content hashes], "options": {...}}, see DocumentMerger.generate_directory_manifest
+        self.directory_manifests = {}
+        # perceptual hash of an image: content key of the first image with that perceptual hash, see ImageIdentity
+        self.perceptual_image_keys = {}
+        # image key: {"image_path": saved copy of the image, "outputs": [converted files containing it]}, see deferred_review
+        self.review_queue = {}
+        # "<table>/<key>": time the entry was last used, see record_cache_use and CacheMaintenance
+        self.last_used = {}
+        # output path: content hash of the input it was last converted from, see check_if_file_already_processed
+        self.output_hashes = {}
+        # hashes of the files that have been hashed during this run, so no file is hashed twice
+        self.run_file_hashes = {}
+        # the keys of last_used recorded during this run, so each entry's use is only written once
+        self.run_used_keys = set()
+
+        self.image_identity = ImageIdentity()
+        # OCR cache lookups and preprocessing seconds this run, see count_ocr_lookup and ocr_stats_summary
+        self.ocr_stats = Counter()
+        self.ocr_stats_lock = threading.Lock()
+        # stage timings, bytes and cache counters, see DocumentMergerConfig.instrumentation
+        self.instrumentation = Instrumentation(enabled=self.config.instrumentation)
+
+        self.cache = create_cache(self.config)
+        # worker processes are handed the maps of the parent converter instead of reading the cache file
+        if load_cache:
+            self.load_cache_file()
+
+        # started on the first PPTX conversion that uses LibreOffice
+        self.office_pool = None
+        # the file being written by the current conversion, images queued for review are traced back to it
+        self.current_output_path = None
+
+        # images are OCR'd on the calling thread when show_image prompts are shown, as tkinter prompts must stay on the main
+        # thread
+        self.ocr_pool = None
+        if self.config.ocr_workers > 1 and not self.config.prompts_for_images():
+            self.ocr_pool = OCRPool(self.config.ocr_workers)
+
+        if self.config.prompts_for_images():
+            import tkinter as tk
 
-        with open(self.config.cache_file_path, "r") as f:
-            try:
-                cache_data = json.load(f)
+            self.tk_root = tk.Tk()
+            self.tk_root.withdraw()
+        self.ocr_engine = create_ocr_engine(self.config)
 
-                self.ocr_map = cache_data["ocr_map"]
-                self.file_path_map = cache_data["file_path_map"]
-                self.processed_file_hashes = cache_data["processed_file_hashes"]
+    @property
+    def supported_input_types(self):
+        return self.registry.input_types()
 
-            except json.decoder.JSONDecodeError:
-                # exited halfway through writing to the file, so just reset it to {}
-                if len(f.read()) == 0:
-                    with open(self.config.cache_file_path, "w") as f:
-                        f.write("{}")
-                    print(f"JSON decode error on cache JSON, file has been reset")
-                else:
-                    print(
-                        f"JSON decode error on cache JSON, path {self.config.cache_file_path}"
-                    )
-                    exit()
+    @property
+    def supported_output_types(self):
+        return self.registry.output_types()
 
-        if self.config.show_image:
-            self.tk_root = tk.Tk()
-            self.tk_root.withdraw()
-        pytesseract.pytesseract.tesseract_cmd = self.config.tesseract_path
+    def load_cache_file(self):
+        self.set_cache_maps(self.cache.load())
+
+    def cache_maps(self):
+        """Returns the maps that are stored in the cache, i.e. {"ocr_map": self.ocr_map, ...}"""
+        return {table: getattr(self, table) for table in self.cache.tables}
+
+    def set_cache_maps(self, maps):
+        for table in self.cache.tables:
+            setattr(self, table, maps[table])
 
     def convert(
         self,
@@ -101,44 +182,54 @@ class Converter:
             return False
         elif output_type not in self.supported_output_types:
             print(
-                f"Unsupported output file type '{output_type}' (supported types are {', '.join(self.supported_input_types)})"
+                f"Unsupported output file type '{output_type}' (supported types are {', '.join(self.supported_output_types)})"
             )
             return False
 
-        # If file content has been processed in a different folder, return the path to that file
-        file_processed_path = self.check_if_file_already_processed(input_file_path)
-        if not file_processed_path:
-            # if the input and output types are the same, just copy the file into the temp directory
-            # notably, we don't run any OCR or internal file processing in this case
-            # the OCR may need to be rectified specifically for html to html
-            input_file_path = self.prepare_path(input_file_path, input_type)
-            output_file_path = self.prepare_path(
-                output_file_path, output_type, make_dirs=make_output_dirs
-            )
+        with self.instrumentation.span(
+            "convert", file=input_file_path, input_type=input_type
+        ):
+            # If file content has been processed in a different folder, return the path to that file
+            file_processed_path = self.check_if_file_already_processed(input_file_path)
+            if not file_processed_path:
+                # if the input and output types are the same, just copy the file into the temp directory
+                # notably, we don't run any OCR or internal file processing in this case
+                # the OCR may need to be rectified specifically for html to html
+                input_file_path = self.prepare_path(input_file_path, input_type)
+                output_file_path = self.prepare_path(
+                    output_file_path, output_type, make_dirs=make_output_dirs
+                )
+
+                conversion = self.registry.get(input_type, output_type)
+                if conversion is not None:
+                    conversion(self, input_file_path, output_file_path, ocr)
+                else:
+                    print(
+                        f"Invalid conversion type pair {input_type} and {output_type}"
+                    )
+                    output_file_path = None
 
-            if input_type == output_type:
-                shutil.copy2(input_file_path, output_file_path)
-            elif input_type == "pdf" and output_type == "html":
-                self._PDF_to_HTML(input_file_path, output_file_path, ocr)
-            elif input_type == "pdf" and output_type == "docx":
-                self._PDF_to_DOCX(input_file_path, output_file_path)
-            elif input_type == "docx" and output_type == "html":
-                self._DOCX_to_HTML(input_file_path, output_file_path)
-            elif input_type == "pptx" and output_type == "html":
-                self._PPTX_to_HTML(input_file_path, output_file_path)
+                if output_file_path and self.instrumentation.enabled:
+                    self.instrumentation.count(
+                        "bytes_read", os.path.getsize(input_file_path)
+                    )
+                    self.instrumentation.count(
+                        "bytes_written", os.path.getsize(output_file_path)
+                    )
             else:
-                print(f"Invalid conversion type pair {input_type} and {output_type}")
-                output_file_path = None
-        else:
-            self.status_table.update_statuses(
-                {
-                    "AP?": "✅",
-                    "File Name": input_file_path.split("\\")[-1],
-                },
-                reset_to={"AP?": "❌", "File Name": ""},
-            )
-            output_file_path = file_processed_path
+                self.status_table.update_statuses(
+                    {
+                        "AP?": "✅",
+                        "File Name": os.path.basename(input_file_path),
+                    },
+                    reset_to={"AP?": "❌", "File Name": ""},
+                )
+                output_file_path = file_processed_path
 
+        if output_file_path:
+            self.status_table.file_completed(
+                already_processed=bool(file_processed_path)
+            )
         return output_file_path
 
     def _conversion_setup(self, input_file_path, output_file_path):
@@ -147,12 +238,13 @@ class Converter:
         """
         self.status_table.update_statuses(
             {
-                "File Name": input_file_path.split("\\")[-1],
+                "File Name": os.path.basename(input_file_path),
                 "Input": input_file_path.split(".")[-1],
                 "Output": output_file_path.split(".")[-1],
                 "Status": "Converting",
             },
         )
+        self.current_output_path = output_file_path
 
     def _conversion_finish(self, input_file_path, output_file_path):
         self.map_processed_file(input_file_path, output_file_path)
@@ -163,9 +255,7 @@ class Converter:
 
         self._conversion_setup(input_file_path, output_file_path)
 
-        cv = pdf2docx_Converter(input_file_path)
-        cv.convert(output_file_path)
-        cv.close()
+        self._pdf2docx_convert(input_file_path, output_file_path)
 
         self._conversion_finish(input_file_path, output_file_path)
 
@@ -174,10 +264,9 @@ class Converter:
     def _DOCX_to_HTML(self, input_file_path, output_file_path):
         self._conversion_setup(input_file_path, output_file_path)
 
-        with open(output_file_path, "w", encoding="utf-8") as o_f:
-            with open(input_file_path, "rb") as f:
-                o_f.write(mammoth.convert_to_html(f).value)
-        self.created_files.append(output_file_path)
+        with open(input_file_path, "rb") as f:
+            html_text = self._DOCX_to_HTML_text(f)
+        self._write_output(output_file_path, html_text)
 
         self._conversion_finish(input_file_path, output_file_path)
 
@@ -186,28 +275,49 @@ class Converter:
     def _PPTX_to_PDF(self, input_file_path, output_file_path, formatType=32):
         self._conversion_setup(input_file_path, output_file_path)
 
-        powerpoint = comtypes.client.CreateObject("Powerpoint.Application")
-        deck = powerpoint.Presentations.Open(input_file_path, WithWindow=False)
-        deck.SaveAs(output_file_path, formatType)
-        deck.Close()
-        powerpoint.Quit()
+        with self.instrumentation.span(
+            "pptx_to_pdf", file=input_file_path, backend=self.config.pptx_backend
+        ):
+            if self.config.pptx_backend == "libreoffice":
+                self.get_office_pool().convert(input_file_path, output_file_path)
+            else:
+                # only importable on Windows
+                import comtypes.client
+
+                powerpoint = comtypes.client.CreateObject("Powerpoint.Application")
+                deck = powerpoint.Presentations.Open(input_file_path, WithWindow=False)
+                deck.SaveAs(output_file_path, formatType)
+                deck.Close()
+                powerpoint.Quit()
 
         self._conversion_finish(input_file_path, output_file_path)
 
         return True
 
+    def get_office_pool(self):
+        if self.office_pool is None:
+            process_factory = self.config.office_process_factory
+            if process_factory is None:
+                process_factory = functools.partial(
+                    OfficeProcess,
+                    unoserver_path=self.config.unoserver_path,
+                    unoconvert_path=self.config.unoconvert_path,
+                )
+            # a converter converts one file at a time, the worker_count processes run the conversions in parallel
+            self.office_pool = OfficeConverterPool(
+                1,
+                self.config.office_job_timeout,
+                process_factory=process_factory,
+            )
+        return self.office_pool
+
     # transitive (multiple steps)
     def _PDF_to_HTML(self, input_file_path, output_file_path, ocr=True):
         self._conversion_setup(input_file_path, output_file_path)
 
-        docx_intermediatary_path = self.change_ext(output_file_path, "docx")
-
-        self._PDF_to_DOCX(input_file_path, docx_intermediatary_path)
-        self._DOCX_to_HTML(docx_intermediatary_path, output_file_path)
-        os.remove(docx_intermediatary_path)
-
-        if ocr:
-            self.HTML_ocr(output_file_path)
+        self._write_output(
+            output_file_path, self._PDF_to_HTML_text(input_file_path, ocr=ocr)
+        )
 
         self._conversion_finish(input_file_path, output_file_path)
 
@@ -217,105 +327,362 @@ class Converter:
     def _PPTX_to_HTML(self, input_file_path, output_file_path, ocr=True):
         self._conversion_setup(input_file_path, output_file_path)
 
+        # PowerPoint can only save to a real path, the rest of the conversion stays in memory
         pdf_intermediatary_path = self.change_ext(output_file_path, "pdf")
 
         self._PPTX_to_PDF(input_file_path, pdf_intermediatary_path)
-        self._PDF_to_HTML(pdf_intermediatary_path, output_file_path, ocr=ocr)
-        os.remove(pdf_intermediatary_path)
+        try:
+            html_text = self._PDF_to_HTML_text(pdf_intermediatary_path, ocr=ocr)
+        finally:
+            os.remove(pdf_intermediatary_path)
+        self._write_output(output_file_path, html_text)
 
         self._conversion_finish(input_file_path, output_file_path)
 
         return True
 
+    # in-memory stages of the transitive conversions. These take and return buffers/strings, only the final output of a
+    # conversion is written to disk, and only the final input and output are added to the cache maps
+    def _PDF_to_DOCX_buffer(self, input_file_path):
+        self.status_table.update_status("Status", "Converting PDF to DOCX")
+
+        docx_buffer = BytesIO()
+        self._pdf2docx_convert(input_file_path, docx_buffer)
+
+        docx_buffer.seek(0)
+        return docx_buffer
+
+    def _pdf2docx_convert(self, input_file_path, docx_file):
+        """
+        Converts a PDF to DOCX with pdf2docx, splitting the pages across processes if the PDF is long enough.
+        docx_file (str | BinaryIO): path or buffer to write the DOCX to
+        """
+        with self.instrumentation.span("pdf2docx", file=input_file_path):
+            self._pdf2docx_convert_pages(input_file_path, docx_file)
+
+    def pdf_page_worker_count(self):
+        """Returns the number of processes of a page-parallel PDF conversion, see pdf_page_workers"""
+        if self.config.pdf_page_workers is not None:
+            return self.config.pdf_page_workers
+        # each of the worker_count processes converting files may be converting a PDF at the same time
+        return max(1, (os.cpu_count() or 1) // self.config.worker_count)
+
+    def _pdf2docx_convert_pages(self, input_file_path, docx_file):
+        cv = _import_pdf2docx()(input_file_path)
+        page_count = len(cv.fitz_doc)
+        threshold = self.config.pdf_parallel_page_threshold
+        workers = min(self.pdf_page_worker_count(), page_count)
+
+        if threshold is None or page_count < threshold or workers < 2:
+            cv.convert(docx_file)
+            cv.close()
+            return
+
+        self.status_table.update_status(
+            "Status", f"pdf2docx {page_count} pages ({workers} workers)"
+        )
+        # contiguous page ranges, one per worker
+        page_ranges = [
+            range(page_count * i // workers, page_count * (i + 1) // workers)
+            for i in range(workers)
+        ]
+
+        settings = cv.default_settings
+        with tempfile.TemporaryDirectory() as json_dir:
+            json_paths = [
+                os.path.join(json_dir, f"pages-{i}.json") for i in range(workers)
+            ]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                list(
+                    executor.map(
+                        _parse_pdf_pages,
+                        [input_file_path] * workers,
+                        page_ranges,
+                        json_paths,
+                    )
+                )
+
+            # stitch the parsed pages back together in page order
+            for json_path in json_paths:
+                cv.deserialize(json_path)
+
+        cv.make_docx(docx_file, **settings)
+        cv.close()
+
+    def _DOCX_to_HTML_text(self, docx_file):
+        """
+        docx_file (BinaryIO): an open DOCX file or a buffer containing one
+        """
+        import mammoth
+
+        self.status_table.update_status("Status", "Converting DOCX to HTML")
+        with self.instrumentation.span("mammoth", file=self.current_output_path):
+            return mammoth.convert_to_html(docx_file).value
+
+    def _PDF_to_HTML_text(self, input_file_path, ocr=True):
+        html_text = self._DOCX_to_HTML_text(self._PDF_to_DOCX_buffer(input_file_path))
+
+        if ocr:
+            html_text = self.ocr_html(html_text)
+
+        return html_text
+
+    def _write_output(self, output_file_path, text):
+        with open(output_file_path, "w", encoding="utf-8") as o_f:
+            o_f.write(text)
+        self.created_files.append(output_file_path)
+
     def HTML_ocr(self, output_file_path):
-        self.status_table.update_status("Status", f"Starting OCR")
         with open(output_file_path, "r", encoding="utf-8") as f:
             html_text = f.read()
 
-        base64_image_regex = r"\".*?base64, ?([^\"]*)\"[^>]*>"
+        html_text = self.ocr_html(html_text)
 
-        base64_images = re.findall(base64_image_regex, html_text)
+        with open(output_file_path, "w", encoding="utf-8") as f:
+            f.write(html_text)
 
-        if len(base64_images) > 0:
+    def ocr_html(self, html_text):
+        """
+        Returns html_text with the OCR text of each base64 image appended after its image tag.
+        The document is scanned once, and the output is joined once from a list of chunks, so the time taken is linear in
+        the size of the document rather than proportional to (number of images * size of document).
+        html_text (str): the HTML document to annotate
+        """
+        with self.instrumentation.span("ocr_html", file=self.current_output_path):
+            return self._ocr_html(html_text)
 
-            for i, unformatted_b64_img in enumerate(base64_images):
+    def _ocr_html(self, html_text):
+        self.status_table.update_status("Status", "Starting OCR")
 
-                # determine the indexes in the html to insert the OCR text
-                base64_image_end_indexes = list(
-                    m.end(0) for m in re.finditer(base64_image_regex, html_text)
-                )
-                base64_image_end_indexes.reverse()
+        # the end index of each image tag and its OCR text in document order, or a future that resolves to the OCR text
+        # if the image is queued in the OCR pool or in a batch
+        ocr_results = []
+        # image key: (future, image, ocr_entry, perceptual key) of the images waiting to be OCR'd in batches
+        pending_ocr = {}
 
-                # pad end of base64 string with "=" to fill up to length divisible by 4
-                b64_img = unformatted_b64_img
-                if missing_padding := len(unformatted_b64_img) % 4:
-                    b64_img += "=" * (4 - missing_padding)
+        for i, match in enumerate(base64_image_regex.finditer(html_text)):
+            image_bytes = self.image_identity.decode(match.group(1))
 
-                # if already parsed, return existing value
-                hashed_b64_string = zlib.adler32(bytes(b64_img, encoding="utf8"))
+            # if already parsed, return existing value
+            image_key = self.image_identity.content_key(image_bytes)
 
-                ocr_text = None
+            ocr_text = None
 
-                if hashed_b64_string in self.ocr_map:
-                    if not self.ocr_map[hashed_b64_string]["ignore"]:
-                        self.status_table.update_statuses(
-                            {"IMS?": "✅ Already", "Status": f"OCR ({i + 1})"}
-                        )
-                        ocr_text = self.ocr_map[hashed_b64_string]["text"]
-                    else:
-                        self.status_table.update_statuses(
-                            {"IMS?": "✅ Ignored", "Status": f"OCR ({i + 1})"}
-                        )
-                        html_text.replace(unformatted_b64_img, "")
+            if image_key in self.ocr_map:
+                self.count_ocr_lookup("hits")
+                self.record_cache_use("ocr_map", image_key)
+                if self.config.show_image and image_key in self.review_queue:
+                    self.add_review_output(image_key)
+                if not self.ocr_map[image_key]["ignore"]:
+                    self.status_table.update_statuses(
+                        {"IMS?": "✅ Already", "Status": f"OCR ({i + 1})"}
+                    )
+                    ocr_text = self.ocr_map[image_key]["text"]
                 else:
-                    # self.status_table.update_status("Status", f"OCR ({i + 1})")
                     self.status_table.update_statuses(
-                        {
-                            "IMS?": str(zlib.adler32(bytes(b64_img, encoding="utf8"))),
-                            "Status": f"OCR ({i + 1})",
-                        },
-                        show=False,
+                        {"IMS?": "✅ Ignored", "Status": f"OCR ({i + 1})"}
                     )
-                    # add ocr text of the image after the image tag
-                    ocr_text = self.base64_ocr(b64_img)
-
-                if ocr_text:
-                    html_text = (
-                        html_text[: base64_image_end_indexes[i]]
-                        + " OCR text: '"
-                        + ocr_text
-                        + "'"
-                        + html_text[base64_image_end_indexes[i] :]
+            else:
+                self.status_table.update_statuses(
+                    {
+                        "IMS?": image_key[:8],
+                        "Status": f"OCR ({i + 1})",
+                    },
+                    show=False,
+                )
+                if self.ocr_engine.batched:
+                    if image_key in pending_ocr:
+                        self.count_ocr_lookup("hits")
+                        ocr_text = pending_ocr[image_key][0]
+                    else:
+                        ocr_text, pending = self.prepare_image_ocr(
+                            image_bytes, image_key
+                        )
+                        if pending is not None:
+                            ocr_text = Future()
+                            pending_ocr[image_key] = (ocr_text, *pending)
+                elif self.ocr_pool is None:
+                    ocr_text = self.image_ocr(image_bytes, image_key)
+                else:
+                    # identical images share a single OCR job, even if the first one hasn't finished yet
+                    if self.ocr_pool.is_submitted(image_key):
+                        self.count_ocr_lookup("hits")
+                    ocr_text = self.ocr_pool.submit(
+                        image_key, self.image_ocr, image_bytes, image_key
                     )
 
+            ocr_results.append((match.end(0), ocr_text))
+
+        if pending_ocr:
+            self.ocr_batches(pending_ocr)
+
+        if len(ocr_results) == 0:
+            return html_text
+
+        chunks = []
+        previous_end = 0
+        for image_end, ocr_text in ocr_results:
+            if isinstance(ocr_text, Future):
+                ocr_text = ocr_text.result()
+
+            # add ocr text of the image after the image tag
+            if ocr_text:
+                chunks.append(html_text[previous_end:image_end])
+                chunks.append(self.ocr_annotation(ocr_text))
+                previous_end = image_end
+
+        chunks.append(html_text[previous_end:])
+
+        return "".join(chunks)
+
+    def ocr_annotation(self, ocr_text):
+        # appended after the image tag
+        return f" OCR text: '{ocr_text}'" if ocr_text else ""
+
+    def reannotate_output(self, output_file_path, previous_texts):
+        """
+        Replaces the OCR text of the given images in a converted file with their current OCR text in ocr_map, e.g. removes
+        it if the image is now ignored. The OCR text of other images is left as it is.
+        output_file_path (str): the converted HTML file
+        previous_texts (dict[str, str]): image key: the OCR text that was appended after the image when the file was written
+        """
+        with open(output_file_path, "r", encoding="utf-8") as f:
+            html_text = f.read()
+
+        chunks = []
+        previous_end = 0
+        for match in base64_image_regex.finditer(html_text):
+            image_key = self.hash_base64_image(match.group(1))
+            if image_key not in previous_texts:
+                continue
+
+            image_end = match.end(0)
+            chunks.append(html_text[previous_end:image_end])
+            previous_end = image_end
+
+            previous_annotation = self.ocr_annotation(previous_texts[image_key])
+            if previous_annotation and html_text.startswith(
+                previous_annotation, image_end
+            ):
+                previous_end += len(previous_annotation)
+
+            ocr_entry = self.ocr_map[image_key]
+            if not ocr_entry["ignore"]:
+                chunks.append(self.ocr_annotation(ocr_entry["text"]))
+
+        chunks.append(html_text[previous_end:])
+
         with open(output_file_path, "w", encoding="utf-8") as f:
-            f.write(html_text)
+            f.write("".join(chunks))
+
+    def hash_base64_image(self, b64_string):
+        return self.image_identity.content_key(self.image_identity.decode(b64_string))
+
+    def count_ocr_lookup(self, result):
+        """
+        result (str): "hits" for images found in ocr_map, "perceptual_hits" for images found by their perceptual hash,
+            "misses" for images that had to be processed, "no_text_skips" for misses that the text likelihood filter
+            skipped
+        """
+        with self.ocr_stats_lock:
+            self.ocr_stats[result] += 1
+        self.instrumentation.count(f"ocr_map_{result}")
+
+    def ocr_stats_summary(self):
+        hits = self.ocr_stats["hits"] + self.ocr_stats["perceptual_hits"]
+        lookups = hits + self.ocr_stats["misses"]
+        hit_rate = hits / lookups if lookups else 0
+        summary = (
+            f"OCR cache: {self.ocr_stats['hits']} hits, {self.ocr_stats['perceptual_hits']} perceptual hits, "
+            f"{self.ocr_stats['misses']} misses ({hit_rate:.1%} hit rate)"
+        )
+        if self.config.text_likelihood_filter is not None:
+            summary += f", {self.ocr_stats['no_text_skips']} misses skipped as unlikely to contain text"
+        if self.config.ocr_preprocessor is not None:
+            step_times = ", ".join(
+                f"{step} {self.ocr_stats[f'preprocess_{step}_seconds']:.2f} s"
+                for step in self.config.ocr_preprocessor.steps
+            )
+            summary += f"\nOCR preprocessing: {step_times}"
+        return summary
 
     def base64_ocr(self, b64_string):
-        hashed_b64_string = zlib.adler32(bytes(b64_string, encoding="utf8"))
+        image_bytes = self.image_identity.decode(b64_string)
+        return self.image_ocr(image_bytes, self.image_identity.content_key(image_bytes))
+
+    def image_ocr(self, image_bytes, image_key):
+        """
+        Returns the OCR text of an image, adding it to ocr_map.
+        image_bytes (bytes): the decoded image
+        image_key (str): the content key of the image, see ImageIdentity.content_key
+        """
+        ocr_text, pending = self.prepare_image_ocr(image_bytes, image_key)
+        if pending is None:
+            return ocr_text
+
+        img, ocr_entry, perceptual_key = pending
+        ocr_text = self.recognize_images([img])[0]
+        return self.finish_image_ocr(image_key, ocr_entry, perceptual_key, ocr_text)
+
+    def prepare_image_ocr(self, image_bytes, image_key):
+        """
+        Decides whether an image needs to be OCR'd, prompting the user or queueing the image for review if show_image is set.
+        Returns (OCR text, None) if the image doesn't need to be OCR'd, in which case it has been added to ocr_map, or
+        (None, (image, ocr_entry, perceptual key)) to be OCR'd and passed to finish_image_ocr.
+        image_bytes (bytes): the decoded image
+        image_key (str): the content key of the image, see ImageIdentity.content_key
+        """
+        from PIL import Image
 
-        # convert base64 to bytes, convert bytes to a PIL image object
-        img = Image.open(BytesIO(base64.b64decode(b64_string)))
+        # convert bytes to a PIL image object
+        img = Image.open(BytesIO(image_bytes))
         w, h = img.size
 
-        ocr_text = ""
+        # a near-identical image has already been processed, reuse its result
+        perceptual_key = None
+        if self.config.perceptual_ocr_lookup:
+            perceptual_key = self.image_identity.perceptual_key(img)
+            matched_key = self.perceptual_image_keys.get(perceptual_key)
+            if matched_key is not None and matched_key in self.ocr_map:
+                self.count_ocr_lookup("perceptual_hits")
+                ocr_entry = self.ocr_map[matched_key]
+                self.ocr_map[image_key] = ocr_entry
+                self.record_cache_use("ocr_map", matched_key)
+                self.record_cache_use("ocr_map", image_key)
+                self.status_table.update_status("IMS?", "✅ Similar")
+                return ("" if ocr_entry["ignore"] else ocr_entry["text"]), None
+
+        self.count_ocr_lookup("misses")
 
         ignore = self.config.determine_ignore_image(w, h)
-        self.ocr_map[hashed_b64_string] = {
+        # only added to ocr_map once complete, as the image may be OCR'd on another thread
+        ocr_entry = {
             "text": "",
             "ignore": ignore,
             "seen": False,
         }
+
+        # cheap check for images that are very unlikely to contain text, e.g. photos, which OCR to an empty string
+        no_text = False
+        if not ignore and self.config.text_likelihood_filter is not None:
+            no_text = not self.config.text_likelihood_filter(img)
+            if no_text:
+                ignore = True
+                ocr_entry["ignore"] = True
+                ocr_entry["no_text"] = True
+                self.count_ocr_lookup("no_text_skips")
         # save image to file if image_output_path exists
         if self.config.image_output_path:
             if os.path.exists(self.config.image_output_path):
                 img.save(
-                    os.path.join(
-                        self.config.image_output_path, f"{hashed_b64_string}.png"
-                    )
+                    os.path.join(self.config.image_output_path, f"{image_key}.png")
                 )
 
-        if self.config.show_image and not ignore:
+        if self.config.prompts_for_images() and not ignore:
+            import tkinter as tk
+            from tkinter import simpledialog
+            from PIL import ImageTk
+
             # create a new Toplevel window
             top = tk.Toplevel(self.tk_root)
 
@@ -340,52 +707,203 @@ class Converter:
 
             # "" = don't ignore, any char but n = ignore, n = don't ignore
             ignore = response != "" and "n" not in response.lower()
+            ocr_entry["ignore"] = ignore
+            ocr_entry["seen"] = True
 
             # exit for this session, value of config.show_image in file stays the same
             if response.lower() == "exit":
+                self.ocr_map[image_key] = ocr_entry
                 self.write_to_cache_file()
                 self.tk_root.quit()
                 self.config.show_image = False
 
-            self.ocr_map[hashed_b64_string]["seen"] = True
-
+        elif no_text:
+            self.status_table.update_status("IMS?", f"✅ no text {w}, {h}")
         elif ignore:
             self.status_table.update_status("IMS?", f"✅ small {w}, {h}")
+        elif self.config.show_image:
+            # deferred review, the image is OCR'd now and the user decides whether to ignore it later
+            self.queue_for_review(img, image_key)
 
         if not ignore:
-            # actually run OCR
-            ocr_text = pytesseract.image_to_string(img)
+            return None, (img, ocr_entry, perceptual_key)
+
+        return self.finish_image_ocr(image_key, ocr_entry, perceptual_key, ""), None
 
+    def finish_image_ocr(self, image_key, ocr_entry, perceptual_key, ocr_text):
+        """Adds the OCR text of an image to ocr_map and returns it, see prepare_image_ocr"""
+        if not ocr_entry["ignore"]:
             self.status_table.update_status(
                 "OCR Text", ocr_text.replace("\n", " "), reset_to=" "
             )
 
-            self.status_table.update_status("IMS?", f"❌", show=False)
+            self.status_table.update_status("IMS?", "❌", show=False)
 
-            self.ocr_map[hashed_b64_string]["text"] = ocr_text
+            ocr_entry["text"] = ocr_text
+
+        self.ocr_map[image_key] = ocr_entry
+        self.record_cache_use("ocr_map", image_key)
+        if perceptual_key is not None:
+            self.perceptual_image_keys[perceptual_key] = image_key
 
         return ocr_text
 
+    def queue_for_review(self, img, image_key):
+        """
+        Saves an image to review_path and adds it to review_queue, see DocumentMerger.review
+        img (PIL.Image.Image): the image
+        image_key (str): the content key of the image
+        """
+        image_path = os.path.join(self.config.review_path, f"{image_key}.png")
+        if not os.path.exists(image_path):
+            img.save(image_path)
+        self.status_table.update_status("IMS?", "🕑 Queued for review", show=False)
+
+        self.review_queue[image_key] = {
+            "image_path": image_path,
+            "outputs": ([self.current_output_path] if self.current_output_path else []),
+        }
+
+    def add_review_output(self, image_key):
+        # a queued image has been found in another converted file, which must also be updated once it is reviewed
+        review_entry = self.review_queue[image_key]
+        if (
+            self.current_output_path
+            and self.current_output_path not in review_entry["outputs"]
+        ):
+            review_entry["outputs"].append(self.current_output_path)
+            # the sqlite cache returns a copy, so the entry is assigned back
+            self.review_queue[image_key] = review_entry
+
+    def recognize_images(self, imgs):
+        """Returns the OCR text of each image, after preprocessing them if an ocr_preprocessor is set"""
+        if self.config.ocr_preprocessor is not None:
+            processed = []
+            for img in imgs:
+                img, timings = self.config.ocr_preprocessor.process(img)
+                processed.append(img)
+                with self.ocr_stats_lock:
+                    for step, seconds in timings.items():
+                        self.ocr_stats[f"preprocess_{step}_seconds"] += seconds
+            imgs = processed
+
+        with self.instrumentation.span(
+            "ocr", file=self.current_output_path, images=len(imgs)
+        ):
+            return self.ocr_engine.recognize_batch(imgs)
+
+    def ocr_batches(self, pending_ocr):
+        """
+        OCRs the pending images of a document in batches of ocr_batch_size, on the OCR pool if there is one.
+        pending_ocr (dict): image key: (future, image, ocr_entry, perceptual key), each future is given the OCR text
+        """
+        items = list(pending_ocr.items())
+        batch_size = self.config.ocr_batch_size
+        batches = [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+
+        if self.ocr_pool is None:
+            for batch in batches:
+                self.ocr_batch(batch)
+        else:
+            for future in [
+                self.ocr_pool.executor.submit(self.ocr_batch, batch)
+                for batch in batches
+            ]:
+                future.result()
+
+    def ocr_batch(self, batch):
+        try:
+            ocr_texts = self.recognize_images([img for _, (_, img, _, _) in batch])
+        except BaseException as e:
+            # don't leave the document waiting on results that will never arrive
+            for _, (future, *_) in batch:
+                future.set_exception(e)
+            raise
+
+        for (image_key, (future, _, ocr_entry, perceptual_key)), ocr_text in zip(
+            batch, ocr_texts
+        ):
+            future.set_result(
+                self.finish_image_ocr(image_key, ocr_entry, perceptual_key, ocr_text)
+            )
+
+    def close(self):
+        """Stops the OCR threads and office processes of this converter, closes the cache and stops the live status table"""
+        if self.ocr_pool is not None:
+            self.ocr_pool.shutdown()
+        if self.office_pool is not None:
+            self.office_pool.shutdown()
+        self.cache.close()
+        self.status_table.close()
+
     def change_ext(self, file, new_extension):
         return f"{file[0:file.rfind('.')]}.{new_extension.replace('.', '')}"
 
+    def record_cache_use(self, table, key):
+        """
+        Records that a cache entry was written or looked up, so that CacheMaintenance evicts the entries that haven't been
+        used for longest first.
+        table (str): the cache map of the entry, e.g. "ocr_map"
+        key (str): its key
+        """
+        used_key = f"{table}/{key}"
+        if used_key not in self.run_used_keys:
+            self.run_used_keys.add(used_key)
+            self.last_used[used_key] = int(time.time())
+
     def write_to_cache_file(self):
         self.status_table.update_status("Status", "Writing cache")
-        with open(self.config.cache_file_path, "w") as cache_file:
-            cache_file.write(
-                json.dumps(
-                    {
-                        "ocr_map": self.ocr_map,
-                        "file_path_map": self.file_path_map,
-                        "processed_file_hashes": self.processed_file_hashes,
-                    },
-                    indent=4,
-                )
-            )
+        with self.instrumentation.span("cache_write"):
+            self.cache.save(self.cache_maps())
+
+    def generate_file_hash(self, file_path, file_size=None):
+        partial_hash_min_size = self.config.partial_hash_min_size
+        if partial_hash_min_size is not None:
+            if file_size is None:
+                file_size = os.path.getsize(file_path)
+            if file_size >= partial_hash_min_size:
+                return self.generate_partial_file_hash(file_path, file_size)
+
+        with self.instrumentation.span("hash", file=file_path):
+            with open(file_path, "rb", buffering=0) as f:
+                file_hash = hashlib.file_digest(f, "sha256").hexdigest()
+                self.instrumentation.count("bytes_hashed", f.tell())
+        return file_hash
+
+    def generate_partial_file_hash(self, file_path, file_size):
+        # hash of the size, the first block and the last block of the file, prefixed so it can't equal a full hash
+        file_hash = hashlib.sha256(str(file_size).encode())
+        with open(file_path, "rb") as f:
+            file_hash.update(f.read(PARTIAL_HASH_BLOCK_SIZE))
+            f.seek(max(file_size - PARTIAL_HASH_BLOCK_SIZE, 0))
+            file_hash.update(f.read(PARTIAL_HASH_BLOCK_SIZE))
+        return f"partial:{file_hash.hexdigest()}"
+
+    def get_file_fingerprint(self, file_path):
+        stat = os.stat(file_path)
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def get_file_hash(self, file_path):
+        """
+        Returns the content hash of a file. A file is hashed at most once per run, and not at all if its size, modification
+        time and inode match the fingerprint stored when it was last hashed.
+        file_path (str): absolute path of the file
+        """
+        if file_path in self.run_file_hashes:
+            return self.run_file_hashes[file_path]
+
+        fingerprint = self.get_file_fingerprint(file_path)
+        stored_fingerprint = self.file_fingerprints.get(file_path)
+
+        if stored_fingerprint is not None and stored_fingerprint["stat"] == fingerprint:
+            file_hash = stored_fingerprint["hash"]
+        else:
+            file_hash = self.generate_file_hash(file_path, file_size=fingerprint[0])
+            self.file_fingerprints[file_path] = {"stat": fingerprint, "hash": file_hash}
 
-    def generate_file_hash(self, file_path):
-        with open(file_path, "rb", buffering=0) as f:
-            return hashlib.file_digest(f, "sha256").hexdigest()
+        self.run_file_hashes[file_path] = file_hash
+        self.record_cache_use("file_fingerprints", file_path)
+        return file_hash
 
     def map_processed_file(self, in_file_path, out_file_path):
         if out_file_path.split(".")[-1] == self.config.main_output_type:
@@ -393,20 +911,45 @@ class Converter:
 
             # key: the hash of the content of the processed file
             # value: the location of the processed file, "look here instead"
-            self.processed_file_hashes[self.generate_file_hash(in_file_path)] = (
-                out_file_path
-            )
+            file_hash = self.get_file_hash(in_file_path)
+            self.processed_file_hashes[file_hash] = out_file_path
+            self.output_hashes[out_file_path] = file_hash
+            self.record_cache_use("file_path_map", in_file_path)
+            self.record_cache_use("processed_file_hashes", file_hash)
 
     def check_if_file_already_processed(self, file_path):
         # check if file path has been seen before, alternatively check if the (hashed) file content has been seen before
-        if file_path in self.file_path_map:
-            return self.file_path_map[file_path]
-        else:
-            file_hash = self.generate_file_hash(file_path)
-            if file_hash in self.processed_file_hashes:
-                return self.processed_file_hashes[file_hash]
-            else:
-                return False
+        # either is only trusted if its output was last converted from the file's current content, as an output is
+        # overwritten when its input changes, while older versions and copies of the input still map to it. The file's
+        # fingerprint can't tell whether it changed since it was converted, as it is refreshed whenever the file is
+        # hashed, e.g. for the directory manifest before the file is converted. get_file_hash only hashes the file again
+        # if its fingerprint changed
+        # outputs must also still exist, as they are deleted along with the temporary files when keep_temp_files is off.
+        # The conversion that follows a stale hit maps the file to its new output
+        file_hash = self.get_file_hash(file_path)
+        output_path = self.file_path_map.get(file_path)
+        if output_path is not None and self.output_is_current(output_path, file_hash):
+            self.instrumentation.count("path_map_hits")
+            self.record_cache_use("file_path_map", file_path)
+            return output_path
+
+        self.instrumentation.count("path_map_misses")
+        output_path = self.processed_file_hashes.get(file_hash)
+        if output_path is not None:
+            if self.output_is_current(output_path, file_hash):
+                self.instrumentation.count("content_hash_hits")
+                self.record_cache_use("processed_file_hashes", file_hash)
+                return output_path
+            self.instrumentation.count("stale_outputs")
+
+        self.instrumentation.count("content_hash_misses")
+        return False
+
+    def output_is_current(self, output_path, file_hash):
+        # outputs converted before output_hashes was stored are converted again
+        return self.output_hashes.get(output_path) == file_hash and os.path.exists(
+            output_path
+        )
 
     def prepare_path(self, path, new_extension=None, make_dirs=False):
         if make_dirs:
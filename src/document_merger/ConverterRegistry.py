@@ -0,0 +1,103 @@
+import shutil
+import importlib
+
+
+class ConverterRegistry:
+    """Maps each pair of input and output file types to the conversion between them, for Converter.convert.
+
+    A conversion is called as conversion(converter, input_file_path, output_file_path, ocr) with absolute paths, and
+    writes output_file_path. It can be registered as a function, or as a "module:function" string that is only imported
+    the first time a file of that type is converted, so that the dependencies of a conversion aren't imported with the
+    package. Conversions that should be cached call converter.map_processed_file(input_file_path, output_file_path).
+
+    Other packages register conversions through the "document_merger.converters" entry point group. Each entry point is
+    a function that takes the registry, e.g. in pyproject.toml:
+        [project.entry-points."document_merger.converters"]
+        markdown = "my_package.document_merger_plugin:register"
+    where register(registry) calls registry.register("md", "html", "my_package.markdown:convert"). Entry points are
+    loaded the first time the registered types are looked up, in every process that converts files, including the
+    worker processes of DocumentMerger. Conversions registered by calling register() directly are only known to worker
+    processes if they are registered when the module doing it is imported.
+    """
+
+    entry_point_group = "document_merger.converters"
+
+    def __init__(self):
+        # (input type, output type): conversion function or "module:function"
+        self.conversions = {}
+        self.entry_points_loaded = False
+
+    def register(self, input_type, output_type, conversion):
+        """
+        Registers a conversion, replacing any conversion already registered for the same types.
+        input_type (str): extension of the input files, without the dot, e.g. "pdf"
+        output_type (str): extension of the output files, e.g. "html"
+        conversion (Callable | str): the conversion, or its "module:function" import path
+        """
+        self.conversions[(input_type.lower(), output_type.lower())] = conversion
+
+    def load_entry_points(self):
+        if self.entry_points_loaded:
+            return
+        self.entry_points_loaded = True
+
+        from importlib.metadata import entry_points
+
+        for entry_point in entry_points(group=self.entry_point_group):
+            try:
+                entry_point.load()(self)
+            except Exception as e:
+                # a broken plugin shouldn't stop the built-in conversions from working
+                print(f"Couldn't load converter plugin '{entry_point.name}': {e}")
+
+    def get(self, input_type, output_type):
+        """Returns the conversion between two file types, importing it if it was registered by name, or None"""
+        self.load_entry_points()
+        key = (input_type.lower(), output_type.lower())
+        conversion = self.conversions.get(key)
+        if isinstance(conversion, str):
+            module_name, _, function_name = conversion.partition(":")
+            conversion = getattr(importlib.import_module(module_name), function_name)
+            self.conversions[key] = conversion
+        return conversion
+
+    def input_types(self):
+        self.load_entry_points()
+        return tuple(dict.fromkeys(input_type for input_type, _ in self.conversions))
+
+    def output_types(self):
+        self.load_entry_points()
+        return tuple(dict.fromkeys(output_type for _, output_type in self.conversions))
+
+
+# the built-in conversions are methods of Converter, which import pdf2docx, mammoth and PowerPoint's COM interface when
+# they are first used
+def copy_file(converter, input_file_path, output_file_path, ocr):
+    # notably, we don't run any OCR or internal file processing in this case
+    # the OCR may need to be rectified specifically for html to html
+    shutil.copy2(input_file_path, output_file_path)
+
+
+def pdf_to_html(converter, input_file_path, output_file_path, ocr):
+    converter._PDF_to_HTML(input_file_path, output_file_path, ocr)
+
+
+def pdf_to_docx(converter, input_file_path, output_file_path, ocr):
+    converter._PDF_to_DOCX(input_file_path, output_file_path)
+
+
+def docx_to_html(converter, input_file_path, output_file_path, ocr):
+    converter._DOCX_to_HTML(input_file_path, output_file_path)
+
+
+def pptx_to_html(converter, input_file_path, output_file_path, ocr):
+    converter._PPTX_to_HTML(input_file_path, output_file_path, ocr)
+
+
+# the registry used by every Converter
+default_registry = ConverterRegistry()
+default_registry.register("pdf", "html", pdf_to_html)
+default_registry.register("html", "html", copy_file)
+default_registry.register("pptx", "html", pptx_to_html)
+default_registry.register("docx", "html", docx_to_html)
+default_registry.register("pdf", "docx", pdf_to_docx)
@@ -1,27 +1,138 @@
 import os
-import re
+import json
 import shutil
+import tempfile
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+import multiprocessing.util
+from urllib.parse import quote
 
 from .Converter import Converter
+from .CacheMaintenance import CacheMaintenance
 from .StatusTable import StatusTable
+from .StreamingImageFilter import StreamingImageFilter
+from .ImageStore import ImageStore
+from .SearchIndex import SearchIndex, HTMLTextExtractor
+from .ShardedOutput import ShardedOutput
+from .FileDiscovery import FileDiscovery, normalise_path
+from .FileWatcher import create_file_watcher
 
 import logging
 
 import time
 
+# number of characters read from each input file at a time when merging
+MERGE_CHUNK_SIZE = 1024 * 1024
+
+# converter owned by each worker process of DocumentMerger.convert_files_parallel
+_worker_converter = None
+# number of the parent's cache changes that have been applied to the worker's maps, see DocumentMerger.pool_cache_changes
+_worker_changes_applied = 0
+
+
+def _init_conversion_worker(config, maps, status_queue):
+    global _worker_converter
+    logging.getLogger().setLevel(logging.ERROR)
+    if status_queue is not None:
+        StatusTable.forward_updates(status_queue)
+
+    # maps is None when the cache can be opened by each worker, otherwise it is a copy of the parent converter's maps
+    _worker_converter = Converter(config, load_cache=maps is None)
+    if maps is not None:
+        _worker_converter.set_cache_maps(maps)
+
+    # pool workers exit without running atexit handlers, but do run multiprocessing finalizers. This stops any office
+    # processes the worker started
+    multiprocessing.util.Finalize(None, _worker_converter.close, exitpriority=10)
+
+
+def _convert_in_worker(
+    input_file_path, output_file_path, output_type, changes_dir=None, change_count=0
+):
+    """
+    Converts a single file in a worker process. Returns the converted path along with the entries that the conversion
+    added to each cache map (ocr_map, file_path_map, etc.), so that they can be merged into the parent converter, and the
+    OCR stats and instrumentation recorded while converting it.
+    changes_dir (str | None): directory of the changes made to the parent's maps since the pool started, see
+        DocumentMerger.pool_cache_changes
+    change_count (int): number of changes in changes_dir, those that the worker hasn't applied yet are applied first
+    """
+    global _worker_changes_applied
+    converter = _worker_converter
+    converter.ocr_stats.clear()
+    converter.instrumentation.reset()
+    base_maps = converter.cache_maps()
+
+    for number in range(_worker_changes_applied, change_count):
+        with open(os.path.join(changes_dir, f"{number}.json"), encoding="utf-8") as f:
+            for table, changed in json.load(f).items():
+                base_maps[table].update(changed)
+    _worker_changes_applied = max(_worker_changes_applied, change_count)
+
+    # lookups fall through to the worker's maps, writes are collected in the first map of each ChainMap
+    converter.set_cache_maps({table: ChainMap({}, m) for table, m in base_maps.items()})
+
+    try:
+        converted_path = converter.convert(
+            input_file_path,
+            output_file_path,
+            output_type=output_type,
+            make_output_dirs=True,
+        )
+        changes = {table: m.maps[0] for table, m in converter.cache_maps().items()}
+    finally:
+        converter.set_cache_maps(base_maps)
+
+    # keep the changes so that later files converted by this worker can reuse them
+    for table, changed in changes.items():
+        base_maps[table].update(changed)
+
+    return (
+        converted_path,
+        changes,
+        converter.ocr_stats.copy(),
+        converter.instrumentation.snapshot(),
+    )
+
 
 class DocumentMerger:
     def __init__(self, config):
         self.config = config
         self.config.initialise_files()
 
-        self.status_table = StatusTable(self.config.print_status_table)
+        self.status_table = StatusTable(
+            self.config.print_status_table,
+            mode=self.config.status_mode,
+            refresh_rate=self.config.status_refresh_rate,
+            summary_interval=self.config.status_summary_interval,
+        )
         self.converter = Converter(self.config)
+        self.discovery = FileDiscovery(self.config)
+        self.search_index = None
+        if self.config.search_index_path is not None:
+            self.search_index = SearchIndex(self.config.search_index_path)
+
+        # worker processes of convert_files_parallel, shared by the directories of a process_directories run
+        self.conversion_pool = None
+        self.pool_status_queue = None
+        # the converter's maps as they were when the pool started, None when the workers open the cache themselves
+        self.pool_base_maps = None
+        # directory of the changes made to the converter's maps since the pool started, see pool_cache_changes
+        self.pool_changes_dir = None
+        self.pool_change_count = 0
 
-    def merge_html_files(self, input_dir_paths, output_file_path):
+    def merge_html_files(self, input_dir_paths, output_file_path, source_paths=None):
+        """
+        Merges HTML files into output_file_path, along with its imageless version and image assets if they are enabled.
+        input_dir_paths (list[str] | str): the converted HTML files to merge, in order
+        output_file_path (str): the merged file
+        source_paths (list[str] | None): the input file that each converted file was converted from, which is needed to
+            index the merged file for search
+        """
         self.status_table.update_statuses(
             {
-                "File Name": f"{output_file_path.split('\\')[-1]}",
+                "File Name": os.path.basename(output_file_path),
                 "Status": "Merging HTML",
                 "Input": "html",
                 "Output": "html",
@@ -40,140 +151,720 @@ class DocumentMerger:
         #     )
         html_files = input_dir_paths
 
-        # empty out HTML file before writing to prevent a single file from storing multiple outputs
-        with open(output_file_path, "w", encoding="utf8") as out_f:
-            out_f.write("")
+        imageless_file_path = None
+        if self.config.create_imageless_version:
+            imageless_file_path = output_file_path.replace(".html", " (Imageless).html")
+            self.status_table.update_status("Status", "Merging HTML and imageless HTML")
 
-        # iterate over all html files and append to merged html file
-        with open(output_file_path, "a+", encoding="utf8") as out_f:
-            for html_file in html_files:
-                # this is bad practise but hey, it works. Ideally i'd make a function that tries this and is used for all file opens
-                encoding = "utf8"
-                try:
-                    out_html = open(html_file, "r", encoding="utf8")
-                except UnicodeDecodeError:
-                    encoding = None
-                    out_html = open(html_file, "r", encoding=encoding)
+        sharded_output = None
+        if self.config.merge_shards is not None:
+            sharded_output = ShardedOutput(
+                output_file_path, self.config.merge_shards, self.config.shard_max_size
+            )
 
-                out_f.write(out_html.read())
-            # created_files.append(input_dir_path)
+        image_store = None
+        if self.config.externalize_images:
+            asset_path = ImageStore.asset_path_for(output_file_path)
+            # parts are a directory below the merged file
+            asset_url = None
+            if sharded_output is not None:
+                asset_url = f"../{quote(os.path.basename(asset_path))}"
+            image_store = ImageStore(asset_path, asset_url)
 
-        self.status_table.update_status("Status", "Done")
+        # (source path, version, text, file containing its anchor) of each converted file, see SearchIndex.update
+        search_entries = None
+        if self.search_index is not None and source_paths is not None:
+            search_entries = []
+            self.status_table.update_status("Status", "Merging and indexing HTML")
+        # converted files are identified by themselves if their inputs aren't known
+        if source_paths is None:
+            source_paths = html_files
 
-        if self.config.create_imageless_version:
-            imageless_file_path = output_file_path.replace(".html", " (Imageless).html")
-            self.status_table.update_statuses(
-                {
-                    "File Name": imageless_file_path.split("\\")[-1],
-                    "Status": "Creating imageless HTML",
-                    "Input": "html",
-                    "Output": "html",
-                },
-            )
+        def append(i, out_f, document_path):
+            """
+            Appends the converted file html_files[i] to out_f, after an anchor that search results and the table of contents
+            of a sharded output link to. out_f is None for an unchanged part, whose files are only read if the imageless
+            file or the search index need them.
+            """
+            if search_entries is not None or sharded_output is not None:
+                anchor = f'<a id="{SearchIndex.anchor(source_paths[i])}"></a>'
+                for f in (out_f, imageless_f):
+                    if f is not None:
+                        f.write(anchor)
+
+            # the text of converted files that haven't changed since they were indexed is kept as it is
+            extract_text = False
+            if search_entries is not None:
+                version = SearchIndex.version(html_files[i])
+                extract_text = not self.search_index.is_current(
+                    output_file_path, source_paths[i], version
+                )
+
+            text = None
+            if out_f is not None or imageless_f is not None or extract_text:
+                text = self.append_html_file(
+                    html_files[i], out_f, imageless_f, image_store, extract_text
+                )
+            if search_entries is not None:
+                search_entries.append((source_paths[i], version, text, document_path))
 
-            with open(imageless_file_path, "w", encoding="utf8") as f:
-                with open(
+        # both outputs are written in the same pass over the input files, opening them with "w" empties out any
+        # previous output to prevent a single file from storing multiple outputs
+        instrumentation = self.converter.instrumentation
+        with instrumentation.span("merge", file=output_file_path), ExitStack() as stack:
+            imageless_f = None
+            if imageless_file_path:
+                imageless_f = stack.enter_context(
+                    open(imageless_file_path, "w", encoding="utf8", errors="ignore")
+                )
+
+            if sharded_output is None:
+                out_f = stack.enter_context(
+                    open(output_file_path, "w", encoding="utf8")
+                )
+                # iterate over all html files and append to merged html file
+                for i in range(len(html_files)):
+                    append(i, out_f, output_file_path)
+            else:
+                self.write_parts(
+                    sharded_output, html_files, source_paths, image_store, append
+                )
+                sharded_output.finish(
+                    os.path.basename(os.path.dirname(output_file_path))
+                )
+
+        if search_entries is not None:
+            with instrumentation.span("index", file=output_file_path):
+                self.search_index.update(
                     output_file_path,
-                    "r",
-                    encoding="utf8",
-                    errors="ignore",
-                ) as existing_html:
-                    f.write(
-                        re.sub(
-                            r'<img src=".*?base64, ?[^"]*"[^>]*>',
-                            "",
-                            existing_html.read(),
+                    os.path.basename(os.path.dirname(output_file_path)),
+                    search_entries,
+                )
+
+        if image_store is not None:
+            # images that were removed from the inputs since the last merge
+            image_store.remove_unused()
+
+        if instrumentation.enabled:
+            instrumentation.count(
+                "bytes_merged", sum(os.path.getsize(f) for f in html_files)
+            )
+            if image_store is not None:
+                instrumentation.count("bytes_images_stored", image_store.stored_bytes)
+                instrumentation.count(
+                    "bytes_images_externalized", image_store.replaced_bytes
+                )
+
+        self.status_table.update_status("Status", "Done")
+
+    def write_parts(
+        self, sharded_output, html_files, source_paths, image_store, append
+    ):
+        """
+        Writes the parts of a sharded merged file. A part whose inputs haven't changed is kept as it is.
+        sharded_output (ShardedOutput): the parts
+        html_files (list[str]): the converted files to merge, in order
+        source_paths (list[str]): the input file of each converted file
+        image_store (ImageStore | None): the store of the images referenced by the parts
+        append (Callable[[int, TextIO | None, str], None]): appends html_files[i] to a part, see merge_html_files
+        """
+        sizes = [os.path.getsize(f) for f in html_files]
+        options = json.dumps(self.merge_options(), sort_keys=True)
+
+        for indices in sharded_output.plan(sizes, source_paths):
+            key = json.dumps(
+                [
+                    options,
+                    [
+                        (
+                            source_paths[i],
+                            html_files[i],
+                            self.converter.get_file_fingerprint(html_files[i]),
                         )
+                        for i in indices
+                    ],
+                ]
+            )
+            part_path = sharded_output.part_path(key)
+
+            if os.path.exists(part_path):
+                if image_store is not None:
+                    # keep the images the part references
+                    image_store.record_references(part_path)
+                for i in indices:
+                    append(i, None, part_path)
+            else:
+                # written under a temporary name, so that an interrupted part isn't mistaken for a finished one
+                temp_path = f"{part_path}.tmp"
+                with open(temp_path, "w", encoding="utf8") as part_f:
+                    for i in indices:
+                        append(i, part_f, part_path)
+                os.replace(temp_path, part_path)
+
+            sharded_output.add_part(
+                part_path,
+                [
+                    (source_paths[i], SearchIndex.anchor(source_paths[i]))
+                    for i in indices
+                ],
+                sum(sizes[i] for i in indices),
+            )
+
+    def append_html_file(
+        self, html_file, out_f, imageless_f=None, image_store=None, extract_text=False
+    ):
+        """
+        Copies html_file onto the end of out_f in fixed size chunks, so that memory use doesn't depend on the size of the file.
+        Returns the text of html_file if extract_text is set, otherwise None.
+        html_file (str): path of the HTML file to copy
+        out_f (TextIO | None): the merged HTML file, None to only write imageless_f or extract the text
+        imageless_f (TextIO | None): the merged imageless HTML file, which is written the same chunks with base64 images removed
+        image_store (ImageStore | None): where to write the base64 images of out_f, which are replaced with references to
+            the stored files. None keeps them inline
+        extract_text (bool): Flag to collect the text of html_file, without its tags and images, as it is copied
+        """
+        output_files = [f for f in (out_f, imageless_f) if f is not None]
+        start_positions = [f.tell() for f in output_files]
+
+        # this is bad practise but hey, it works. Ideally i'd make a function that tries this and is used for all file opens
+        for encoding in ("utf8", None):
+            try:
+                image_filter = StreamingImageFilter()
+                text_extractor = HTMLTextExtractor() if extract_text else None
+                image_externalizer = None
+                if image_store is not None and out_f is not None:
+                    image_externalizer = StreamingImageFilter(
+                        on_image=image_store.replace_image
                     )
+                with open(html_file, "r", encoding=encoding) as in_f:
+                    while chunk := in_f.read(MERGE_CHUNK_SIZE):
+                        if image_externalizer:
+                            out_f.write(image_externalizer.feed(chunk))
+                        elif out_f is not None:
+                            out_f.write(chunk)
+                        if imageless_f or text_extractor:
+                            imageless_chunk = image_filter.feed(chunk)
+                            if imageless_f:
+                                imageless_f.write(imageless_chunk)
+                            if text_extractor:
+                                text_extractor.feed(imageless_chunk)
+                if image_externalizer:
+                    out_f.write(image_externalizer.flush())
+                if imageless_f or text_extractor:
+                    imageless_chunk = image_filter.flush()
+                    if imageless_f:
+                        imageless_f.write(imageless_chunk)
+                    if text_extractor:
+                        text_extractor.feed(imageless_chunk)
+                return text_extractor.text() if text_extractor else None
+            except UnicodeDecodeError:
+                if encoding is None:
+                    raise
+                # undo the partial copy and try again with the default encoding
+                for f, start_position in zip(output_files, start_positions):
+                    f.seek(start_position)
+                    f.truncate()
 
     def generate_absolute_dir_name(self, file):
         # takes a directory or a file and returns a formatted absolute version of it
+        directory = os.path.dirname(os.path.abspath(file))
+        if os.path.altsep:
+            directory = directory.replace(os.path.altsep, os.sep)
         return str(
             "".join(
-                c
-                for c in "!".join(os.path.abspath(file).split("\\")[0:-1])
-                if c.isalnum() or c in " !"
+                c for c in "!".join(directory.split(os.sep)) if c.isalnum() or c in " !"
+            ),
+        )
+
+    def generate_output_path(self, dir_name, file):
+        output_path = os.path.join(
+            self.config.temp_file_path,
+            os.path.basename(dir_name),
+            self.converter.change_ext(
+                os.path.basename(file), self.config.main_output_type
             ),
         )
 
+        if self.config.absolute_temp_directory_names:
+            # Make temporary directory with name that is unique to the input directory
+            # We do this by removing all invalid letters in the input, then replacing \ with !
+            # This modified path is then used as the directory name inside the temp file directory
+            output_path = os.path.join(
+                self.config.temp_file_path,
+                self.generate_absolute_dir_name(file),
+                self.converter.change_ext(
+                    os.path.basename(file), self.config.main_output_type
+                ),
+            )
+
+        return output_path
+
+    def start_conversion_pool(self):
+        """Starts the worker processes of convert_files_parallel, which are kept until stop_conversion_pool"""
+        shared = self.converter.cache.shared_between_processes
+        self.pool_status_queue = self.status_table.worker_queue()
+        self.conversion_pool = ProcessPoolExecutor(
+            max_workers=self.config.worker_count,
+            initializer=_init_conversion_worker,
+            initargs=(
+                self.config,
+                None if shared else self.converter.cache_maps(),
+                self.pool_status_queue,
+            ),
+        )
+        if not shared:
+            # the workers start with a copy of the maps as they are now. Later changes are collected in the first map of
+            # each ChainMap, and passed on to the workers by pool_cache_changes
+            self.pool_base_maps = self.converter.cache_maps()
+            self.pool_changes_dir = tempfile.mkdtemp(prefix="document-merger-changes-")
+            self.converter.set_cache_maps(
+                {table: ChainMap({}, m) for table, m in self.pool_base_maps.items()}
+            )
+
+    def stop_conversion_pool(self):
+        if self.conversion_pool is None:
+            return
+        self.conversion_pool.shutdown()
+        self.conversion_pool = None
+        self.status_table.close_worker_queue(self.pool_status_queue)
+        self.pool_status_queue = None
+
+        if self.pool_base_maps is not None:
+            for table, cache_map in self.converter.cache_maps().items():
+                self.pool_base_maps[table].update(cache_map.maps[0])
+            self.converter.set_cache_maps(self.pool_base_maps)
+            self.pool_base_maps = None
+            shutil.rmtree(self.pool_changes_dir, ignore_errors=True)
+            self.pool_changes_dir = None
+            self.pool_change_count = 0
+
+    def pool_cache_changes(self):
+        """
+        Writes the changes made to the converter's maps since the last call to the next file of pool_changes_dir, and
+        returns the number of files written. Each worker reads the files it hasn't read yet before converting a file, so
+        every change is only sent once to each worker rather than with every file.
+        """
+        if self.pool_base_maps is None:
+            return 0
+
+        changes = {}
+        for table, cache_map in self.converter.cache_maps().items():
+            if cache_map.maps[0]:
+                changes[table] = cache_map.maps[0].copy()
+                self.pool_base_maps[table].update(cache_map.maps[0])
+                cache_map.maps[0].clear()
+        if changes:
+            changes_path = os.path.join(
+                self.pool_changes_dir, f"{self.pool_change_count}.json"
+            )
+            with open(changes_path, "w", encoding="utf-8") as f:
+                json.dump(changes, f)
+            self.pool_change_count += 1
+        return self.pool_change_count
+
+    def convert_files_parallel(self, job_paths):
+        """
+        Converts files in the process pool, starting it if it isn't running, returning the converted paths in the same
+        order as job_paths.
+        job_paths (list[tuple[str, str]]): input file paths and the output paths they should be converted to
+        """
+        self.status_table.update_status(
+            "Status", f"Converting ({self.config.worker_count} workers)"
+        )
+        if self.conversion_pool is None:
+            self.start_conversion_pool()
+        change_count = self.pool_cache_changes()
+
+        converted_paths = []
+        # executor.map yields results in submission order, so the merge order matches the discovery order
+        for (
+            converted_path,
+            changes,
+            ocr_stats,
+            instrumentation,
+        ) in self.conversion_pool.map(
+            _convert_in_worker,
+            [file for file, _ in job_paths],
+            [output_path for _, output_path in job_paths],
+            [self.config.main_output_type] * len(job_paths),
+            [self.pool_changes_dir] * len(job_paths),
+            [change_count] * len(job_paths),
+        ):
+            # worker changes are only merged here, in the main process, one result at a time
+            for table, cache_map in self.converter.cache_maps().items():
+                if table == "review_queue":
+                    self.merge_review_queue_changes(changes[table])
+                else:
+                    cache_map.update(changes[table])
+            self.converter.ocr_stats.update(ocr_stats)
+            self.converter.instrumentation.merge(instrumentation)
+
+            converted_paths.append(converted_path)
+
+        return converted_paths
+
+    def merge_review_queue_changes(self, changes):
+        # an image can be queued by several workers, each of which only knows the converted files that it wrote
+        review_queue = self.converter.review_queue
+        for image_key, review_entry in changes.items():
+            if image_key in review_queue:
+                outputs = review_queue[image_key]["outputs"]
+                review_entry["outputs"] = outputs + [
+                    o for o in review_entry["outputs"] if o not in outputs
+                ]
+            review_queue[image_key] = review_entry
+
     def process_subdirectory(self, dir_name):
         # takes a directory and performs the conversion and merging process for that directory
 
-        self.status_table.update_status("Directory", dir_name.split("\\")[-1])
+        self.status_table.update_status("Directory", os.path.basename(dir_name))
 
-        input_paths = []
         output_paths = []
 
-        for root, dirs, files in os.walk(dir_name):
-            for file in files:
-                # each time we encounter a new file:
-                # if it matches any relative file name it will be ignored, then its absolute path will be checked against all provided absolute paths
-                # get all valid input files in that directory
-                # we also check for ignored directories here:
-                # if the absolute file path of the file starts with any of the input strings, ignore the file.
-                # (yes i am aware that this introduces a bug with ignoring directories called C or C:, but if that ends up being an actual problem then i'll fix it)
-                # if any of the directories in the absolute path of the file is present in ignored_dirs, ignore that file
-
-                abs_file_path = os.path.join(os.getcwd(), root, file)
-                if (
-                    file.endswith(self.config.merge_file_types)
-                    and file not in self.config.ignored_files
-                    and abs_file_path not in self.config.ignored_files
-                    and not abs_file_path.startswith(self.config.ignored_dirs)
-                    and not any(
-                        f in self.config.ignored_dirs for f in abs_file_path.split("\\")
-                    )
-                ):
-                    input_paths.append(abs_file_path)
+        # merged HTML file in the course directory
+        output_file_path = self.merged_file_paths(dir_name)[0]
 
-        for file in input_paths:
-            output_path = os.path.join(
-                self.config.temp_file_path,
-                dir_name.split("\\")[-1],
-                self.converter.change_ext(
-                    file.split("\\")[-1], self.config.main_output_type
-                ),
-            )
+        # the merged files of previous runs are in the directory being merged, so they must not be merged into themselves
+        input_paths = self.discover_input_files(
+            dir_name, self.generated_paths(dir_name)
+        )
 
-            if self.config.absolute_temp_directory_names:
-                # Make temporary directory with name that is unique to the input directory
-                # We do this by removing all invalid letters in the input, then replacing \ with !
-                # This modified path is then used as the directory name inside the temp file directory
-                output_path = os.path.join(
-                    self.config.temp_file_path,
-                    self.generate_absolute_dir_name(file),
-                    self.converter.change_ext(
-                        file.split("\\")[-1], self.config.main_output_type
-                    ),
+        # skip the directory entirely if its inputs and merge options are the same as when its merged file was written
+        manifest = None
+        if len(input_paths) > 0 and self.config.main_output_type == "html":
+            manifest = self.generate_directory_manifest(input_paths)
+            if self.directory_unchanged(output_file_path, manifest):
+                self.status_table.update_statuses(
+                    {
+                        "File Name": os.path.basename(output_file_path),
+                        "Status": "Unchanged",
+                    }
+                )
+                return
+
+        job_paths = [
+            (file, self.generate_output_path(dir_name, file)) for file in input_paths
+        ]
+
+        # Feed output_path in converter.convert, it is returned verbatim if successful
+        # the file path is potentially changed if the file content hash matches an existing file in another location
+        # This fixes a potential issue where the file is skipped because it has already been processed, but the output from the previous process doesn't exist in the current folder.
+        # The reprocessing is skipped but the file is not added to the final output.
+        # In this case we need to keep track of and override the output file path to the path of the preprocessed output file
+        if (
+            self.config.worker_count > 1
+            and not self.config.prompts_for_images()
+            and (len(job_paths) > 1 or self.conversion_pool is not None)
+        ):
+            converted_paths = self.convert_files_parallel(job_paths)
+        else:
+            converted_paths = (
+                self.converter.convert(
+                    file,
+                    output_path,
+                    output_type=self.config.main_output_type,
+                    make_output_dirs=True,
                 )
-            # Feed output_path in converter.convert, it is returned verbatim if successful
-            # the file path is potentially changed if the file content hash matches an existing file in another location
-            # This fixes a potential issue where the file is skipped because it has already been processed, but the output from the previous process doesn't exist in the current folder.
-            # The reprocessing is skipped but the file is not added to the final output.
-            # In this case we need to keep track of and override the output file path to the path of the preprocessed output file
-            converted_path = self.converter.convert(
-                file,
-                output_path,
-                output_type=self.config.main_output_type,
-                make_output_dirs=True,
+                for file, output_path in job_paths
             )
 
+        all_converted = True
+        # the input file of each converted file
+        source_paths = []
+        for (file, _), converted_path in zip(job_paths, converted_paths):
             if converted_path:
                 output_paths.append(converted_path)
+                source_paths.append(file)
+            else:
+                all_converted = False
 
         # if no valid conversion files are found in the directory, don't merge html files
         # TODO fix the type of output_paths
         if len(output_paths) > 0 and self.config.main_output_type == "html":
             # merge HTML files in the temp directory into a single HTML file in the course directory
-            output_file_path = os.path.join(
-                dir_name, f"{dir_name.split('\\')[-1]}.html"
-            )
             # TODO: feed the paths variable straight into merge_html_files. From there, grab all html files in all those folders and merge into 1
             # this means a rework to merge_html_files to accept a list of paths.
-            self.merge_html_files(
-                output_paths,
-                output_file_path,
+            self.merge_html_files(output_paths, output_file_path, source_paths)
+
+            # a directory with a failed conversion is merged again next run
+            if all_converted:
+                # the converted files are recorded so that reviewing an image can invalidate the merged files containing it
+                manifest["outputs"] = output_paths
+                self.converter.directory_manifests[output_file_path] = manifest
+
+    def merged_file_paths(self, dir_name):
+        """Returns the absolute paths of the merged file of a directory and its imageless version"""
+        output_file_path = os.path.abspath(
+            os.path.join(dir_name, f"{os.path.basename(dir_name)}.html")
+        )
+        return (
+            output_file_path,
+            output_file_path.replace(".html", " (Imageless).html"),
+        )
+
+    def generated_paths(self, dir_name):
+        """Returns the absolute paths of the merged files of a directory and of the directories of their images and parts"""
+        merged_file_paths = self.merged_file_paths(dir_name)
+        return (
+            *merged_file_paths,
+            ImageStore.asset_path_for(merged_file_paths[0]),
+            ShardedOutput.parts_path_for(merged_file_paths[0]),
+        )
+
+    def discover_input_files(self, dir_name, merged_file_paths=()):
+        """
+        Returns the paths of the files in dir_name and its subdirectories that should be converted and merged, in merge order.
+        dir_name (str): the directory to search
+        merged_file_paths (tuple[str]): absolute paths of merged files and their directories to leave out
+        """
+        return self.discovery.input_files(dir_name, merged_file_paths)
+
+    def generate_directory_manifest(self, input_paths):
+        """
+        Returns the content hashes of the inputs of a directory in merge order, along with the options that change the merged output.
+        input_paths (list[str]): the files that will be merged, in order
+        """
+        return {
+            "inputs": [self.converter.get_file_hash(f) for f in input_paths],
+            "options": self.merge_options(),
+        }
+
+    def merge_options(self):
+        # config values that change the contents of the merged files
+        options = {
+            "main_output_type": self.config.main_output_type,
+            "create_imageless_version": self.config.create_imageless_version,
+        }
+        # only recorded when set, so that the manifests of merged files written before the options existed still match
+        if self.config.externalize_images:
+            options["externalize_images"] = True
+        if self.search_index is not None:
+            # the merged files have search anchors
+            options["search_index"] = True
+        if self.config.merge_shards is not None:
+            options["merge_shards"] = self.config.merge_shards
+            options["shard_max_size"] = self.config.shard_max_size
+        return options
+
+    def directory_unchanged(self, output_file_path, manifest):
+        stored_manifest = self.converter.directory_manifests.get(output_file_path)
+        if stored_manifest is None or any(
+            stored_manifest.get(key) != manifest[key] for key in ("inputs", "options")
+        ):
+            return False
+
+        # the merged files may have been deleted or moved since the manifest was stored
+        if not os.path.exists(output_file_path):
+            return False
+        if self.config.create_imageless_version and not os.path.exists(
+            output_file_path.replace(".html", " (Imageless).html")
+        ):
+            return False
+        if self.config.externalize_images and not os.path.isdir(
+            ImageStore.asset_path_for(output_file_path)
+        ):
+            return False
+        if self.config.merge_shards is not None and not os.path.isdir(
+            ShardedOutput.parts_path_for(output_file_path)
+        ):
+            return False
+        # the search index may have been deleted since the merged file was indexed
+        if self.search_index is not None and not self.search_index.has_merged_file(
+            output_file_path
+        ):
+            return False
+
+        return True
+
+    def maintain_cache(self, compact=False):
+        """
+        Removes stale cache entries, and entries by age and size as set by cache_max_age_days and cache_max_size, then saves
+        the cache. Returns a report of the cache before and after.
+        compact (bool): Flag to also reclaim the space of the removed entries on disk
+        """
+        self.status_table.update_status("Status", "Maintaining cache")
+        maintenance = CacheMaintenance(
+            self.converter.cache, self.converter.cache_maps()
+        )
+        return maintenance.maintain(
+            self.config.cache_max_age_days, self.config.cache_max_size, compact
+        )
+
+    def compact_cache(self):
+        """Removes stale and expired cache entries, then compacts the cache file, see maintain_cache"""
+        try:
+            print(self.maintain_cache(compact=True))
+        finally:
+            self.converter.close()
+
+    def review(self, decisions=None):
+        """
+        Applies review decisions to the images queued with deferred_review. If any converted files changed, start() is run
+        so that the directories containing them are merged again.
+        decisions (dict[str, bool] | None): image key: True to ignore the image. None shows a ReviewWindow to decide.
+        """
+        # imports tkinter, which is only needed here
+        from .ImageReview import ImageReview, ReviewWindow
+
+        review = ImageReview(self.converter)
+        if decisions is None:
+            decisions = ReviewWindow(review).show()
+
+        affected_outputs = review.apply(decisions)
+        self.converter.write_to_cache_file()
+        print(
+            f"Reviewed {len(decisions)} images, updated {len(affected_outputs)} converted files, "
+            f"{len(review.pending())} images left to review"
+        )
+
+        if affected_outputs:
+            self.start()
+        else:
+            self.converter.close()
+
+    def process_directories(self, dir_names=None):
+        """
+        Converts and merges the directories of the analysis path: each subdirectory if process_subdirectories_individually
+        is set, otherwise the analysis path itself. Must be run from the analysis path.
+        dir_names (Iterable[str] | None): the directories to process, None processes all of them
+        """
+        if dir_names is None:
+            if self.config.process_subdirectories_individually:
+                dir_names = self.discovery.subdirectories(".")
+            else:
+                dir_names = [self.config.analysis_path]
+
+        try:
+            for dir_name in dir_names:
+                # run function for each directory in the root directory: one output per subdirectory
+                # or on the root directory: one output overall, for the root directory
+                with self.converter.instrumentation.span("directory", file=dir_name):
+                    self.process_subdirectory(dir_name)
+        finally:
+            # the pool is started by the first directory with files to convert in parallel
+            self.stop_conversion_pool()
+
+    def affected_directories(self, changes):
+        """
+        Returns the directories that process_directories should process again after changes to the analysis path.
+        changes (set[tuple[str, bool]]): changed paths and whether they are directories, see FileWatcher.changes
+        """
+        analysis_path = os.path.abspath(self.config.analysis_path)
+        if self.config.process_subdirectories_individually:
+            candidates = self.discovery.subdirectories(analysis_path)
+        else:
+            candidates = [self.config.analysis_path]
+        generated_paths = {
+            normalise_path(path)
+            for dir_name in candidates
+            for path in self.generated_paths(os.path.join(analysis_path, dir_name))
+        }
+
+        affected = set()
+        for path, is_directory in changes:
+            if not is_directory:
+                name = os.path.basename(path)
+                if not name.endswith(
+                    self.config.merge_file_types
+                ) or self.discovery.ignored_files.matches(name, path):
+                    continue
+            # merged files, parts and images written by this merger
+            normalised_path = normalise_path(path)
+            if any(
+                normalised_path == generated_path
+                or normalised_path.startswith(f"{generated_path}/")
+                for generated_path in generated_paths
+            ):
+                continue
+
+            if not self.config.process_subdirectories_individually:
+                return candidates
+            relative_path = os.path.relpath(path, analysis_path)
+            if relative_path == ".":
+                # changes may have been missed, everything is checked again
+                return candidates
+            # files directly in the analysis path aren't part of any subdirectory's merged file
+            if is_directory or os.sep in relative_path:
+                affected.add(relative_path.split(os.sep)[0])
+
+        # directories that are ignored, empty or were removed are left out
+        return [dir_name for dir_name in candidates if dir_name in affected]
+
+    def watch(self):
+        """
+        Processes the analysis path, then keeps running, processing the directories whose files are added, modified or
+        removed again as they change. The cache stays in memory between changes, so unchanged files and directories are
+        skipped without being hashed again. Stops on KeyboardInterrupt.
+        """
+        try:
+            logging.getLogger().setLevel(logging.ERROR)
+            os.chdir(self.config.analysis_path)
+            self.process_directories()
+            self.converter.write_to_cache_file()
+            self.report_instrumentation()
+
+            # temporary and cache files may be in the analysis path, changes to them aren't changes to the inputs
+            excluded_dirs = {
+                normalise_path(path)
+                for path in (
+                    self.config.temp_file_path,
+                    os.path.dirname(self.config.cache_file_path),
+                    self.config.image_output_path,
+                )
+                if path
+            }
+            watcher = create_file_watcher(
+                self.config,
+                lambda path: normalise_path(path) in excluded_dirs
+                or self.discovery.ignored_dirs.matches(os.path.basename(path), path),
             )
+            print(f"Watching {self.config.analysis_path} for changes")
+
+            try:
+                while True:
+                    changes = watcher.wait_for_changes(self.config.watch_debounce)
+                    dir_names = self.affected_directories(changes)
+                    if not dir_names:
+                        continue
+
+                    start_time = time.time()
+                    # files are hashed again if their fingerprints changed since they were last seen
+                    self.converter.run_file_hashes.clear()
+                    self.converter.run_used_keys.clear()
+                    try:
+                        self.process_directories(dir_names)
+                    except FileNotFoundError as e:
+                        # removed while it was being processed. The removal is a change of its own, so the directory is
+                        # processed again once the watcher reports it
+                        print(f"{e.filename} was removed while it was being processed")
+                    self.converter.write_to_cache_file()
+                    print(
+                        f"Processed {', '.join(dir_names)} in {round(time.time() - start_time, 2)} seconds"
+                    )
+                    self.report_instrumentation()
+            finally:
+                watcher.close()
+        except KeyboardInterrupt:
+            if self.converter.ocr_pool is not None:
+                self.converter.ocr_pool.shutdown(wait=False)
+            if self.converter.office_pool is not None:
+                self.converter.office_pool.shutdown()
+            self.converter.write_to_cache_file()
+            self.converter.close()
+            print("Stopped watching")
+
+    def report_instrumentation(self):
+        """
+        Prints the instrumentation summary and writes the trace, if enabled, then clears the events and counters. watch()
+        reports each time it processes changes, so the events don't pile up while it keeps running.
+        """
+        instrumentation = self.converter.instrumentation
+        if instrumentation.enabled:
+            print(instrumentation.summary(self.config.slowest_files_count))
+        if self.config.trace_path is not None:
+            instrumentation.export_trace(self.config.trace_path)
+            print(f"Trace written to {self.config.trace_path}")
+        instrumentation.reset()
 
     def start(self):
         try:
@@ -183,39 +874,26 @@ class DocumentMerger:
             # change directory to analysis path
             os.chdir(self.config.analysis_path)
 
-            # iterate over subdirectories in analysis path
-            if self.config.process_subdirectories_individually:
-                for dir_name in os.listdir("."):
-                    if (
-                        os.path.isdir(dir_name)
-                        and len(os.listdir(dir_name)) != 0
-                        and os.path.exists(dir_name)
-                    ):
-                        # this is a bit of an agressive way of doing directory ignoring, but it should work for now
-                        if (
-                            dir_name not in self.config.ignored_dirs
-                            and os.path.abspath(dir_name)
-                            not in self.config.ignored_dirs
-                            and not os.path.abspath(dir_name).startswith(
-                                self.config.ignored_dirs
-                            )
-                            and not any(
-                                f in self.config.ignored_dirs
-                                for f in os.path.abspath(dir_name).split("\\")
-                            )
-                        ):
-                            # run function for each directory in the root directory: one output per subdirectory
-                            self.process_subdirectory(dir_name)
-            else:
-                # run function on root directory: one output overall, for the root directory
-                self.process_subdirectory(self.config.analysis_path)
+            self.process_directories()
 
             if not self.config.keep_temp_files:
                 shutil.rmtree(self.config.temp_file_path)
 
-            self.converter.write_to_cache_file()
+            if self.config.maintains_cache():
+                # saves the cache
+                print(self.maintain_cache())
+            else:
+                self.converter.write_to_cache_file()
+            self.converter.close()
 
             print(f"Finished in {round(time.time() - start_time, 2)} seconds")
+            print(self.converter.ocr_stats_summary())
+            self.report_instrumentation()
         except KeyboardInterrupt:
+            if self.converter.ocr_pool is not None:
+                self.converter.ocr_pool.shutdown(wait=False)
+            if self.converter.office_pool is not None:
+                self.converter.office_pool.shutdown()
             self.converter.write_to_cache_file()
+            self.status_table.close()
             print("Exiting prematurely...")
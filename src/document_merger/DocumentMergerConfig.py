@@ -1,7 +1,11 @@
 import os
+import sys
 import json
 from typing import Callable
 
+from .OCRPreprocessor import OCRPreprocessor
+from .ConverterRegistry import default_registry
+
 
 class DocumentMergerConfig:
     """A class containing config values to aid in the conversion process.
@@ -10,8 +14,13 @@ class DocumentMergerConfig:
         subdirectory individually. i.e a seperate combined file will be created for each initial subdirectory in analysis_path.
     ignored_dirs (tuple[str]): A list of directory names or absolute directory paths in analysis_path that have contents that should not
         be parsed. Any directory with a name equal to a string in this list, or any directory that has the same path will be ignored.
-    ignored_files (list[str]): A list of a mix of absolute or relative file paths to ignore when converting.
-    merge_file_types (list[str]): List of file types to look for when processing.
+        Paths may use either separator and relative paths are relative to analysis_path. Entries containing *, ? or [ are glob
+        patterns, matched against directory names, or against paths if they contain a separator. Ignored directories are
+        never entered.
+    ignored_files (list[str]): A list of a mix of file names, absolute or relative file paths and glob patterns to ignore when
+        converting, matched in the same way as ignored_dirs.
+    merge_file_types (list[str]): List of file types to look for when processing, the input types of the conversions in
+        ConverterRegistry, including those of converter plugins.
     main_output_type (str): Output file extension type.
     temp_file_path (str): Location of where to put temporary output files.
     keep_temp_files (bool): Flag to keep/remove temporary files during processing. Note that setting this to false will
@@ -20,16 +29,109 @@ class DocumentMergerConfig:
         root directory
     cache_file_path (str): location of JSON file that stores the following information
         file_path_map (str): Maps the path of the input file to the output file. This prevents re-analysis of files that have already been ran.
-        ocr_map (str): Maps hashed base64 image strings to their output text. This prevents re-analysis of images that have already been seen.
+        ocr_map (str): Maps the SHA-256 of decoded images to their output text. This prevents re-analysis of images that have already been seen.
         file_hashes (str): A list of the hashes of the contents of all files that have been processed, to prevent re-processing of duplicate files with different paths.
+        file_fingerprints (str): Maps the path of each hashed file to its size, modification time, inode and content hash. The content
+            hash is reused instead of rehashing the file while the other values are unchanged.
+        directory_manifests (str): Maps each merged file to the content hashes of its inputs and the merge options it was written with.
+            A directory whose inputs and options are unchanged, and whose merged files still exist, is skipped.
+        perceptual_image_keys (str): Maps the size and perceptual hash of OCR'd images to their key in ocr_map, see perceptual_ocr_lookup.
+        review_queue (str): Maps the key of each image waiting for review to its saved copy and the converted files that contain it,
+            see deferred_review.
+        last_used (str): Maps "<map>/<key>" of the entries of ocr_map, file_path_map, processed_file_hashes and file_fingerprints to
+            when they were last used, see cache_max_age_days and cache_max_size.
+        output_hashes (str): Maps each output file to the content hash of the input it was last converted from. An output is only
+            reused for an input with that content, as it is overwritten when its input changes.
+    cache_backend (str): How the cache is stored. "json" reads and rewrites the whole of cache_file_path each run. "sqlite" stores
+        the cache in a SQLite database next to cache_file_path (with a .sqlite3 extension), saving each entry as it changes. An
+        existing JSON cache at cache_file_path is copied into the database the first time it is created.
+    prune_cache (bool): Flag to remove cache entries for inputs and outputs that no longer exist at the end of each run, see
+        CacheMaintenance. Outputs are deleted with the temporary files when keep_temp_files is off.
+    cache_max_age_days (float | None): Entries that haven't been used for this many days are removed from the cache at the end of
+        each run, along with the stale entries that prune_cache removes. None keeps entries regardless of age.
+    cache_max_size (int | None): Size in bytes the cache entries should fit in. The least recently used entries are removed from
+        the cache at the end of each run until it does, along with the stale entries that prune_cache removes. None doesn't limit
+        the size. OCR results decided on with show_image are never removed. DocumentMerger.compact_cache() also reclaims the space
+        on disk, or run "python -m document_merger.CacheMaintenance <cache path>".
+    partial_hash_min_size (int | None): Files of at least this many bytes are identified by a hash of their size and their first
+        and last megabyte rather than of their whole contents. None always hashes the whole file.
+    pptx_backend (str): How PPTX files are converted to PDF. "powerpoint" opens PowerPoint through COM for each file (Windows only).
+        "libreoffice" reuses a headless LibreOffice process started through unoserver, one for each of the worker_count processes
+        converting files. Defaults to "powerpoint" on Windows and "libreoffice" elsewhere.
+    office_job_timeout (float): Seconds a single LibreOffice conversion may take before the process is treated as hung and restarted.
+    unoserver_path (str): Location of the unoserver executable.
+    unoconvert_path (str): Location of the unoconvert executable.
+    office_process_factory (Callable | None): Returns a new office process for the pool, e.g. FakeOfficeProcess for testing without
+        LibreOffice. None uses OfficeProcess.
+    pdf_parallel_page_threshold (int | None): PDFs with at least this many pages are split into page ranges that are converted to DOCX
+        on separate processes. None converts every PDF on a single process.
+    pdf_page_workers (int | None): Number of processes used for a page-parallel PDF conversion. None divides the CPUs between the
+        worker_count processes converting files, so that each of them uses the number of CPUs divided by worker_count.
+    perceptual_ocr_lookup (bool): Flag to reuse the OCR result of a previously seen image that looks the same (has the same size and
+        perceptual hash) as a new image, e.g. the same slide image re-exported at a different quality. The lookup is lossy: the hash
+        is of a 9 x 8 thumbnail, so a different image of the same size and layout, e.g. another slide of text, may be given the
+        OCR text of the image it was mistaken for. Leave it off unless the inputs repeat the same images in different encodings.
+    text_likelihood_filter (Callable | bool | None): A function that takes a PIL image and returns whether it may contain text. Images
+        that it rejects are recorded in ocr_map as ignored without being OCR'd. True uses a TextLikelihoodFilter with its default
+        thresholds (requires NumPy), None or False OCRs every image that isn't ignored by determine_ignore_image.
+    ocr_preprocessor (OCRPreprocessor | bool | None): Prepares images before they are OCR'd, e.g. by downscaling large slide renders,
+        which makes tesseract faster. True uses an OCRPreprocessor with all of its steps, None or False OCRs the original image.
+        The time spent on each step is printed with the OCR cache statistics.
+    ocr_engine (str): How images are OCR'd. "pytesseract" starts a tesseract process for every image. "batch" collects the images of
+        each document that need OCR and runs tesseract once for every ocr_batch_size of them, falling back to one image at a time
+        if a batch fails.
+    ocr_batch_size (int): Maximum number of images OCR'd by a single tesseract process when ocr_engine is "batch".
     create_imageless_version (bool): Flag to produce an additional HTML file that has all the images removed (for quicker fuzzy finding)
+    search_index_path (str | None): Location of a SQLite full-text index of the merged files to build while merging, see
+        SearchIndex. Each converted file is indexed with its OCR text, the input file it came from, its directory and an
+        anchor in the merged file. Only converted files that changed are indexed again. None doesn't build an index.
+    externalize_images (bool): Flag to write the base64 images of each merged HTML file to a "<name> assets" directory beside
+        it, named by the hash of their content, and reference them with lazily loaded image tags instead of inlining them.
+        An image used several times is stored once, which keeps merged files small enough to open quickly.
+    merge_shards (str | None): How to split each merged HTML file into parts in a "<name> parts" directory beside it, with
+        the merged file itself becoming a table of contents that links to each part and each input file. "size" fills parts
+        up to shard_max_size, "file" makes a part per input file. Parts are only written again when the converted files in
+        them change. None writes a single merged file. The imageless version is always a single file.
+    shard_max_size (int): Size in bytes that a part shouldn't exceed when merge_shards is "size", unless a single
+        converted file does.
     show_image (bool): flag to show to-be-processed OCR image to user, to allow manual image ignoring. The program will
         show a tkinter window and prompt for ignore status: "" = don't ignore, any char but n = ignore, "n" = don't ignore.
+    deferred_review (bool): Flag to queue the images that show_image would prompt for instead of prompting, so that conversion
+        doesn't wait for the user. Queued images are OCR'd with the default ignore decision and saved to review_path, and
+        DocumentMerger.review() later shows them all at once. Images marked as ignored there have their OCR text removed
+        from the converted files that contain them, and those directories are merged again.
+    review_path (str | None): Location of the images waiting for review. None uses a "review" directory next to cache_file_path.
+        It shouldn't be inside temp_file_path, which is deleted at the end of each run unless keep_temp_files is set, while
+        the images wait until review() is run.
     image_output_path (str | None): Path to output OCR images, primarily for debugging purposes.
     print_status_table (bool): Flag to print status table
+    status_mode (str): How the status table is printed. "rows" prints a row on every update. "live" redraws the table in
+        place at most status_refresh_rate times a second, with a row for each worker process above a log of completed
+        files. When stdout isn't a terminal, "live" prints a compact summary line every status_summary_interval seconds.
+    status_refresh_rate (float): Maximum number of redraws per second of the live status table.
+    status_summary_interval (float): Seconds between the summary lines of the live status table when stdout isn't a terminal.
+    instrumentation (bool): Flag to time each stage of the run (hashing, conversion, pdf2docx, mammoth, OCR, merging, cache
+        writes) and count cache hits and bytes read and written, including the work done in worker processes. A summary of
+        the stage timings, the time by file type and by directory, and the slowest files is printed at the end of the run, or
+        by DocumentMerger.watch() each time it has processed changes.
+    trace_path (str | None): Location to write the timings to in the Chrome trace event format, which can be opened in
+        chrome://tracing or https://ui.perfetto.dev. Setting it turns on instrumentation. While watching, the trace of the
+        latest changes replaces the previous one.
+    slowest_files_count (int): Number of the slowest files to list in the instrumentation summary.
+    watch_backend (str): How DocumentMerger.watch() notices changes. "inotify" uses inotify (Linux only), "polling" lists the
+        analysis path every watch_poll_interval seconds, "auto" uses inotify where it is available and polling otherwise.
+    watch_debounce (float): Seconds without further changes that DocumentMerger.watch() waits for before processing a
+        burst of changes.
+    watch_poll_interval (float): Seconds between polls of the analysis path with the polling watch backend.
     tesseract_path (str): Location of the tesseract OCR excecutable.
     determine_ignore_image (Callable | None): A function that takes ints width and height and returns a boolean whether the image should
         be exempt from being processed by the OC
+    worker_count (int): Number of processes used to convert the files of a directory in parallel. 1 converts files one at a time.
+        Parallel conversion is disabled while show_image prompts are shown, as they can only be shown from the main process.
+        Worker processes import the script that started the merger again on Windows, so the script must start it under an
+        if __name__ == "__main__": guard (see example_usage.py).
+    ocr_workers (int): Number of images that are OCR'd at the same time by each converter. Identical images are only OCR'd once.
+        1 OCRs images one at a time. Concurrent OCR is disabled while show_image prompts are shown.
     """
 
     def __init__(
@@ -45,16 +147,50 @@ class DocumentMergerConfig:
         absolute_temp_directory_names: bool = True,
         keep_temp_files: bool = True,
         create_imageless_version: bool = False,
+        externalize_images: bool = False,
+        search_index_path: str | None = None,
+        merge_shards: str | None = None,
+        shard_max_size: int = 25 * 1024 * 1024,
         show_image: bool = False,
         image_output_path: str | None = None,
         print_status_table: bool = True,
+        status_mode: str = "rows",
+        status_refresh_rate: float = 4,
+        status_summary_interval: float = 10,
         determine_ignore_image: Callable | None = None,
+        worker_count: int = 1,
+        ocr_workers: int = 1,
+        cache_backend: str = "json",
+        prune_cache: bool = False,
+        cache_max_age_days: float | None = None,
+        cache_max_size: int | None = None,
+        partial_hash_min_size: int | None = None,
+        pptx_backend: str | None = None,
+        office_job_timeout: float = 300,
+        unoserver_path: str = "unoserver",
+        unoconvert_path: str = "unoconvert",
+        office_process_factory: Callable | None = None,
+        pdf_parallel_page_threshold: int | None = None,
+        pdf_page_workers: int | None = None,
+        perceptual_ocr_lookup: bool = False,
+        text_likelihood_filter: Callable | bool | None = None,
+        ocr_preprocessor: OCRPreprocessor | bool | None = None,
+        ocr_engine: str = "pytesseract",
+        ocr_batch_size: int = 32,
+        deferred_review: bool = False,
+        review_path: str | None = None,
+        instrumentation: bool = False,
+        trace_path: str | None = None,
+        slowest_files_count: int = 10,
+        watch_backend: str = "auto",
+        watch_debounce: float = 2,
+        watch_poll_interval: float = 5,
     ):
         self.analysis_path = analysis_path
         self.ignored_dirs = ignored_dirs
         # ignored_files can be a mix of absolute and relative paths.
         self.ignored_files = ignored_files
-        self.merge_file_types = ("pdf", "docx", "pptx", "html")
+        self.merge_file_types = default_registry.input_types()
         self.main_output_type = main_output_type
         self.temp_file_path = temp_file_path
         self.keep_temp_files = keep_temp_files
@@ -62,12 +198,106 @@ class DocumentMergerConfig:
         self.absolute_temp_directory_names = absolute_temp_directory_names
 
         self.cache_file_path = cache_file_path
+        if cache_backend not in ("json", "sqlite"):
+            raise ValueError(
+                f"Unsupported cache backend '{cache_backend}' (supported backends are json, sqlite)"
+            )
+        self.cache_backend = cache_backend
+        self.sqlite_cache_path = f"{os.path.splitext(cache_file_path)[0]}.sqlite3"
+        self.prune_cache = prune_cache
+        self.cache_max_age_days = cache_max_age_days
+        self.cache_max_size = cache_max_size
+        self.partial_hash_min_size = partial_hash_min_size
+
+        if pptx_backend is None:
+            pptx_backend = "powerpoint" if sys.platform == "win32" else "libreoffice"
+        if pptx_backend not in ("powerpoint", "libreoffice"):
+            raise ValueError(
+                f"Unsupported PPTX backend '{pptx_backend}' (supported backends are powerpoint, libreoffice)"
+            )
+        self.pptx_backend = pptx_backend
+        self.office_job_timeout = office_job_timeout
+        self.unoserver_path = unoserver_path
+        self.unoconvert_path = unoconvert_path
+        self.office_process_factory = office_process_factory
+        self.pdf_parallel_page_threshold = pdf_parallel_page_threshold
+        self.pdf_page_workers = pdf_page_workers
+        self.perceptual_ocr_lookup = perceptual_ocr_lookup
+
+        if text_likelihood_filter is True:
+            # imported here so NumPy is only needed when the filter is used
+            from .TextLikelihoodFilter import TextLikelihoodFilter
+
+            text_likelihood_filter = TextLikelihoodFilter()
+        elif text_likelihood_filter is False:
+            text_likelihood_filter = None
+        elif text_likelihood_filter is not None and not callable(
+            text_likelihood_filter
+        ):
+            raise TypeError("text_likelihood_filter input must be a function or bool")
+        self.text_likelihood_filter = text_likelihood_filter
+
+        if ocr_preprocessor is True:
+            ocr_preprocessor = OCRPreprocessor()
+        elif ocr_preprocessor is False:
+            ocr_preprocessor = None
+        elif ocr_preprocessor is not None and not isinstance(
+            ocr_preprocessor, OCRPreprocessor
+        ):
+            raise TypeError("ocr_preprocessor input must be an OCRPreprocessor or bool")
+        self.ocr_preprocessor = ocr_preprocessor
+
+        if ocr_engine not in ("pytesseract", "batch"):
+            raise ValueError(
+                f"Unsupported OCR engine '{ocr_engine}' (supported engines are pytesseract, batch)"
+            )
+        self.ocr_engine = ocr_engine
+        if not isinstance(ocr_batch_size, int) or ocr_batch_size < 1:
+            raise ValueError(
+                f"ocr_batch_size must be a positive integer, got {ocr_batch_size}"
+            )
+        self.ocr_batch_size = ocr_batch_size
 
         self.create_imageless_version = create_imageless_version
+        self.externalize_images = externalize_images
+        self.search_index_path = search_index_path
+        if merge_shards not in (None, "size", "file"):
+            raise ValueError(
+                f"Unsupported shard mode '{merge_shards}' (supported modes are size, file)"
+            )
+        self.merge_shards = merge_shards
+        self.shard_max_size = shard_max_size
         self.show_image = show_image
+        self.deferred_review = deferred_review
+        if review_path is None:
+            review_path = os.path.join(
+                os.path.dirname(os.path.abspath(cache_file_path)), "review"
+            )
+        self.review_path = review_path
         self.image_output_path = image_output_path
 
         self.print_status_table = print_status_table
+        if status_mode not in ("rows", "live"):
+            raise ValueError(
+                f"Unsupported status mode '{status_mode}' (supported modes are rows, live)"
+            )
+        self.status_mode = status_mode
+        if status_refresh_rate <= 0:
+            raise ValueError(
+                f"status_refresh_rate must be positive, got {status_refresh_rate}"
+            )
+        self.status_refresh_rate = status_refresh_rate
+        self.status_summary_interval = status_summary_interval
+        self.instrumentation = instrumentation or trace_path is not None
+        self.trace_path = trace_path
+        self.slowest_files_count = slowest_files_count
+        if watch_backend not in ("auto", "inotify", "polling"):
+            raise ValueError(
+                f"Unsupported watch backend '{watch_backend}' (supported backends are auto, inotify, polling)"
+            )
+        self.watch_backend = watch_backend
+        self.watch_debounce = watch_debounce
+        self.watch_poll_interval = watch_poll_interval
         if os.path.exists(tesseract_path):
             self.tesseract_path = tesseract_path
         else:
@@ -81,6 +311,30 @@ class DocumentMergerConfig:
             else:
                 raise TypeError("determine_ignore_image input must be a function")
 
+        if not isinstance(worker_count, int) or worker_count < 1:
+            raise ValueError(
+                f"worker_count must be a positive integer, got {worker_count}"
+            )
+        self.worker_count = worker_count
+
+        if not isinstance(ocr_workers, int) or ocr_workers < 1:
+            raise ValueError(
+                f"ocr_workers must be a positive integer, got {ocr_workers}"
+            )
+        self.ocr_workers = ocr_workers
+
+    def maintains_cache(self):
+        # cache maintenance runs at the end of each run, see CacheMaintenance
+        return (
+            self.prune_cache
+            or self.cache_max_age_days is not None
+            or self.cache_max_size is not None
+        )
+
+    def prompts_for_images(self):
+        # with deferred_review, images are queued for DocumentMerger.review() instead
+        return self.show_image and not self.deferred_review
+
     def default_determine_ignore_image(self, w, h):
         ignore = False
         if w <= 20 or h <= 20 or w * h <= 11904:
@@ -102,12 +356,22 @@ class DocumentMergerConfig:
     def initialise_files(self):
         self.initialise_directory(self.temp_file_path)
         self.initialise_directory(self.image_output_path)
+        if self.show_image and self.deferred_review:
+            self.initialise_directory(self.review_path)
 
-        self.initialise_json_file(
-            self.cache_file_path,
-            {
-                "ocr_map": {},
-                "file_path_map": {},
-                "processed_file_hashes": {},
-            },
-        )
+        # the sqlite cache creates its own database
+        if self.cache_backend == "json":
+            self.initialise_json_file(
+                self.cache_file_path,
+                {
+                    "ocr_map": {},
+                    "file_path_map": {},
+                    "processed_file_hashes": {},
+                    "file_fingerprints": {},
+                    "directory_manifests": {},
+                    "perceptual_image_keys": {},
+                    "review_queue": {},
+                    "last_used": {},
+                    "output_hashes": {},
+                },
+            )
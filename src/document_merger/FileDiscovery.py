@@ -0,0 +1,178 @@
+import os
+import re
+import fnmatch
+
+GLOB_CHARACTERS = ("*", "?", "[")
+
+
+def normalise_path(path):
+    """Returns path in a form that compares equal regardless of its separators (and its case, on Windows)"""
+    return os.path.normcase(os.path.abspath(path)).replace("\\", "/")
+
+
+class IgnoreRules:
+    """A list of names, paths and glob patterns compiled into sets and a regex, so that matching doesn't depend on the
+    number of rules.
+
+    Entries without a path separator match the name of a file or directory, e.g. "__pycache__". Entries with a separator
+    match a path, either absolute or relative to base_path, and both separators are accepted. Entries containing *, ? or
+    [ are glob patterns, e.g. "*.tmp.html" or "*/week */drafts". Path patterns that aren't absolute can match anywhere.
+
+    entries (Iterable[str]): the rules
+    base_path (str): the directory that relative paths are relative to
+    """
+
+    def __init__(self, entries, base_path):
+        self.names = set()
+        self.paths = set()
+        name_patterns = []
+        path_patterns = []
+
+        for entry in entries:
+            has_separator = "/" in entry or "\\" in entry
+            if any(c in entry for c in GLOB_CHARACTERS):
+                pattern = os.path.normcase(entry).replace("\\", "/")
+                if not has_separator:
+                    name_patterns.append(pattern)
+                elif os.path.isabs(entry):
+                    path_patterns.append(pattern)
+                else:
+                    path_patterns.append(f"*/{pattern}")
+            elif has_separator:
+                self.paths.add(normalise_path(os.path.join(base_path, entry)))
+            else:
+                self.names.add(os.path.normcase(entry))
+
+        self.name_regex = self.compile(name_patterns)
+        self.path_regex = self.compile(path_patterns)
+        self.matches_paths = bool(self.paths) or self.path_regex is not None
+
+    def compile(self, patterns):
+        if not patterns:
+            return None
+        return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+    def matches(self, name, path):
+        """
+        name (str): the name of the file or directory
+        path (str): its path
+        """
+        name = os.path.normcase(name)
+        if name in self.names:
+            return True
+        if self.name_regex is not None and self.name_regex.match(name):
+            return True
+        if self.matches_paths:
+            path = normalise_path(path)
+            if path in self.paths:
+                return True
+            if self.path_regex is not None and self.path_regex.match(path):
+                return True
+        return False
+
+
+class FileDiscovery:
+    """Finds the input files of a directory, leaving out ignored files and never entering ignored directories.
+
+    The ignore rules of the config are compiled once (see IgnoreRules), and directories are listed with os.scandir, whose
+    entries already know whether they are files or directories, so that no file is stat'd to be classified. Files are
+    returned in the same order as os.walk would find them: the files of a directory, then each of its subdirectories.
+
+    config (DocumentMergerConfig): the ignored_dirs, ignored_files and merge_file_types to apply
+    """
+
+    def __init__(self, config):
+        self.file_types = tuple(config.merge_file_types)
+        self.ignored_dirs = IgnoreRules(config.ignored_dirs, config.analysis_path)
+        self.ignored_files = IgnoreRules(config.ignored_files, config.analysis_path)
+
+    def in_ignored_dir(self, path):
+        """Returns whether path or any directory above it is ignored"""
+        path = os.path.abspath(path)
+        while True:
+            if self.ignored_dirs.matches(os.path.basename(path), path):
+                return True
+            parent = os.path.dirname(path)
+            if parent == path:
+                return False
+            path = parent
+
+    def input_files(self, dir_path, excluded_paths=()):
+        """
+        Returns the absolute paths of the files in dir_path and its subdirectories that should be converted and merged,
+        in merge order.
+        dir_path (str): the directory to search
+        excluded_paths (Iterable[str]): paths of files and directories to leave out, such as the merged files of previous
+            runs and their assets
+        """
+        dir_path = os.path.join(os.getcwd(), dir_path)
+        if self.in_ignored_dir(dir_path):
+            return []
+
+        excluded = {normalise_path(p) for p in excluded_paths}
+        excluded_names = {os.path.basename(p) for p in excluded}
+        input_paths = []
+        self.scan(dir_path, excluded, excluded_names, input_paths)
+        return input_paths
+
+    def scan(self, dir_path, excluded, excluded_names, input_paths):
+        try:
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except OSError:
+            # like os.walk, directories that can't be listed are skipped
+            return
+
+        subdirectories = []
+        for entry in entries:
+            is_excluded = (
+                os.path.normcase(entry.name) in excluded_names
+                and normalise_path(entry.path) in excluded
+            )
+            if entry.is_dir():
+                # symbolic links to directories aren't followed, as with os.walk
+                if (
+                    not entry.is_symlink()
+                    and not is_excluded
+                    and not self.ignored_dirs.matches(entry.name, entry.path)
+                ):
+                    subdirectories.append(entry)
+            elif (
+                entry.name.endswith(self.file_types)
+                and not self.ignored_files.matches(entry.name, entry.path)
+                and not is_excluded
+            ):
+                input_paths.append(entry.path)
+
+        for entry in subdirectories:
+            self.scan(entry.path, excluded, excluded_names, input_paths)
+
+    def subdirectories(self, dir_path):
+        """
+        Returns the names of the directories directly in dir_path that aren't ignored or empty, in listing order. A
+        dir_path that doesn't exist, e.g. because it was removed while being watched, has no subdirectories.
+        dir_path (str): the directory to list
+        """
+        if self.in_ignored_dir(dir_path):
+            return []
+
+        try:
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except FileNotFoundError:
+            return []
+        return [
+            entry.name
+            for entry in entries
+            if entry.is_dir()
+            and not self.ignored_dirs.matches(entry.name, entry.path)
+            and not self.is_empty(entry.path)
+        ]
+
+    def is_empty(self, dir_path):
+        # a directory removed since it was listed is treated as empty
+        try:
+            with os.scandir(dir_path) as it:
+                return next(it, None) is None
+        except FileNotFoundError:
+            return True
@@ -0,0 +1,248 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# inotify event masks, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+# struct inotify_event: int wd, uint32 mask, uint32 cookie, uint32 len, then len bytes of NUL padded name
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class FileWatcher:
+    """Reports the paths that change under a directory.
+
+    changes() returns a set of (path, is_directory) tuples. A changed directory means that its contents may have changed
+    without an event for each file in it, e.g. when it was moved in or out of the watched tree, so everything under it
+    should be looked at again. The root directory itself is reported if changes may have been missed.
+
+    root (str): the directory to watch
+    ignore_dir (Callable[[str], bool]): takes the path of a directory and returns whether it should not be watched
+    """
+
+    def __init__(self, root, ignore_dir):
+        self.root = os.path.abspath(root)
+        self.ignore_dir = ignore_dir
+
+    def changes(self, timeout=None):
+        """
+        Returns the changes since the last call, waiting up to timeout seconds for one, or until there is one if timeout
+        is None. The set is empty if the timeout expired.
+        timeout (float | None): seconds to wait
+        """
+        raise NotImplementedError
+
+    def wait_for_changes(self, debounce):
+        """
+        Waits for a change, then keeps collecting changes until none have arrived for debounce seconds, so that a burst of
+        changes, such as a folder of files being synced, is returned as one set.
+        debounce (float): seconds without changes that end a burst
+        """
+        changed = set()
+        while not changed:
+            changed |= self.changes()
+        while more := self.changes(debounce):
+            changed |= more
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(FileWatcher):
+    """Watches a tree with inotify, which is only available on Linux. Every directory that isn't ignored gets a watch,
+    including directories created after the watcher started."""
+
+    def __init__(self, root, ignore_dir):
+        super().__init__(root, ignore_dir)
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        # watch descriptor: directory path
+        self.watches = {}
+        try:
+            self.add_tree(self.root)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            # the directory was removed before it could be watched
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(error, f"{os.strerror(error)}: {path}")
+        self.watches[wd] = path
+
+    def add_tree(self, path):
+        if path != self.root and self.ignore_dir(path):
+            return
+        self.add_watch(path)
+        try:
+            with os.scandir(path) as it:
+                subdirectories = [
+                    entry.path
+                    for entry in it
+                    if entry.is_dir() and not entry.is_symlink()
+                ]
+        except OSError:
+            return
+        for subdirectory in subdirectories:
+            self.add_tree(subdirectory)
+
+    def changes(self, timeout=None):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + name_length].rstrip(b"\0"))
+            offset += name_length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were dropped, so anything may have changed
+                changed.add((self.root, True))
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                changed.add((directory, True))
+                continue
+
+            path = os.path.join(directory, name)
+            is_directory = bool(mask & IN_ISDIR)
+            if is_directory and self.ignore_dir(path):
+                continue
+            if is_directory and mask & (IN_CREATE | IN_MOVED_TO):
+                # files can be written to a new directory before its watch is added, so the whole directory is reported
+                self.add_tree(path)
+            changed.add((path, is_directory))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher(FileWatcher):
+    """Watches a tree by comparing the size and modification time of its files every interval seconds. Works on every
+    platform, at the cost of listing the whole tree (apart from ignored directories) on each poll.
+
+    interval (float): seconds between polls
+    """
+
+    def __init__(self, root, ignore_dir, interval=5):
+        super().__init__(root, ignore_dir)
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        """Returns {path: (size, modification time)} of every file under root"""
+        snapshot = {}
+        directories = [self.root]
+        while directories:
+            directory = directories.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink() and not self.ignore_dir(entry.path):
+                            directories.append(entry.path)
+                    else:
+                        # the stat result is cached by scandir on Windows
+                        stat = entry.stat()
+                        snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    # removed while the tree was being listed
+                    continue
+        return snapshot
+
+    def changes(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+            if wait > 0:
+                time.sleep(wait)
+
+            snapshot = self.scan()
+            changed = {
+                (path, False)
+                for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+
+def create_file_watcher(config, ignore_dir):
+    """
+    Returns the watcher selected by config.watch_backend for config.analysis_path. "auto" uses inotify where it is
+    available and falls back to polling, e.g. on Windows or when the inotify watch limit has been reached.
+    ignore_dir (Callable[[str], bool]): takes the path of a directory and returns whether it should not be watched
+    """
+    if config.watch_backend in ("auto", "inotify") and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(config.analysis_path, ignore_dir)
+        except (OSError, AttributeError) as e:
+            if config.watch_backend == "inotify":
+                raise
+            print(f"inotify is unavailable ({e}), polling for changes instead")
+    elif config.watch_backend == "inotify":
+        raise OSError("inotify is only available on Linux")
+
+    return PollingWatcher(config.analysis_path, ignore_dir, config.watch_poll_interval)
@@ -0,0 +1,53 @@
+import base64
+import binascii
+import hashlib
+
+
+class ImageIdentity:
+    """Identifies images by their content, so that OCR results can be looked up again in later runs.
+
+    The content key is the SHA-256 of the decoded image bytes. It is a string, so it is unchanged by a round trip
+    through the JSON or SQLite cache, and it is the same for every base64 encoding of the same bytes (e.g. with or without
+    padding or line breaks).
+
+    The perceptual key is the size of the image and a 64 bit difference hash (dHash) of it. Images of the same size that
+    look the same but are encoded differently, e.g. the same slide exported at a different quality, usually have the same
+    perceptual key. The dHash only sees a 9 x 8 thumbnail, so different images of the same size with the same layout, e.g.
+    two slides of text, can have the same key as well: a match is likely, not certain, to be the same content.
+    """
+
+    # dHash compares horizontally adjacent pixels of a (size + 1) x size grayscale thumbnail
+    perceptual_hash_size = 8
+
+    def decode(self, b64_string):
+        """Returns the bytes of a base64 image. Whitespace and missing padding are tolerated."""
+        b64_string = "".join(b64_string.split())
+        if missing_padding := len(b64_string) % 4:
+            b64_string += "=" * (4 - missing_padding)
+        try:
+            return base64.b64decode(b64_string)
+        except binascii.Error:
+            # not valid base64, the image can't be opened, but it still needs a stable key
+            return b64_string.encode()
+
+    def content_key(self, image_bytes):
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    def perceptual_key(self, img):
+        """
+        Returns the size and the dHash of an image as a string, e.g. "640x480-3c3c7e7e1818187e". Images only match if their
+        hashes are identical, i.e. at a Hamming distance of 0, and they have the same dimensions.
+        img (PIL.Image.Image): the image
+        """
+        size = self.perceptual_hash_size
+        pixels = list(img.convert("L").resize((size + 1, size)).getdata())
+
+        bits = 0
+        for row in range(size):
+            for column in range(size):
+                left = pixels[row * (size + 1) + column]
+                right = pixels[row * (size + 1) + column + 1]
+                bits = (bits << 1) | (left > right)
+
+        width, height = img.size
+        return f"{width}x{height}-{bits:0{size * size // 4}x}"
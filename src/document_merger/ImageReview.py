@@ -0,0 +1,169 @@
+import os
+
+import tkinter as tk
+from PIL import Image, ImageTk
+
+
+class ImageReview:
+    """The images that were queued for review by a Converter with deferred_review set, and the decisions made on them.
+
+    Queued images have already been OCR'd with the default ignore decision. apply() records the decisions in ocr_map,
+    updates the OCR text in the converted files that contain the images, and invalidates the manifests of the merged
+    files built from them, so that their directories are merged again on the next run.
+
+    converter (Converter): the converter whose review_queue, ocr_map and directory_manifests are updated
+    """
+
+    def __init__(self, converter):
+        self.converter = converter
+
+    def pending(self):
+        """Returns a list of (image key, image path) of the queued images"""
+        return [
+            (image_key, review_entry["image_path"])
+            for image_key, review_entry in self.converter.review_queue.items()
+        ]
+
+    def apply(self, decisions):
+        """
+        Records the review decisions and updates the converted files they affect. Returns the affected converted files.
+        decisions (dict[str, bool]): image key: True to ignore the image, False to keep its OCR text
+        """
+        converter = self.converter
+        # converted file: {image key: OCR text that the file currently has after the image}
+        affected_outputs = {}
+
+        for image_key, ignore in decisions.items():
+            review_entry = converter.review_queue.get(image_key)
+            if review_entry is None:
+                continue
+
+            ocr_entry = converter.ocr_map[image_key]
+            previous_text = "" if ocr_entry["ignore"] else ocr_entry["text"]
+            if ocr_entry["ignore"] != ignore:
+                for output_path in review_entry["outputs"]:
+                    affected_outputs.setdefault(output_path, {})[
+                        image_key
+                    ] = previous_text
+
+            ocr_entry["ignore"] = ignore
+            ocr_entry["seen"] = True
+            converter.ocr_map[image_key] = ocr_entry
+
+            del converter.review_queue[image_key]
+            if os.path.exists(review_entry["image_path"]):
+                os.remove(review_entry["image_path"])
+
+        for output_path, previous_texts in affected_outputs.items():
+            if os.path.exists(output_path):
+                converter.reannotate_output(output_path, previous_texts)
+
+        # merged files that include an affected converted file are out of date
+        for merged_file_path, manifest in list(converter.directory_manifests.items()):
+            if any(
+                output_path in affected_outputs
+                for output_path in manifest.get("outputs", [])
+            ):
+                del converter.directory_manifests[merged_file_path]
+
+        return list(affected_outputs)
+
+
+class ReviewWindow:
+    """A tkinter window that shows the queued images a page at a time, so that they can be marked as ignored in bulk.
+
+    Clicking an image toggles whether it is ignored, ignored images have a red border. "Done" closes the window, and the
+    decisions are returned by show().
+
+    review (ImageReview): the queued images
+    columns (int): thumbnails per row
+    rows (int): rows per page
+    thumbnail_size (int): longest side of each thumbnail in pixels
+    """
+
+    def __init__(self, review, columns=4, rows=3, thumbnail_size=240):
+        self.review = review
+        self.columns = columns
+        self.rows = rows
+        self.thumbnail_size = thumbnail_size
+
+    def show(self):
+        """Returns {image key: ignore} for every queued image that was shown, or {} if the window was closed without Done"""
+        pending = self.review.pending()
+        if not pending:
+            return {}
+
+        root = tk.Tk()
+        root.title(f"Review images ({len(pending)})")
+        decisions = {image_key: False for image_key, _ in pending}
+        page_size = self.columns * self.rows
+        page = 0
+        # keep references to the thumbnails, tkinter doesn't
+        photos = []
+        # images that haven't been shown stay in the queue
+        shown = set()
+        completed = False
+
+        grid = tk.Frame(root)
+        grid.pack()
+        controls = tk.Frame(root)
+        controls.pack(fill="x")
+        page_label = tk.Label(controls)
+
+        def toggle(image_key, label):
+            decisions[image_key] = not decisions[image_key]
+            label.config(bg="red" if decisions[image_key] else root.cget("bg"))
+
+        def show_page():
+            for widget in grid.winfo_children():
+                widget.destroy()
+            photos.clear()
+
+            for i, (image_key, image_path) in enumerate(
+                pending[page * page_size : (page + 1) * page_size]
+            ):
+                with Image.open(image_path) as img:
+                    img.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                    photo = ImageTk.PhotoImage(img)
+                photos.append(photo)
+                shown.add(image_key)
+
+                label = tk.Label(grid, image=photo, bd=4)
+                label.config(bg="red" if decisions[image_key] else root.cget("bg"))
+                label.grid(row=i // self.columns, column=i % self.columns, padx=4)
+                label.bind(
+                    "<Button-1>",
+                    lambda _, image_key=image_key, label=label: toggle(
+                        image_key, label
+                    ),
+                )
+
+            page_count = (len(pending) + page_size - 1) // page_size
+            page_label.config(text=f"Page {page + 1}/{page_count}")
+
+        def change_page(step):
+            nonlocal page
+            page_count = (len(pending) + page_size - 1) // page_size
+            page = min(max(page + step, 0), page_count - 1)
+            show_page()
+
+        def done():
+            nonlocal completed
+            completed = True
+            root.destroy()
+
+        tk.Button(controls, text="Previous", command=lambda: change_page(-1)).pack(
+            side="left"
+        )
+        page_label.pack(side="left", expand=True)
+        tk.Button(controls, text="Done", command=done).pack(side="right")
+        tk.Button(controls, text="Next", command=lambda: change_page(1)).pack(
+            side="right"
+        )
+
+        show_page()
+        root.mainloop()
+
+        if not completed:
+            return {}
+        return {image_key: decisions[image_key] for image_key in shown}
@@ -0,0 +1,111 @@
+import os
+import re
+import base64
+import hashlib
+import binascii
+import mimetypes
+from urllib.parse import quote
+
+# e.g. <img alt="" src="data:image/png;base64,
+DATA_URI_MIME_TYPE = re.compile(r"data:([\w.+-]+/[\w.+-]+)", re.IGNORECASE)
+
+
+class ImageStore:
+    """Writes the base64 images of a merged HTML file to an asset directory beside it, named by the hash of their content.
+
+    An image used by any number of the merged files, or any number of times in one of them, is stored once, and images
+    already in the directory from a previous merge are not written again. replace_image() is an on_image callback for
+    StreamingImageFilter that swaps each base64 image tag for a lazily loaded tag referencing the stored file.
+
+    asset_path (str): the asset directory, e.g. "Course/Course assets" for "Course/Course.html"
+    asset_url (str | None): URL of the asset directory relative to the HTML that references the images. None is the name of
+        the asset directory, for HTML files beside it
+    """
+
+    def __init__(self, asset_path, asset_url=None):
+        self.asset_path = asset_path
+        # created even if there are no images, its absence means the merged file needs to be written again
+        os.makedirs(asset_path, exist_ok=True)
+        self.asset_url = asset_url or quote(os.path.basename(asset_path))
+        self.reference_pattern = re.compile(
+            re.escape(self.asset_url) + r"/([0-9a-f]{2}/[0-9a-f]{64}\.[\w.+-]+)"
+        )
+        # relative paths in the asset directory of the images referenced by the merged file
+        self.used = set()
+        # size of the images written, and of the inline image tags they replaced
+        self.stored_bytes = 0
+        self.replaced_bytes = 0
+
+    @staticmethod
+    def asset_path_for(merged_file_path):
+        return f"{os.path.splitext(merged_file_path)[0]} assets"
+
+    def store(self, data, mime_type):
+        """
+        Stores an image, returns its path relative to the asset directory.
+        data (bytes): the image file
+        mime_type (str): the type of the image, which determines its extension
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        extension = mimetypes.guess_extension(mime_type.lower()) or ".bin"
+        # a level of subdirectories keeps directory listings short for documents with thousands of images
+        relative_path = f"{digest[:2]}/{digest}{extension}"
+        if relative_path in self.used:
+            return relative_path
+
+        path = os.path.join(self.asset_path, digest[:2], f"{digest}{extension}")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written under a temporary name so that a partially written image is never mistaken for a stored one
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self.stored_bytes += len(data)
+        self.used.add(relative_path)
+        return relative_path
+
+    def replace_image(self, tag_start, data, tag_end):
+        """Returns an image tag referencing the stored image, see StreamingImageFilter.on_image"""
+        mime_match = DATA_URI_MIME_TYPE.search(tag_start)
+        try:
+            image = base64.b64decode(data, validate=True)
+        except (binascii.Error, ValueError):
+            # leave images that can't be decoded inline
+            return tag_start + data + tag_end
+        relative_path = self.store(
+            image, mime_match.group(1) if mime_match else "application/octet-stream"
+        )
+        self.replaced_bytes += len(tag_start) + len(data) + len(tag_end)
+
+        # the src attribute's value starts at "data:", the quote closing it starts tag_end
+        src_start = tag_start.lower().rfind("data:")
+        return (
+            '<img loading="lazy" decoding="async"'
+            + tag_start[len("<img") : src_start]
+            + f"{self.asset_url}/{relative_path}"
+            + tag_end
+        )
+
+    def record_references(self, html_path):
+        """Records the stored images referenced by an HTML file written earlier, so that remove_unused() keeps them"""
+        with open(html_path, "r", encoding="utf8", errors="ignore") as f:
+            self.used.update(self.reference_pattern.findall(f.read()))
+
+    def remove_unused(self):
+        """Deletes the images in the asset directory that the merged file no longer references"""
+        if not os.path.isdir(self.asset_path):
+            return
+        with os.scandir(self.asset_path) as it:
+            subdirectories = [entry for entry in it if entry.is_dir()]
+        for subdirectory in subdirectories:
+            with os.scandir(subdirectory.path) as it:
+                unused = [
+                    entry.path
+                    for entry in it
+                    if f"{subdirectory.name}/{entry.name}" not in self.used
+                ]
+            for path in unused:
+                os.remove(path)
+            if unused and not os.listdir(subdirectory.path):
+                os.rmdir(subdirectory.path)
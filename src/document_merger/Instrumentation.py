@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import threading
+from collections import Counter, defaultdict
+
+
+class Span:
+    """Times a block of code and records it as an event of an Instrumentation when the block exits"""
+
+    def __init__(self, instrumentation, name, file, args):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.file = file
+        self.args = args
+
+    def __enter__(self):
+        self.start_us = time.time_ns() // 1000
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start_time
+        self.instrumentation.add_event(
+            self.name, self.file, self.start_us, duration, self.args
+        )
+        return False
+
+
+class NoSpan:
+    """Span returned while instrumentation is disabled, which records nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_SPAN = NoSpan()
+
+
+class Instrumentation:
+    """Collects the durations of the stages of a run, along with counters such as cache hits and bytes read and written.
+
+    Stages are timed with span(), e.g. with instrumentation.span("mammoth", file=path): ..., and each span is recorded as
+    an event. Events are timestamped with the wall clock, so the events of worker processes can be merged into the main
+    process's instrumentation with snapshot() and merge(). summary() describes where the time went, and export_trace()
+    writes the events in the Chrome trace event format, which can be opened in chrome://tracing or https://ui.perfetto.dev.
+
+    While disabled, span() and count() do nothing, so instrumentation can be left in place at no noticeable cost.
+
+    enabled (bool): Whether events and counters are recorded.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # {"name", "file", "start_us", "duration", "pid", "tid", "args"}
+        self.events = []
+        self.counters = Counter()
+
+    def span(self, name, file=None, **args):
+        """
+        Returns a context manager that records the time spent in its block.
+        name (str): the stage, e.g. "convert", "hash", "pdf2docx", "mammoth", "ocr", "merge", "cache_write"
+        file (str | None): the file or directory the stage ran on
+        args: any other details to record with the event, e.g. the number of images in an OCR batch
+        """
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, file, args)
+
+    def add_event(self, name, file, start_us, duration, args):
+        event = {
+            "name": name,
+            "file": file,
+            "start_us": start_us,
+            "duration": duration,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def count(self, name, amount=1):
+        """
+        Adds to a counter, e.g. "path_map_hits" or "bytes_read".
+        name (str): the counter
+        amount (int): the amount to add
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += amount
+
+    def snapshot(self):
+        """Returns the events and counters recorded so far, to be passed to merge() in another process"""
+        with self.lock:
+            return {"events": list(self.events), "counters": dict(self.counters)}
+
+    def merge(self, snapshot):
+        with self.lock:
+            self.events.extend(snapshot["events"])
+            self.counters.update(snapshot["counters"])
+
+    def stage_totals(self):
+        """Returns {stage: (number of events, total seconds)}, slowest stage first"""
+        totals = defaultdict(lambda: [0, 0.0])
+        for event in self.events:
+            totals[event["name"]][0] += 1
+            totals[event["name"]][1] += event["duration"]
+        return dict(sorted(totals.items(), key=lambda item: -item[1][1]))
+
+    def file_totals(self):
+        """Returns {file: seconds} of the time spent converting each file, slowest file first"""
+        totals = Counter()
+        for event in self.events:
+            if event["name"] == "convert":
+                totals[event["file"]] += event["duration"]
+        return dict(totals.most_common())
+
+    def summary(self, slowest_files_count=10):
+        """
+        Returns a description of the run: the time spent in each stage, by file type and by directory, the counters, and
+        the slowest files.
+        slowest_files_count (int): number of files to list
+        """
+        lines = ["Stage timings:"]
+        for name, (count, seconds) in self.stage_totals().items():
+            lines.append(
+                f"  {name:<16} {count:>6} x {seconds:>9.2f} s total {seconds / count:>8.3f} s mean"
+            )
+
+        file_totals = self.file_totals()
+        type_totals = defaultdict(lambda: [0, 0.0])
+        for file, seconds in file_totals.items():
+            file_type = os.path.splitext(file)[1].lstrip(".").lower() or "none"
+            type_totals[file_type][0] += 1
+            type_totals[file_type][1] += seconds
+        if type_totals:
+            lines.append("Conversion time by file type:")
+            for file_type, (count, seconds) in sorted(
+                type_totals.items(), key=lambda item: -item[1][1]
+            ):
+                lines.append(f"  {file_type:<16} {count:>6} files {seconds:>9.2f} s")
+
+        directory_totals = Counter()
+        for event in self.events:
+            if event["name"] == "directory":
+                directory_totals[event["file"]] += event["duration"]
+        if directory_totals:
+            lines.append("Time by directory:")
+            for directory, seconds in directory_totals.most_common():
+                lines.append(f"  {seconds:>9.2f} s  {directory}")
+
+        if self.counters:
+            lines.append("Counters:")
+            for name, value in sorted(self.counters.items()):
+                if name.startswith("bytes_"):
+                    lines.append(f"  {name:<24} {value / 1024 / 1024:>12.1f} MB")
+                else:
+                    lines.append(f"  {name:<24} {value:>12}")
+
+        if file_totals and slowest_files_count:
+            lines.append("Slowest files:")
+            for file, seconds in list(file_totals.items())[:slowest_files_count]:
+                lines.append(f"  {seconds:>9.2f} s  {file}")
+
+        return "\n".join(lines)
+
+    def export_trace(self, path):
+        """
+        Writes the events to path in the Chrome trace event format, with the counters in its metadata.
+        path (str): location of the JSON file
+        """
+        trace_events = []
+        for event in self.events:
+            args = dict(event["args"])
+            if event["file"] is not None:
+                args["file"] = event["file"]
+            trace_events.append(
+                {
+                    "name": event["name"],
+                    "cat": event["name"],
+                    "ph": "X",
+                    "ts": event["start_us"],
+                    "dur": round(event["duration"] * 1_000_000),
+                    "pid": event["pid"],
+                    "tid": event["tid"],
+                    "args": args,
+                }
+            )
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "traceEvents": trace_events,
+                    "displayTimeUnit": "ms",
+                    "otherData": {"counters": dict(self.counters)},
+                },
+                f,
+            )
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import subprocess
+
+
+class OCREngine:
+    """Base class of the engines that turn images into text for a Converter.
+
+    recognize() OCRs a single image. recognize_batch() OCRs several images and returns their text in the same order,
+    engines that can OCR several images more cheaply than one at a time set batched and override it.
+    """
+
+    batched = False
+
+    def recognize(self, img):
+        raise NotImplementedError
+
+    def recognize_batch(self, imgs):
+        return [self.recognize(img) for img in imgs]
+
+
+class PytesseractEngine(OCREngine):
+    """Runs a new tesseract process for every image through pytesseract"""
+
+    def __init__(self, tesseract_path):
+        self.tesseract_path = tesseract_path
+
+    def recognize(self, img):
+        # imported on first use, importing pytesseract also imports numpy
+        import pytesseract
+
+        pytesseract.pytesseract.tesseract_cmd = self.tesseract_path
+        return pytesseract.image_to_string(img)
+
+
+class BatchTesseractEngine(OCREngine):
+    """Runs a single tesseract process for a whole batch of images, so the startup cost is paid once per batch.
+
+    The images are written to a temporary directory and tesseract is given a list file of their paths, which it reads as
+    a multi page document. The text of each page is followed by a form feed, so the output is split on form feeds. If
+    tesseract fails, or the output doesn't have one page per image, the batch is OCR'd one image at a time instead.
+
+    tesseract_path (str): location of the tesseract executable
+    timeout (float | None): seconds a batch may take before it is abandoned and OCR'd one image at a time
+    """
+
+    batched = True
+
+    def __init__(self, tesseract_path, timeout=None):
+        self.tesseract_path = tesseract_path
+        self.timeout = timeout
+        self.fallback = PytesseractEngine(tesseract_path)
+
+    def recognize(self, img):
+        return self.fallback.recognize(img)
+
+    def recognize_batch(self, imgs):
+        if len(imgs) <= 1:
+            return [self.recognize(img) for img in imgs]
+
+        with tempfile.TemporaryDirectory(prefix="document-merger-ocr-") as temp_dir:
+            image_paths = []
+            for i, img in enumerate(imgs):
+                image_path = os.path.join(temp_dir, f"{i}.png")
+                img.save(image_path)
+                image_paths.append(image_path)
+
+            list_path = os.path.join(temp_dir, "images.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(image_paths) + "\n")
+
+            try:
+                result = subprocess.run(
+                    [self.tesseract_path, list_path, "stdout"],
+                    check=True,
+                    timeout=self.timeout,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                )
+            except (OSError, subprocess.SubprocessError):
+                return self.fallback.recognize_batch(imgs)
+
+        pages = result.stdout.decode("utf-8", errors="replace").split("\f")
+        # the last page is followed by a form feed too
+        if pages and not pages[-1].strip():
+            pages.pop()
+        if len(pages) != len(imgs):
+            return self.fallback.recognize_batch(imgs)
+        return pages
+
+
+def create_ocr_engine(config):
+    """Returns the OCR engine selected by config.ocr_engine"""
+    if config.ocr_engine == "batch":
+        return BatchTesseractEngine(config.tesseract_path)
+    return PytesseractEngine(config.tesseract_path)
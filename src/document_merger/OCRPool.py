@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class OCRPool:
+    """A bounded pool of threads that run OCR jobs, with single-flight deduplication of identical images.
+
+    Each job is keyed on the hash of its image. The first request for a key starts the job; any later request for the
+    same key, including requests made while the job is still running, is given the same future instead of starting
+    another OCR run. Futures of successful jobs are kept for the lifetime of the pool, so an image is OCR'd at most once
+    per run. A failed job is forgotten once it finishes: the requests that were given its future see the error, and the
+    next request for the key runs the OCR again.
+
+    max_workers (int): The maximum number of OCR jobs that run at the same time.
+    """
+
+    def __init__(self, max_workers):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ocr"
+        )
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def submit(self, key, fn, *args):
+        """
+        Returns a future for the result of fn(*args), only calling fn if no job with the same key has been submitted.
+        key (Hashable): the identity of the job, i.e. the hash of the image
+        fn (Callable): the function that performs the OCR
+        """
+        with self.lock:
+            future = self.futures.get(key)
+            if future is not None:
+                return future
+            future = self.executor.submit(fn, *args)
+            self.futures[key] = future
+        # outside the lock, the callback runs immediately if the job has already finished
+        future.add_done_callback(lambda future: self.forget_if_failed(key, future))
+        return future
+
+    def forget_if_failed(self, key, future):
+        if future.cancelled() or future.exception() is not None:
+            with self.lock:
+                if self.futures.get(key) is future:
+                    del self.futures[key]
+
+    def is_submitted(self, key):
+        with self.lock:
+            return key in self.futures
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
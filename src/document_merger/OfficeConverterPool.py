@@ -0,0 +1,213 @@
+import queue
+import shutil
+import socket
+import tempfile
+import subprocess
+import time
+from pathlib import Path
+
+
+class OfficeConversionError(Exception):
+    pass
+
+
+def find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class OfficeProcess:
+    """A long-lived headless LibreOffice listening on a local port, started through unoserver.
+
+    Documents are converted by the unoconvert client, which hands the job to the already running LibreOffice instead of
+    starting a new one. Each process has its own LibreOffice user profile, so several can run at the same time.
+
+    unoserver_path (str): location of the unoserver executable
+    unoconvert_path (str): location of the unoconvert executable
+    startup_timeout (float): seconds to wait for LibreOffice to start listening
+    """
+
+    def __init__(
+        self,
+        unoserver_path="unoserver",
+        unoconvert_path="unoconvert",
+        startup_timeout=60,
+    ):
+        self.unoserver_path = unoserver_path
+        self.unoconvert_path = unoconvert_path
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.port = None
+        self.profile_dir = None
+
+    def start(self):
+        self.port = find_free_port()
+        self.profile_dir = tempfile.mkdtemp(prefix="document-merger-office-")
+        self.process = subprocess.Popen(
+            [
+                self.unoserver_path,
+                "--interface",
+                "127.0.0.1",
+                "--port",
+                str(self.port),
+                "--uno-port",
+                str(find_free_port()),
+                "--user-installation",
+                Path(self.profile_dir).as_uri(),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        deadline = time.monotonic() + self.startup_timeout
+        while not self.is_healthy():
+            if self.process.poll() is not None:
+                raise OfficeConversionError(
+                    f"unoserver exited during startup with code {self.process.returncode}"
+                )
+            if time.monotonic() > deadline:
+                self.stop()
+                raise OfficeConversionError(
+                    f"unoserver did not start listening within {self.startup_timeout} seconds"
+                )
+            time.sleep(0.25)
+
+    def is_healthy(self):
+        # alive and accepting connections
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def convert(self, input_file_path, output_file_path, timeout):
+        subprocess.run(
+            [
+                self.unoconvert_path,
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(self.port),
+                "--convert-to",
+                output_file_path.split(".")[-1],
+                input_file_path,
+                output_file_path,
+            ],
+            check=True,
+            timeout=timeout,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+
+class FakeOfficeProcess:
+    """A stand-in for OfficeProcess that doesn't need LibreOffice, for testing OfficeConverterPool.
+
+    Every conversion writes a one page placeholder PDF.
+
+    delay (float): seconds each conversion takes
+    hang_on (Callable | None): a function that takes the input path and returns True if that conversion should hang
+    """
+
+    placeholder_pdf = (
+        b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+        b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+        b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj\n"
+        b"trailer<</Root 1 0 R>>\n%%EOF\n"
+    )
+
+    def __init__(self, delay=0, hang_on=None):
+        self.delay = delay
+        self.hang_on = hang_on
+        self.running = False
+        self.starts = 0
+        self.conversions = 0
+
+    def start(self):
+        self.running = True
+        self.starts += 1
+
+    def is_healthy(self):
+        return self.running
+
+    def convert(self, input_file_path, output_file_path, timeout):
+        if self.hang_on is not None and self.hang_on(input_file_path):
+            time.sleep(timeout)
+            raise subprocess.TimeoutExpired("fake office", timeout)
+        time.sleep(self.delay)
+        with open(output_file_path, "wb") as f:
+            f.write(self.placeholder_pdf)
+        self.conversions += 1
+
+    def stop(self):
+        self.running = False
+
+
+class OfficeConverterPool:
+    """A pool of long-lived office processes that are reused across conversions.
+
+    A process is only started the first time it is needed. Before each job the process is health checked and restarted
+    if it has died. A job that takes longer than job_timeout is treated as a hang: the process is restarted and the job
+    is retried once on the fresh process.
+
+    size (int): number of office processes, i.e. how many threads can convert at the same time
+    job_timeout (float): seconds a single conversion may take
+    process_factory (Callable): returns a new, unstarted process, i.e. OfficeProcess or FakeOfficeProcess
+    """
+
+    def __init__(self, size, job_timeout, process_factory=OfficeProcess):
+        self.job_timeout = job_timeout
+        self.processes = [process_factory() for _ in range(size)]
+        self.idle = queue.Queue()
+        for process in self.processes:
+            self.idle.put(process)
+
+    def convert(self, input_file_path, output_file_path):
+        process = self.idle.get()
+        try:
+            for attempt in range(2):
+                if not process.is_healthy():
+                    self.restart(process)
+
+                try:
+                    process.convert(
+                        input_file_path, output_file_path, timeout=self.job_timeout
+                    )
+                    return True
+                except subprocess.TimeoutExpired:
+                    error = f"timed out after {self.job_timeout} seconds"
+                except subprocess.CalledProcessError as e:
+                    error = (e.stderr or b"").decode(errors="ignore").strip()
+
+                # the process may be hung or broken, don't reuse it for the retry or the next job
+                self.restart(process)
+
+            raise OfficeConversionError(
+                f"Failed to convert '{input_file_path}' to '{output_file_path}': {error}"
+            )
+        finally:
+            self.idle.put(process)
+
+    def restart(self, process):
+        process.stop()
+        process.start()
+
+    def shutdown(self):
+        for process in self.processes:
+            process.stop()
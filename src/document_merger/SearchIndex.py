@@ -0,0 +1,262 @@
+import os
+import sys
+import hashlib
+import sqlite3
+import argparse
+from html.parser import HTMLParser
+
+
+class HTMLTextExtractor(HTMLParser):
+    """Collects the text of an HTML document that is fed in as a stream of chunks, leaving out scripts and styles"""
+
+    skipped_tags = ("script", "style")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.skipped_tags:
+            self.skipping += 1
+        # tags separate words, e.g. "<p>a</p><p>b</p>" is "a b"
+        self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in self.skipped_tags and self.skipping:
+            self.skipping -= 1
+        self.parts.append(" ")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+    def text(self):
+        self.close()
+        return " ".join("".join(self.parts).split())
+
+
+class SearchIndex:
+    """A SQLite FTS5 full-text index of the merged files, built by DocumentMerger as it merges.
+
+    Each converted file that goes into a merged file is an entry, holding its text (including the OCR text of its
+    images) along with the input file it was converted from, the directory it was merged for, and the anchor of its
+    start in the merged file, or in the part of the merged file holding it if it is split into parts. Entries are only
+    re-indexed when their converted file changes, and entries of inputs that are no longer part of a merged file are
+    removed.
+
+    The index can be queried with search(), or from the command line:
+        python -m document_merger.SearchIndex <index path> <query> [--limit N] [--directory NAME]
+
+    path (str): location of the SQLite database
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # autocommit, every statement is its own transaction unless one is opened explicitly
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS sources (
+                id INTEGER PRIMARY KEY,
+                merged_file TEXT NOT NULL,
+                source_path TEXT NOT NULL,
+                directory TEXT NOT NULL,
+                anchor TEXT NOT NULL,
+                version TEXT NOT NULL,
+                document TEXT,
+                UNIQUE (merged_file, source_path)
+            )""")
+        # indexes created before merged files could be split into parts have no document column
+        columns = [
+            row[1] for row in self.connection.execute("PRAGMA table_info(sources)")
+        ]
+        if "document" not in columns:
+            self.connection.execute("ALTER TABLE sources ADD COLUMN document TEXT")
+        # the rowid of each row is the id of its source
+        self.connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS source_text USING fts5(text, tokenize = 'porter unicode61')"
+        )
+
+    @staticmethod
+    def anchor(source_path):
+        """Returns the id of the anchor that DocumentMerger writes before the text of source_path in the merged file"""
+        return f"source-{hashlib.sha1(source_path.encode()).hexdigest()[:12]}"
+
+    @staticmethod
+    def version(converted_path):
+        """Returns a value that changes whenever the converted file does, e.g. when its OCR text is updated after a review"""
+        stat = os.stat(converted_path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def is_current(self, merged_file, source_path, version):
+        """Returns whether the entry of source_path in merged_file was indexed from this version of its converted file"""
+        row = self.connection.execute(
+            "SELECT version FROM sources WHERE merged_file = ? AND source_path = ?",
+            (merged_file, source_path),
+        ).fetchone()
+        return row is not None and row[0] == version
+
+    def has_merged_file(self, merged_file):
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM sources WHERE merged_file = ? LIMIT 1", (merged_file,)
+            ).fetchone()
+            is not None
+        )
+
+    def update(self, merged_file, directory, entries):
+        """
+        Replaces the entries of merged_file in one transaction.
+        merged_file (str): path of the merged file
+        directory (str): the directory it was merged for
+        entries (list[tuple[str, str, str | None, str]]): (source path, version, text, document) of each converted
+            file in the merged file, where document is the file its anchor is in. A text of None keeps the text that is
+            already indexed for the source
+        """
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            existing = dict(
+                self.connection.execute(
+                    "SELECT source_path, id FROM sources WHERE merged_file = ?",
+                    (merged_file,),
+                ).fetchall()
+            )
+            kept = set()
+            for source_path, version, text, document in entries:
+                kept.add(source_path)
+                if source_path in existing:
+                    source_id = existing[source_path]
+                    # the part holding an unchanged file can change when the files before it do
+                    self.connection.execute(
+                        "UPDATE sources SET directory = ?, version = ?, document = ? WHERE id = ?",
+                        (directory, version, document, source_id),
+                    )
+                    if text is None:
+                        continue
+                    self.connection.execute(
+                        "DELETE FROM source_text WHERE rowid = ?", (source_id,)
+                    )
+                else:
+                    source_id = self.connection.execute(
+                        "INSERT INTO sources (merged_file, source_path, directory, anchor, version, document) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            merged_file,
+                            source_path,
+                            directory,
+                            self.anchor(source_path),
+                            version,
+                            document,
+                        ),
+                    ).lastrowid
+                self.connection.execute(
+                    "INSERT INTO source_text (rowid, text) VALUES (?, ?)",
+                    (source_id, text or ""),
+                )
+
+            for source_path, source_id in existing.items():
+                if source_path not in kept:
+                    self.connection.execute(
+                        "DELETE FROM sources WHERE id = ?", (source_id,)
+                    )
+                    self.connection.execute(
+                        "DELETE FROM source_text WHERE rowid = ?", (source_id,)
+                    )
+
+    @staticmethod
+    def quote_term(term):
+        # quoted, so that characters with a meaning in FTS5 queries are searched for as text
+        prefix = "*" if term.endswith("*") else ""
+        term = term.rstrip("*").replace('"', '""')
+        return f'"{term}"{prefix}'
+
+    def search(self, query, limit=20, directory=None, raw=False):
+        """
+        Returns the best matches for query, best first, as dicts of "source_path", "directory", "merged_file", "anchor",
+        "url" (the merged file, or its part, and anchor), "snippet" (the matching text, with matches in [brackets]) and
+        "rank".
+        query (str): words to search for, all of which must match. Prefix matches are written as "word*"
+        limit (int): maximum number of matches
+        directory (str | None): only match entries merged for this directory
+        raw (bool): pass query to FTS5 as-is, to use its query syntax (phrases, OR, NEAR, column filters)
+        """
+        if not raw:
+            query = " ".join(
+                self.quote_term(term) for term in query.split() if term.strip("*")
+            )
+        if not query:
+            return []
+
+        sql = (
+            "SELECT s.source_path, s.directory, s.merged_file, s.document, s.anchor, "
+            "snippet(source_text, 0, '[', ']', '...', 16), bm25(source_text) "
+            "FROM source_text JOIN sources s ON s.id = source_text.rowid "
+            "WHERE source_text MATCH ?"
+        )
+        parameters = [query]
+        if directory is not None:
+            sql += " AND s.directory = ?"
+            parameters.append(directory)
+        sql += " ORDER BY bm25(source_text) LIMIT ?"
+        parameters.append(limit)
+
+        return [
+            {
+                "source_path": source_path,
+                "directory": directory,
+                "merged_file": merged_file,
+                "anchor": anchor,
+                "url": f"{document or merged_file}#{anchor}",
+                "snippet": snippet,
+                "rank": rank,
+            }
+            for source_path, directory, merged_file, document, anchor, snippet, rank in self.connection.execute(
+                sql, parameters
+            ).fetchall()
+        ]
+
+    def close(self):
+        self.connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Searches the full-text index of merged files"
+    )
+    parser.add_argument("index", help="location of the search index database")
+    parser.add_argument("query", nargs="+", help="words to search for")
+    parser.add_argument(
+        "--limit", type=int, default=20, help="maximum number of results"
+    )
+    parser.add_argument(
+        "--directory", help="only search the merged file of this directory"
+    )
+    parser.add_argument(
+        "--raw", action="store_true", help="pass the query to FTS5 as-is"
+    )
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.index):
+        parser.error(f"Search index '{args.index}' doesn't exist")
+    index = SearchIndex(args.index)
+    try:
+        hits = index.search(
+            " ".join(args.query), args.limit, directory=args.directory, raw=args.raw
+        )
+    except sqlite3.OperationalError as e:
+        parser.error(f"Invalid query: {e}")
+    finally:
+        index.close()
+
+    for hit in hits:
+        print(
+            f"{hit['directory']}  {hit['source_path']}\n  {hit['url']}\n  {hit['snippet']}"
+        )
+    if not hits:
+        print("No matches")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
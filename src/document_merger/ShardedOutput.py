@@ -0,0 +1,114 @@
+import os
+import html
+import hashlib
+from urllib.parse import quote
+
+
+class ShardedOutput:
+    """Splits a merged HTML file into parts, written to a "<name> parts" directory beside it, and replaces the merged file
+    itself with a table of contents linking to each part and to each file in it.
+
+    Each part is named by a hash of the converted files in it (their paths and fingerprints) and the merge options, so a
+    part whose file already exists is unchanged and isn't written again. Parts that are no longer used are removed by
+    finish().
+
+    merged_file_path (str): the merged file, which becomes the table of contents
+    mode (str): "size" to fill each part with files up to max_size bytes, "file" for a part per converted file
+    max_size (int): size in bytes that a part of "size" mode shouldn't exceed, unless a single file does
+    """
+
+    def __init__(self, merged_file_path, mode, max_size):
+        self.merged_file_path = merged_file_path
+        self.mode = mode
+        self.max_size = max_size
+        self.parts_path = self.parts_path_for(merged_file_path)
+        os.makedirs(self.parts_path, exist_ok=True)
+        # (part path, [(source path, anchor)], size) of each part, in order
+        self.parts = []
+
+    @staticmethod
+    def parts_path_for(merged_file_path):
+        return f"{os.path.splitext(merged_file_path)[0]} parts"
+
+    def plan(self, sizes, source_paths):
+        """
+        Returns the indices of the files in each part.
+        sizes (list[int]): the size of each converted file, in merge order
+        source_paths (list[str]): the input file of each converted file
+        """
+        if self.mode == "file":
+            return [[i] for i in range(len(sizes))]
+
+        parts = []
+        part = []
+        part_size = 0
+        for i, size in enumerate(sizes):
+            if part and part_size + size > self.max_size:
+                parts.append(part)
+                part, part_size = [], 0
+            part.append(i)
+            part_size += size
+            # parts also end after files picked by the hash of their path, once they are half full. A change to the size
+            # of one file then only moves the boundaries of the parts up to the next picked file, instead of every part
+            # after it
+            if (
+                part_size >= self.max_size / 2
+                and hashlib.sha1(source_paths[i].encode()).digest()[0] % 2 == 0
+            ):
+                parts.append(part)
+                part, part_size = [], 0
+        if part:
+            parts.append(part)
+        return parts
+
+    def part_path(self, key):
+        """
+        Returns the path of the part identified by key.
+        key (str): the paths and fingerprints of the part's converted files and the merge options
+        """
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return os.path.join(self.parts_path, f"part {digest}.html")
+
+    def add_part(self, part_path, sources, size):
+        """
+        Records a part for the table of contents.
+        part_path (str): the part, from part_path()
+        sources (list[tuple[str, str]]): the source path and anchor of each file in the part
+        size (int): the size of the converted files in the part
+        """
+        self.parts.append((part_path, sources, size))
+
+    def finish(self, title):
+        """
+        Removes the parts that weren't added, and writes the table of contents to the merged file.
+        title (str): heading of the table of contents
+        """
+        used = {os.path.basename(part_path) for part_path, _, _ in self.parts}
+        with os.scandir(self.parts_path) as it:
+            unused = [entry.path for entry in it if entry.name not in used]
+        for path in unused:
+            os.remove(path)
+
+        parts_url = quote(os.path.basename(self.parts_path))
+        lines = [
+            "<!DOCTYPE html>",
+            '<html><head><meta charset="utf-8">',
+            f"<title>{html.escape(title)}</title></head><body>",
+            f"<h1>{html.escape(title)}</h1>",
+            "<ol>",
+        ]
+        for number, (part_path, sources, size) in enumerate(self.parts, 1):
+            part_url = f"{parts_url}/{quote(os.path.basename(part_path))}"
+            lines.append(
+                f'<li><a href="{part_url}">Part {number}</a> '
+                f"({len(sources)} files, {size / 1024 / 1024:.1f} MB)<ul>"
+            )
+            lines.extend(
+                f'<li><a href="{part_url}#{anchor}">{html.escape(os.path.basename(source_path))}</a></li>'
+                for source_path, anchor in sources
+            )
+            lines.append("</ul></li>")
+        lines.append("</ol></body></html>")
+
+        with open(self.merged_file_path, "w", encoding="utf8") as f:
+            f.write("\n".join(lines))
@@ -1,16 +1,48 @@
+import os
+import sys
+import time
+import shutil
+import threading
+import multiprocessing
 from collections import OrderedDict
 from datetime import datetime
 
 
 class StatusTable(object):
+    """Shows the progress of a run.
 
-    def __new__(cls, print_output):
+    In "rows" mode every update prints a row of the table. In "live" mode updates only change the state of the table,
+    which a background thread redraws at most refresh_rate times a second: one live row per worker above a log of the
+    completed files, which scrolls up as files finish. When stdout isn't a terminal, live mode prints one compact
+    summary line every summary_interval seconds instead.
+
+    Worker processes forward their updates through the queue returned by worker_queue(), so that only the main process
+    writes to the terminal and each worker gets its own row.
+
+    print_output (bool): Flag to print anything at all
+    mode (str): "rows" or "live"
+    refresh_rate (float): Maximum number of redraws per second in live mode
+    summary_interval (float): Seconds between summary lines in live mode when stdout isn't a terminal
+    """
+
+    # set in worker processes, updates are put on this queue instead of being shown
+    forward_queue = None
+
+    def __new__(cls, print_output, **kwargs):
         if not hasattr(cls, "instance"):
             cls.instance = super(StatusTable, cls).__new__(cls)
             cls.instance.print_output = print_output
         return cls.instance
 
-    def __init__(self, print_output):
+    def __init__(self, print_output, mode="rows", refresh_rate=4, summary_interval=10):
+        # the table is a singleton, stop the renderer of the previous live table before replacing it. A forked worker
+        # process inherits the table but not its renderer thread
+        if (
+            getattr(self, "renderer", None) is not None
+            and self.renderer_pid == os.getpid()
+        ):
+            self.close()
+
         self.double_chars = ["❌", "✅"]
         self.columns = OrderedDict(
             [
@@ -35,8 +67,30 @@ class StatusTable(object):
         self.status["AP?"] = "❌"
 
         self.print_output = print_output
+        self.mode = mode
+        self.refresh_rate = refresh_rate
+        self.summary_interval = summary_interval
+        self.live = print_output and mode == "live" and self.forward_queue is None
 
-        self.print(title=True)
+        if self.live:
+            self.lock = threading.Lock()
+            self.is_terminal = sys.stdout.isatty()
+            # worker process id: its row, and the label shown for it
+            self.worker_rows = {}
+            self.worker_labels = {}
+            # completed files that haven't been drawn yet, and the number completed in total
+            self.completed_log = []
+            self.completed_count = 0
+            self.changed = False
+            # number of lines of the live rows currently on the terminal, they are redrawn in place
+            self.drawn_line_count = 0
+            self.last_summary_time = time.monotonic()
+            self.renderer = None
+            self.renderer_pid = os.getpid()
+            self.stop_renderer = threading.Event()
+            self.queue_listener = None
+        elif self.forward_queue is None:
+            self.print(title=True)
 
     def update_statuses(self, statuses, show=True, reset_to={}):
         """
@@ -44,6 +98,13 @@ class StatusTable(object):
         show (bool): flag to show changed values immediately or on next update
         reset_to (dict[str]): reset the status to this value on next change
         """
+        if self.forward_queue is not None:
+            self.forward_queue.put((os.getpid(), dict(statuses), dict(reset_to)))
+            return
+        if self.live:
+            self.apply_update(None, statuses, reset_to)
+            return
+
         for k in statuses:
             if k in self.columns:
                 self.status[k] = statuses[k]
@@ -62,6 +123,12 @@ class StatusTable(object):
         show (bool): flag to show changed values immediately or on next update
         reset_to (any): reset the status to this value on next change
         """
+        if self.forward_queue is not None or self.live:
+            self.update_statuses(
+                {key: value}, reset_to={key: reset_to} if reset_to else {}
+            )
+            return
+
         if key in self.columns:
             self.status[key] = value
             if show:
@@ -70,6 +137,18 @@ class StatusTable(object):
             if reset_to:
                 self.status[key] = reset_to
 
+    def file_completed(self, already_processed=False):
+        """
+        Counts an input file as completed in live mode, once its last conversion stage has finished. The "Done" statuses of
+        intermediate stages, e.g. PDF to DOCX on the way to HTML, and of merges aren't counted.
+        already_processed (bool): flag that the file wasn't converted because its output was reused
+        """
+        if self.forward_queue is not None or self.live:
+            # not a column, only tells the live table which update completes a file
+            self.update_statuses(
+                {"Completed": "already processed" if already_processed else "done"}
+            )
+
     def glen(self, key):
         """
         dirty approximation of glyph length of string with emojis. ✅ = 2 characters in monospace.
@@ -112,3 +191,148 @@ class StatusTable(object):
                         ]
                     )
                 )
+
+    def apply_update(self, worker, statuses, reset_to):
+        """
+        Updates a row of the live table.
+        worker (int | None): process id of the worker that sent the update, None for the main process
+        statuses (dict[str]): the names and values of the columns that will be updated
+        reset_to (dict[str]): values the columns are reset to once the update has been applied
+        """
+        with self.lock:
+            if worker is None:
+                row = self.status
+            else:
+                if worker not in self.worker_rows:
+                    self.worker_rows[worker] = {c: "" for c in self.columns}
+                    self.worker_labels[worker] = f"worker {len(self.worker_labels) + 1}"
+                row = self.worker_rows[worker]
+
+            for k in statuses:
+                if k in self.columns:
+                    row[k] = statuses[k]
+            if "Completed" in statuses:
+                self.log_completed(row, statuses["Completed"])
+            for k in reset_to:
+                if k in self.columns:
+                    row[k] = reset_to[k]
+            self.changed = True
+
+        if self.renderer is None:
+            self.start_renderer()
+
+    def log_completed(self, row, done):
+        self.completed_count += 1
+        if self.is_terminal:
+            self.completed_log.append(
+                f"{str(datetime.now())[11:19]}  {done:<17}  {row['Directory']}  {row['File Name']}"
+            )
+
+    def start_renderer(self):
+        with self.lock:
+            if self.renderer is not None:
+                return
+            self.stop_renderer.clear()
+            self.renderer = threading.Thread(target=self.render_loop, daemon=True)
+            self.renderer.start()
+
+    def render_loop(self):
+        while not self.stop_renderer.wait(1 / self.refresh_rate):
+            self.render()
+
+    def live_rows(self):
+        rows = [("main", self.status)]
+        rows.extend(
+            (self.worker_labels[worker], row)
+            for worker, row in self.worker_rows.items()
+        )
+        return rows
+
+    def format_row(self, label, row):
+        return (
+            f"{label:<9} {row['Directory'][:20]:<20} {row['File Name'][:30]:<30} "
+            f"{row['Input']:>4} -> {row['Output']:<4} {row['Status'][:30]:<30} {row['OCR Text'][:20]}"
+        )
+
+    def render(self, force=False):
+        with self.lock:
+            if not self.changed and not force:
+                return
+            self.changed = False
+
+            if self.is_terminal:
+                width = shutil.get_terminal_size().columns - 1
+                output = []
+                if self.drawn_line_count:
+                    # back to the first live row, and clear everything below it
+                    output.append(f"\033[{self.drawn_line_count}F\033[J")
+                output.extend(f"{line[:width]}\n" for line in self.completed_log)
+                self.completed_log.clear()
+
+                lines = [f"{self.completed_count} completed"]
+                lines.extend(
+                    self.format_row(label, row) for label, row in self.live_rows()
+                )
+                output.extend(f"{line[:width]}\n" for line in lines)
+                self.drawn_line_count = len(lines)
+                sys.stdout.write("".join(output))
+                sys.stdout.flush()
+            else:
+                now = time.monotonic()
+                if now - self.last_summary_time < self.summary_interval and not force:
+                    return
+                self.last_summary_time = now
+                active = "; ".join(
+                    f"{label}: {row['File Name'] or row['Directory']} ({row['Status']})"
+                    for label, row in self.live_rows()
+                    if row["Status"] not in ("", "Done")
+                )
+                print(
+                    f"[{str(datetime.now())[11:19]}] {self.completed_count} completed"
+                    + (f", {active}" if active else ""),
+                    flush=True,
+                )
+
+    def close(self):
+        """Stops redrawing the live table after drawing it one last time, anything printed afterwards appears below it"""
+        if not self.live or self.renderer is None:
+            return
+        self.stop_renderer.set()
+        self.renderer.join()
+        self.renderer = None
+        self.render(force=True)
+        self.drawn_line_count = 0
+
+    def worker_queue(self):
+        """
+        Returns a queue for worker processes to forward their updates to, or None if the table isn't live. The queue is
+        passed to forward_updates() in each worker, and to close_worker_queue() once the workers have finished.
+        """
+        if not self.live:
+            return None
+        queue = multiprocessing.Queue()
+        self.queue_listener = threading.Thread(
+            target=self.listen, args=(queue,), daemon=True
+        )
+        self.queue_listener.start()
+        return queue
+
+    def listen(self, queue):
+        while (update := queue.get()) is not None:
+            self.apply_update(*update)
+
+    def close_worker_queue(self, queue):
+        if queue is None:
+            return
+        queue.put(None)
+        self.queue_listener.join()
+        self.queue_listener = None
+        with self.lock:
+            self.worker_rows.clear()
+            self.worker_labels.clear()
+            self.changed = True
+
+    @classmethod
+    def forward_updates(cls, queue):
+        """Called in a worker process before its StatusTable is created, so that its updates are sent on queue"""
+        cls.forward_queue = queue
@@ -0,0 +1,148 @@
+import re
+
+
+class StreamingImageFilter:
+    """Removes or replaces base64 image tags in HTML that is fed in as a stream of chunks.
+
+    An image tag may be split across any number of chunks. Only the start of a tag (up to its base64 data) is ever
+    buffered, the base64 data of images being removed is discarded as it arrives, so memory use does not grow with the
+    size of the images or of the document. With on_image, each base64 image tag is replaced by the text it returns, which
+    means holding the data of one image at a time.
+
+    Usage:
+        image_filter = StreamingImageFilter()
+        for chunk in chunks:
+            out_f.write(image_filter.feed(chunk))
+        out_f.write(image_filter.flush())
+
+    on_image (Callable[[str, str, str], str] | None): Takes the start of an image tag up to and including "base64,", its
+        base64 data, and the rest of the tag up to and including its closing ">", and returns the text to replace the tag
+        with. None removes base64 image tags.
+    """
+
+    tag_start = "<img"
+    data_marker = "base64,"
+    # base64 data ends at the quote that closes the src attribute
+    data_end = re.compile(r"[\"'>\s]")
+
+    def __init__(self, on_image=None):
+        self.on_image = on_image
+        # text of a tag that has started but can't be classified yet
+        self.pending = ""
+        # None outside of base64 image tags, "data" while reading the base64 data of one, "tag_end" while reading the
+        # rest of the tag after its data
+        self.state = None
+        # the parts of the current base64 image tag, only kept when there is an on_image to give them to
+        self.image_tag_start = ""
+        self.image_data = []
+        self.image_tag_end = []
+
+    def feed(self, chunk):
+        """
+        Returns the filtered text of chunk that can be written out now. Text that may belong to an unfinished image tag
+        is held back until the next call to feed or flush.
+        chunk (str): the next chunk of the HTML document
+        """
+        text = self.pending + chunk
+        self.pending = ""
+        output = []
+        position = 0
+
+        while position < len(text):
+            if self.state == "data":
+                match = self.data_end.search(text, position)
+                data_end = len(text) if match is None else match.start()
+                if self.on_image is not None:
+                    self.image_data.append(text[position:data_end])
+                if match is None:
+                    # the whole chunk is image data
+                    return "".join(output)
+                self.state = "tag_end"
+                position = data_end
+                continue
+
+            if self.state == "tag_end":
+                tag_end = text.find(">", position)
+                end = len(text) if tag_end == -1 else tag_end + 1
+                if self.on_image is not None:
+                    self.image_tag_end.append(text[position:end])
+                if tag_end == -1:
+                    return "".join(output)
+                output.append(self._finish_image())
+                position = end
+                continue
+
+            tag_start = text.find(self.tag_start, position)
+            if tag_start == -1:
+                # hold back a partial "<img" at the end of the chunk
+                held = self._partial_tag_start_length(text, position)
+                output.append(text[position : len(text) - held])
+                self.pending = text[len(text) - held :]
+                break
+
+            output.append(text[position:tag_start])
+
+            tag_end = text.find(">", tag_start)
+            data_start = text.find(
+                self.data_marker, tag_start, len(text) if tag_end == -1 else tag_end
+            )
+
+            if data_start != -1:
+                # base64 image, the tag up to and including its closing ">" is removed or replaced
+                self.state = "data"
+                position = data_start + len(self.data_marker)
+                if self.on_image is not None:
+                    self.image_tag_start = text[tag_start:position]
+            elif tag_end != -1:
+                # not a base64 image, keep the tag
+                output.append(text[tag_start : tag_end + 1])
+                position = tag_end + 1
+            else:
+                # not enough of the tag to tell yet
+                self.pending = text[tag_start:]
+                break
+
+        return "".join(output)
+
+    def flush(self):
+        """
+        Returns any text still held back at the end of the document. An unfinished tag is kept as-is, unless it is a base64
+        image tag being removed.
+        """
+        if self.state is None:
+            text = self.pending
+        elif self.on_image is None:
+            text = ""
+        else:
+            text = (
+                self.image_tag_start
+                + "".join(self.image_data)
+                + "".join(self.image_tag_end)
+            )
+        self.pending = ""
+        self.state = None
+        self.image_tag_start = ""
+        self.image_data = []
+        self.image_tag_end = []
+        return text
+
+    def _finish_image(self):
+        self.state = None
+        if self.on_image is None:
+            return ""
+        replacement = self.on_image(
+            self.image_tag_start,
+            "".join(self.image_data),
+            "".join(self.image_tag_end),
+        )
+        self.image_tag_start = ""
+        self.image_data = []
+        self.image_tag_end = []
+        return replacement
+
+    def _partial_tag_start_length(self, text, position):
+        # length of the longest suffix of text[position:] that is a prefix of tag_start
+        for length in range(min(len(self.tag_start) - 1, len(text) - position), 0, -1):
+            if text.endswith(self.tag_start[:length]):
+                return length
+        return 0
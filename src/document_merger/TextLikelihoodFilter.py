@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class TextLikelihoodFilter:
+    """Cheaply estimates whether an image contains text, so that images that almost certainly don't can skip OCR.
+
+    The image is downscaled to at most max_size pixels per side and converted to grayscale, then three statistics are
+    computed with vectorised NumPy operations:
+        contrast: the standard deviation of the pixel intensities. Flat images (blank slides, solid fills) have none.
+        edge density: the fraction of pixels with a strong horizontal or vertical gradient. Text is made of many
+            sharp edges, smooth photos and gradients have few.
+        glyph count: the number of connected components of dark-on-light (or light-on-dark) pixels that are the size of
+            a character. Text produces many, a photo or a diagram of large shapes produces few.
+    An image is only skipped if it fails one of the thresholds, which are deliberately low to avoid skipping real text.
+
+    Call an instance with a PIL image, it returns True if the image may contain text and should be OCR'd.
+
+    max_size (int): longest side of the downscaled image
+    min_contrast (float): minimum standard deviation of the 0-255 grayscale intensities
+    min_edge_density (float): minimum fraction of edge pixels
+    min_glyphs (int): minimum number of character sized components
+    """
+
+    def __init__(
+        self, max_size=256, min_contrast=12, min_edge_density=0.01, min_glyphs=3
+    ):
+        self.max_size = max_size
+        self.min_contrast = min_contrast
+        self.min_edge_density = min_edge_density
+        self.min_glyphs = min_glyphs
+
+    def __call__(self, img):
+        return self.likely_contains_text(img)
+
+    def likely_contains_text(self, img):
+        statistics = self.statistics(img)
+        return (
+            statistics["contrast"] >= self.min_contrast
+            and statistics["edge_density"] >= self.min_edge_density
+            and statistics["glyphs"] >= self.min_glyphs
+        )
+
+    def statistics(self, img):
+        """
+        Returns the contrast, edge density and glyph count of an image.
+        img (PIL.Image.Image): the image
+        """
+        thumbnail = img.convert("L")
+        thumbnail.thumbnail((self.max_size, self.max_size))
+        pixels = np.asarray(thumbnail, dtype=np.int16)
+
+        contrast = float(pixels.std())
+        if pixels.shape[0] < 2 or pixels.shape[1] < 2 or contrast < self.min_contrast:
+            return {"contrast": contrast, "edge_density": 0.0, "glyphs": 0}
+
+        edges = np.zeros(pixels.shape, dtype=bool)
+        edges[:, 1:] |= np.abs(np.diff(pixels, axis=1)) > 48
+        edges[1:, :] |= np.abs(np.diff(pixels, axis=0)) > 48
+        edge_density = float(edges.mean())
+        if edge_density < self.min_edge_density:
+            return {"contrast": contrast, "edge_density": edge_density, "glyphs": 0}
+
+        # ink is whichever side of the mean threshold is in the minority, so light text on a dark slide also counts
+        ink = pixels < pixels.mean()
+        if ink.mean() > 0.5:
+            ink = ~ink
+
+        return {
+            "contrast": contrast,
+            "edge_density": edge_density,
+            "glyphs": self.count_glyphs(ink),
+        }
+
+    def count_glyphs(self, ink):
+        """Counts the 4-connected components of ink that are between 2 pixels and 2% of the image in size"""
+        height, width = ink.shape
+        # label every ink pixel with its flat index, then repeatedly spread the smallest label to ink neighbours until
+        # every component is labelled with the smallest index in it
+        no_label = height * width
+        labels = np.where(
+            ink, np.arange(no_label, dtype=np.int32).reshape(ink.shape), no_label
+        ).astype(np.int32)
+        background = ~ink
+
+        while True:
+            spread = labels.copy()
+            np.minimum(spread[1:, :], labels[:-1, :], out=spread[1:, :])
+            np.minimum(spread[:-1, :], labels[1:, :], out=spread[:-1, :])
+            np.minimum(spread[:, 1:], labels[:, :-1], out=spread[:, 1:])
+            np.minimum(spread[:, :-1], labels[:, 1:], out=spread[:, :-1])
+            spread[background] = no_label
+            # every label is the index of an ink pixel, so following labels to their own label spreads them much faster
+            spread[ink] = spread.ravel()[spread[ink]]
+            if np.array_equal(spread, labels):
+                break
+            labels = spread
+
+        component_sizes = np.bincount(labels[ink])
+        component_sizes = component_sizes[component_sizes > 0]
+        return int(
+            np.count_nonzero(
+                (component_sizes >= 2) & (component_sizes <= 0.02 * no_label)
+            )
+        )
@@ -0,0 +1,62 @@
+import sys
+
+import pytest
+
+from document_merger import DocumentMerger, DocumentMergerConfig
+from document_merger.ConverterRegistry import default_registry
+
+from helpers import txt_to_html
+
+
+@pytest.fixture
+def txt_conversion():
+    """Registers txt_to_html for the test, returns the list of input paths it converts"""
+    converted = []
+
+    def conversion(converter, input_file_path, output_file_path, ocr):
+        converted.append(input_file_path)
+        txt_to_html(converter, input_file_path, output_file_path, ocr)
+
+    default_registry.register("txt", "html", conversion)
+    yield converted
+    del default_registry.conversions[("txt", "html")]
+
+
+@pytest.fixture
+def analysis_path(tmp_path, monkeypatch):
+    """The analysis path of a run, whose subdirectories are merged. DocumentMerger changes directory into it"""
+    path = tmp_path / "analysis"
+    path.mkdir()
+    monkeypatch.chdir(tmp_path)
+    return path
+
+
+@pytest.fixture
+def make_config(tmp_path, analysis_path):
+    def make_config(**config_values):
+        config_values = {
+            "analysis_path": str(analysis_path),
+            "temp_file_path": str(tmp_path / "temp"),
+            "cache_file_path": str(tmp_path / "cache" / "cache.json"),
+            # tesseract is never started by the tests, the path only has to exist
+            "tesseract_path": sys.executable,
+            "print_status_table": False,
+            **config_values,
+        }
+        config = DocumentMergerConfig(**config_values)
+        config.initialise_files()
+        return config
+
+    return make_config
+
+
+@pytest.fixture
+def run_merger(make_config):
+    """Runs DocumentMerger.start with the given config values, returns the merger"""
+
+    def run_merger(**config_values):
+        merger = DocumentMerger(make_config(**config_values))
+        merger.start()
+        return merger
+
+    return run_merger
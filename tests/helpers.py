@@ -0,0 +1,31 @@
+import os
+import html
+
+
+def write_file(path, text):
+    """Writes text to path, making sure that its modification time changes even on file systems with coarse timestamps"""
+    previous_mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    if previous_mtime is not None and os.stat(path).st_mtime_ns == previous_mtime:
+        os.utime(
+            path, ns=(previous_mtime + 1_000_000_000, previous_mtime + 1_000_000_000)
+        )
+
+
+def read_merged(analysis_path, dir_name):
+    with open(
+        os.path.join(analysis_path, dir_name, f"{dir_name}.html"), encoding="utf-8"
+    ) as f:
+        return f.read()
+
+
+def txt_to_html(converter, input_file_path, output_file_path, ocr):
+    # a conversion that is cached like the built-in ones, without their dependencies
+    converter._conversion_setup(input_file_path, output_file_path)
+    with open(input_file_path, encoding="utf-8") as f:
+        text = f.read()
+    with open(output_file_path, "w", encoding="utf-8") as f:
+        f.write(f"<p>{html.escape(text)}</p>")
+    converter._conversion_finish(input_file_path, output_file_path)
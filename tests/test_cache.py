@@ -0,0 +1,83 @@
+import os
+import json
+
+import pytest
+
+from document_merger.Cache import JSONCache, SQLiteCache, SQLiteTable
+
+from helpers import write_file, read_merged
+
+
+def write_json_cache(path, maps):
+    with open(path, "w") as f:
+        json.dump(maps, f)
+
+
+def test_sqlite_table_behaves_like_a_dict(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    table = cache.load()["ocr_map"]
+    assert isinstance(table, SQLiteTable)
+
+    table["a"] = {"text": "a", "ignore": False}
+    table.update({"b": {"text": "b", "ignore": True}, "c": {"text": "c"}})
+    del table["c"]
+    table.delete_many(["b", "not stored"])
+    assert dict(table) == {"a": {"text": "a", "ignore": False}}
+    assert "a" in table and "b" not in table
+    assert len(table) == 1
+    with pytest.raises(KeyError):
+        del table["b"]
+    cache.close()
+
+
+def test_json_cache_is_migrated_to_sqlite_once(tmp_path):
+    json_path = str(tmp_path / "cache.json")
+    sqlite_path = str(tmp_path / "cache.sqlite3")
+    # a cache written before output_hashes existed
+    write_json_cache(
+        json_path,
+        {
+            "ocr_map": {"image": {"text": "hello", "ignore": False}},
+            "file_path_map": {"/in/a.pdf": "/temp/a.html"},
+        },
+    )
+
+    cache = SQLiteCache(sqlite_path, json_path=json_path)
+    maps = cache.load()
+    assert maps["ocr_map"]["image"] == {"text": "hello", "ignore": False}
+    assert dict(maps["file_path_map"]) == {"/in/a.pdf": "/temp/a.html"}
+    assert len(maps["output_hashes"]) == 0
+    maps["file_path_map"]["/in/a.pdf"] = "/temp/b.html"
+    cache.close()
+
+    # the JSON file is left as it was, and isn't copied over later changes
+    with open(json_path) as f:
+        assert json.load(f)["file_path_map"] == {"/in/a.pdf": "/temp/a.html"}
+    cache = SQLiteCache(sqlite_path, json_path=json_path)
+    assert cache.load()["file_path_map"]["/in/a.pdf"] == "/temp/b.html"
+    cache.close()
+
+
+def test_json_cache_without_newer_tables_loads(tmp_path):
+    path = str(tmp_path / "cache.json")
+    write_json_cache(path, {"ocr_map": {"image": {"text": "hello"}}})
+    maps = JSONCache(path).load()
+    assert maps["ocr_map"] == {"image": {"text": "hello"}}
+    assert maps["output_hashes"] == {}
+
+
+def test_run_with_sqlite_reuses_conversions_of_json_run(
+    analysis_path, run_merger, txt_conversion
+):
+    write_file(os.path.join(analysis_path, "course", "notes.txt"), "notes")
+    run_merger(keep_temp_files=True)
+    assert len(txt_conversion) == 1
+
+    # the new merge option means the directory is merged again, but its input isn't converted again
+    txt_conversion.clear()
+    merger = run_merger(
+        cache_backend="sqlite", keep_temp_files=True, create_imageless_version=True
+    )
+    assert txt_conversion == []
+    assert os.path.exists(merger.config.sqlite_cache_path)
+    assert "notes" in read_merged(analysis_path, "course")
@@ -0,0 +1,89 @@
+import os
+import time
+
+from document_merger.Cache import JSONCache
+from document_merger.CacheMaintenance import CacheMaintenance
+
+from helpers import write_file
+
+
+def empty_maps():
+    return {table: {} for table in JSONCache.tables}
+
+
+def test_prune_removes_entries_of_deleted_files(tmp_path):
+    input_path = str(tmp_path / "a.txt")
+    output_path = str(tmp_path / "temp" / "a.html")
+    deleted_output_path = str(tmp_path / "temp" / "b.html")
+    write_file(input_path, "a")
+    write_file(output_path, "<p>a</p>")
+
+    maps = empty_maps()
+    maps["file_path_map"].update(
+        {input_path: output_path, str(tmp_path / "b.txt"): deleted_output_path}
+    )
+    maps["processed_file_hashes"].update(
+        {"hash a": output_path, "hash b": deleted_output_path}
+    )
+    maps["output_hashes"].update(
+        {
+            output_path: "hash a",
+            deleted_output_path: "hash b",
+            # written, then overwritten by a conversion to another output
+            str(tmp_path / "unmapped.html"): "hash c",
+        }
+    )
+    maps["ocr_map"]["image"] = {"text": "", "ignore": False}
+    maps["perceptual_image_keys"].update({"10x10-00": "image", "10x10-ff": "gone"})
+
+    removed = CacheMaintenance(JSONCache(str(tmp_path / "cache.json")), maps).prune()
+    assert removed == {
+        "file_path_map": 1,
+        "processed_file_hashes": 1,
+        "output_hashes": 2,
+        "perceptual_image_keys": 1,
+    }
+    assert maps["file_path_map"] == {input_path: output_path}
+    assert maps["processed_file_hashes"] == {"hash a": output_path}
+    assert maps["output_hashes"] == {output_path: "hash a"}
+    assert maps["perceptual_image_keys"] == {"10x10-00": "image"}
+
+
+def test_evict_removes_entries_unused_for_max_age_days(tmp_path):
+    now = int(time.time())
+    maps = empty_maps()
+    maps["ocr_map"].update(
+        {
+            "old": {"text": "old", "ignore": False},
+            "recent": {"text": "recent", "ignore": False},
+            # decided on by the user, can't be recreated
+            "seen": {"text": "", "ignore": True, "seen": True},
+        }
+    )
+    maps["last_used"].update(
+        {
+            "ocr_map/old": now - 10 * 24 * 60 * 60,
+            "ocr_map/recent": now,
+            "ocr_map/seen": now - 10 * 24 * 60 * 60,
+        }
+    )
+
+    removed = CacheMaintenance(JSONCache(str(tmp_path / "cache.json")), maps).evict(
+        max_age_days=5
+    )
+    assert removed == {"ocr_map": 1, "last_used": 1}
+    assert set(maps["ocr_map"]) == {"recent", "seen"}
+
+
+def test_run_with_cache_maintenance_keeps_used_entries(
+    analysis_path, run_merger, txt_conversion
+):
+    notes_path = os.path.join(analysis_path, "course", "notes.txt")
+    write_file(notes_path, "notes")
+    run_merger(keep_temp_files=True, prune_cache=True)
+
+    txt_conversion.clear()
+    write_file(os.path.join(analysis_path, "other", "copy.txt"), "notes")
+    merger = run_merger(keep_temp_files=True, prune_cache=True)
+    assert txt_conversion == []
+    assert os.path.abspath(notes_path) in merger.converter.file_path_map
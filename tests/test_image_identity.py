@@ -0,0 +1,44 @@
+from io import BytesIO
+
+import pytest
+
+from document_merger.ImageIdentity import ImageIdentity
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def slide(size=(320, 240)):
+    img = Image.new("L", size, 255)
+    for x in range(40, 280):
+        for y in range(100, 140):
+            img.putpixel((x, y), 0)
+    return img
+
+
+def reencoded(img, format, **options):
+    buffer = BytesIO()
+    img.save(buffer, format=format, **options)
+    return Image.open(BytesIO(buffer.getvalue()))
+
+
+def test_reencoded_image_has_the_same_perceptual_key():
+    identity = ImageIdentity()
+    img = slide()
+    assert identity.perceptual_key(
+        reencoded(img, "JPEG", quality=30)
+    ) == identity.perceptual_key(img)
+
+
+def test_resized_image_has_a_different_perceptual_key():
+    identity = ImageIdentity()
+    img = slide()
+    resized = img.resize((640, 480))
+    assert identity.perceptual_key(resized) != identity.perceptual_key(img)
+    assert identity.perceptual_key(resized).startswith("640x480-")
+
+
+def test_content_key_ignores_base64_formatting():
+    identity = ImageIdentity()
+    padded = identity.decode("aGVsbG8=")
+    assert identity.decode("aGVs\nbG8") == padded
+    assert identity.content_key(padded) == identity.content_key(b"hello")
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from helpers import write_file, read_merged
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def cache_backend(request):
+    return request.param
+
+
+@pytest.mark.parametrize("keep_temp_files", [True, False])
+@pytest.mark.parametrize("worker_count", [1, 2])
+def test_edited_input_is_merged_again(
+    analysis_path,
+    run_merger,
+    txt_conversion,
+    cache_backend,
+    keep_temp_files,
+    worker_count,
+):
+    notes_path = os.path.join(analysis_path, "course", "notes.txt")
+    write_file(notes_path, "first version")
+    write_file(os.path.join(analysis_path, "course", "other.txt"), "other notes")
+    config_values = {
+        "cache_backend": cache_backend,
+        "keep_temp_files": keep_temp_files,
+        "worker_count": worker_count,
+    }
+
+    run_merger(**config_values)
+    assert "first version" in read_merged(analysis_path, "course")
+
+    write_file(notes_path, "second version")
+    run_merger(**config_values)
+    merged = read_merged(analysis_path, "course")
+    assert "second version" in merged
+    assert "first version" not in merged
+    assert "other notes" in merged
+
+
+def test_unchanged_inputs_are_not_converted_again(
+    analysis_path, run_merger, txt_conversion, cache_backend
+):
+    write_file(os.path.join(analysis_path, "a", "notes.txt"), "a notes")
+    write_file(os.path.join(analysis_path, "b", "notes.txt"), "b notes")
+
+    run_merger(cache_backend=cache_backend, keep_temp_files=True)
+    assert len(txt_conversion) == 2
+
+    # only the edited file of b is converted, a is unchanged and isn't merged again
+    write_file(os.path.join(analysis_path, "b", "notes.txt"), "new b notes")
+    txt_conversion.clear()
+    run_merger(cache_backend=cache_backend, keep_temp_files=True)
+    assert txt_conversion == [os.path.join(analysis_path, "b", "notes.txt")]
+    assert "a notes" in read_merged(analysis_path, "a")
+    assert "new b notes" in read_merged(analysis_path, "b")
+
+
+def test_copy_of_converted_file_reuses_its_output(
+    analysis_path, run_merger, txt_conversion
+):
+    write_file(os.path.join(analysis_path, "a", "notes.txt"), "shared notes")
+    run_merger(keep_temp_files=True)
+
+    write_file(os.path.join(analysis_path, "b", "copy.txt"), "shared notes")
+    txt_conversion.clear()
+    run_merger(keep_temp_files=True)
+    assert txt_conversion == []
+    assert "shared notes" in read_merged(analysis_path, "b")
+
+
+def test_reverted_input_is_merged_with_its_content(
+    analysis_path, run_merger, txt_conversion
+):
+    notes_path = os.path.join(analysis_path, "course", "notes.txt")
+    for text in ("first version", "second version", "first version"):
+        write_file(notes_path, text)
+        run_merger(keep_temp_files=True)
+        assert f"<p>{text}</p>" in read_merged(analysis_path, "course")
@@ -0,0 +1,63 @@
+import os
+import sys
+
+from document_merger import DocumentMerger
+
+from helpers import write_file, read_merged
+
+
+class ScriptedWatcher:
+    """Makes each wait for changes run the next step, then stops watching"""
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+
+    def wait_for_changes(self, debounce):
+        if not self.steps:
+            raise KeyboardInterrupt
+        return self.steps.pop(0)()
+
+    def close(self):
+        pass
+
+
+def test_run_reports_and_clears_instrumentation(
+    analysis_path, run_merger, txt_conversion, capsys
+):
+    write_file(os.path.join(analysis_path, "course", "notes.txt"), "notes")
+    trace_path = os.path.join(analysis_path.parent, "trace.json")
+
+    merger = run_merger(trace_path=trace_path)
+    assert "Stage timings:" in capsys.readouterr().out
+    assert os.path.exists(trace_path)
+    assert merger.converter.instrumentation.events == []
+
+
+def test_watch_clears_instrumentation_after_each_change(
+    analysis_path, make_config, txt_conversion, monkeypatch, capsys
+):
+    notes_path = os.path.join(analysis_path, "course", "notes.txt")
+    write_file(notes_path, "first version")
+    merger = DocumentMerger(make_config(instrumentation=True))
+    event_counts = []
+
+    def edit_notes():
+        event_counts.append(len(merger.converter.instrumentation.events))
+        write_file(notes_path, "second version")
+        return {(notes_path, False)}
+
+    def check_events():
+        event_counts.append(len(merger.converter.instrumentation.events))
+        return set()
+
+    monkeypatch.setattr(
+        # the package's DocumentMerger is the class, the module is only in sys.modules
+        sys.modules["document_merger.DocumentMerger"],
+        "create_file_watcher",
+        lambda config, is_excluded: ScriptedWatcher([edit_notes, check_events]),
+    )
+    merger.watch()
+
+    assert event_counts == [0, 0]
+    assert capsys.readouterr().out.count("Stage timings:") == 2
+    assert "second version" in read_merged(analysis_path, "course")
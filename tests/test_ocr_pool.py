@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from document_merger.OCRPool import OCRPool
+
+
+def test_identical_images_are_ocrd_once():
+    calls = []
+
+    def ocr(image):
+        calls.append(image)
+        return f"text of {image}"
+
+    pool = OCRPool(2)
+    futures = [pool.submit("hash", ocr, "image") for _ in range(3)]
+    assert [future.result() for future in futures] == ["text of image"] * 3
+    assert calls == ["image"]
+    pool.shutdown()
+
+
+def test_failed_job_is_run_again_for_the_next_request():
+    attempts = []
+
+    def flaky_ocr(image):
+        attempts.append(image)
+        if len(attempts) == 1:
+            raise OSError("tesseract failed")
+        return f"text of {image}"
+
+    pool = OCRPool(1)
+    with pytest.raises(OSError):
+        pool.submit("hash", flaky_ocr, "image").result()
+
+    assert pool.submit("hash", flaky_ocr, "image").result() == "text of image"
+    assert pool.submit("hash", flaky_ocr, "image").result() == "text of image"
+    assert len(attempts) == 2
+    pool.shutdown()
+
+
+def test_requests_waiting_on_a_failed_job_see_its_error():
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing_ocr(image):
+        started.set()
+        release.wait(timeout=5)
+        raise OSError("tesseract failed")
+
+    pool = OCRPool(1)
+    first = pool.submit("hash", failing_ocr, "image")
+    started.wait(timeout=5)
+    waiting = pool.submit("hash", failing_ocr, "image")
+    assert waiting is first
+
+    release.set()
+    with pytest.raises(OSError):
+        waiting.result()
+    pool.shutdown()
+    assert not pool.is_submitted("hash")
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from document_merger.OfficeConverterPool import (
+    FakeOfficeProcess,
+    OfficeConversionError,
+    OfficeConverterPool,
+)
+
+
+def test_process_is_started_once_and_reused(tmp_path):
+    pool = OfficeConverterPool(1, job_timeout=5, process_factory=FakeOfficeProcess)
+    for name in ("a", "b", "c"):
+        assert pool.convert(
+            str(tmp_path / f"{name}.pptx"), str(tmp_path / f"{name}.pdf")
+        )
+        assert (tmp_path / f"{name}.pdf").read_bytes().startswith(b"%PDF")
+
+    (process,) = pool.processes
+    assert process.starts == 1
+    assert process.conversions == 3
+    pool.shutdown()
+    assert not process.is_healthy()
+
+
+def test_hung_conversion_is_retried_on_a_restarted_process(tmp_path):
+    attempts = []
+
+    def hang_once(input_file_path):
+        attempts.append(input_file_path)
+        return len(attempts) == 1
+
+    pool = OfficeConverterPool(
+        1,
+        job_timeout=0.1,
+        process_factory=lambda: FakeOfficeProcess(hang_on=hang_once),
+    )
+    assert pool.convert(str(tmp_path / "a.pptx"), str(tmp_path / "a.pdf"))
+    assert len(attempts) == 2
+    assert pool.processes[0].starts == 2
+
+
+def test_conversion_that_always_hangs_raises(tmp_path):
+    pool = OfficeConverterPool(
+        1,
+        job_timeout=0.1,
+        process_factory=lambda: FakeOfficeProcess(hang_on=lambda path: True),
+    )
+    with pytest.raises(OfficeConversionError, match="timed out"):
+        pool.convert(str(tmp_path / "a.pptx"), str(tmp_path / "a.pdf"))
+
+
+def test_threads_sharing_a_pool_convert_on_separate_processes(tmp_path):
+    # both conversions have to be running at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait_for_other_conversion(input_file_path):
+        barrier.wait()
+        return False
+
+    pool = OfficeConverterPool(
+        2,
+        job_timeout=5,
+        process_factory=lambda: FakeOfficeProcess(hang_on=wait_for_other_conversion),
+    )
+
+    threads = [
+        threading.Thread(
+            target=pool.convert,
+            args=(str(tmp_path / f"{name}.pptx"), str(tmp_path / f"{name}.pdf")),
+        )
+        for name in ("a", "b")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not barrier.broken
+    assert [process.conversions for process in pool.processes] == [1, 1]
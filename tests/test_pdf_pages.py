@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+from document_merger import Converter
+
+
+@pytest.mark.parametrize("cpu_count", [1, 8])
+@pytest.mark.parametrize("worker_count", [1, 2, 16])
+def test_page_workers_share_cpus_with_file_workers(
+    make_config, monkeypatch, cpu_count, worker_count
+):
+    monkeypatch.setattr(os, "cpu_count", lambda: cpu_count)
+    converter = Converter(make_config(worker_count=worker_count))
+    # at most one process per CPU across every file being converted, but always at least one
+    assert converter.pdf_page_worker_count() == max(1, cpu_count // worker_count)
+    converter.close()
+
+
+def test_page_workers_can_be_set(make_config):
+    converter = Converter(make_config(worker_count=4, pdf_page_workers=3))
+    assert converter.pdf_page_worker_count() == 3
+    converter.close()
@@ -0,0 +1,67 @@
+import os
+import importlib.metadata
+
+from document_merger.ConverterRegistry import ConverterRegistry, copy_file
+
+from helpers import write_file, read_merged
+
+
+class FakeEntryPoint:
+    def __init__(self, name, register):
+        self.name = name
+        self.register = register
+
+    def load(self):
+        return self.register
+
+
+def test_conversion_registered_by_name_is_imported_when_first_used():
+    registry = ConverterRegistry()
+    registry.entry_points_loaded = True
+    registry.register("HTM", "html", "document_merger.ConverterRegistry:copy_file")
+
+    assert registry.conversions[("htm", "html")] == (
+        "document_merger.ConverterRegistry:copy_file"
+    )
+    assert registry.get("htm", "HTML") is copy_file
+    assert registry.conversions[("htm", "html")] is copy_file
+    assert registry.get("md", "html") is None
+
+
+def test_entry_points_are_loaded_once_and_broken_plugins_are_skipped(
+    monkeypatch, capsys
+):
+    loads = []
+
+    def register(registry):
+        loads.append(registry)
+        registry.register("md", "html", copy_file)
+
+    def broken_register(registry):
+        raise ImportError("missing dependency")
+
+    monkeypatch.setattr(
+        importlib.metadata,
+        "entry_points",
+        lambda group: [
+            FakeEntryPoint("broken", broken_register),
+            FakeEntryPoint("markdown", register),
+        ],
+    )
+    registry = ConverterRegistry()
+    registry.register("html", "html", copy_file)
+
+    assert registry.input_types() == ("html", "md")
+    assert registry.get("md", "html") is copy_file
+    assert len(loads) == 1
+    assert "Couldn't load converter plugin 'broken'" in capsys.readouterr().out
+
+
+def test_registered_input_type_is_merged(analysis_path, run_merger, txt_conversion):
+    write_file(os.path.join(analysis_path, "course", "notes.txt"), "plain <notes>")
+    write_file(os.path.join(analysis_path, "course", "slides.html"), "<p>slides</p>")
+
+    run_merger()
+    merged = read_merged(analysis_path, "course")
+    assert "<p>plain &lt;notes&gt;</p>" in merged
+    assert "<p>slides</p>" in merged
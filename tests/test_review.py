@@ -0,0 +1,16 @@
+import os
+
+from helpers import write_file
+
+
+def test_review_images_outlive_temporary_files(analysis_path, run_merger):
+    write_file(os.path.join(analysis_path, "course", "notes.html"), "<p>notes</p>")
+    merger = run_merger(show_image=True, deferred_review=True, keep_temp_files=False)
+    review_path = merger.config.review_path
+    assert not os.path.exists(merger.config.temp_file_path)
+    assert os.path.isdir(review_path)
+
+    # an image queued for review is kept by the next run
+    write_file(os.path.join(review_path, "image.png"), "queued image")
+    run_merger(show_image=True, deferred_review=True, keep_temp_files=False)
+    assert os.path.exists(os.path.join(review_path, "image.png"))
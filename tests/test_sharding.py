@@ -0,0 +1,62 @@
+import os
+
+from document_merger.ShardedOutput import ShardedOutput
+
+from helpers import write_file
+
+
+def part_names(analysis_path, dir_name):
+    return set(os.listdir(os.path.join(analysis_path, dir_name, f"{dir_name} parts")))
+
+
+def read_part(analysis_path, dir_name, name):
+    with open(
+        os.path.join(analysis_path, dir_name, f"{dir_name} parts", name),
+        encoding="utf-8",
+    ) as f:
+        return f.read()
+
+
+def test_size_plan_keeps_parts_within_max_size(tmp_path):
+    sharded_output = ShardedOutput(str(tmp_path / "course.html"), "size", 100)
+    sizes = [30, 30, 30, 30, 150, 10]
+    source_paths = [f"file {i}.pdf" for i in range(len(sizes))]
+
+    parts = sharded_output.plan(sizes, source_paths)
+    assert [i for part in parts for i in part] == list(range(len(sizes)))
+    for part in parts:
+        # only a single file may be larger than a part
+        assert len(part) == 1 or sum(sizes[i] for i in part) <= 100
+
+
+def test_file_plan_has_a_part_per_file(tmp_path):
+    sharded_output = ShardedOutput(str(tmp_path / "course.html"), "file", 100)
+    assert sharded_output.plan([500, 1, 1], ["a", "b", "c"]) == [[0], [1], [2]]
+
+
+def test_only_the_part_of_an_edited_file_is_written_again(
+    analysis_path, run_merger, txt_conversion
+):
+    for name in ("a", "b", "c"):
+        write_file(os.path.join(analysis_path, "course", f"{name}.txt"), f"{name} v1")
+    config_values = {"merge_shards": "file", "keep_temp_files": True}
+
+    run_merger(**config_values)
+    first_parts = part_names(analysis_path, "course")
+    assert len(first_parts) == 3
+
+    write_file(os.path.join(analysis_path, "course", "b.txt"), "b v2")
+    run_merger(**config_values)
+    second_parts = part_names(analysis_path, "course")
+    # the old part of b is removed, the parts of a and c are kept
+    assert len(second_parts) == 3
+    assert len(first_parts & second_parts) == 2
+    (new_part,) = second_parts - first_parts
+    assert "b v2" in read_part(analysis_path, "course", new_part)
+
+    with open(
+        os.path.join(analysis_path, "course", "course.html"), encoding="utf-8"
+    ) as f:
+        table_of_contents = f.read()
+    for name in second_parts:
+        assert name.replace(" ", "%20") in table_of_contents
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from document_merger.ConverterRegistry import default_registry
+
+from helpers import txt_to_html, write_file
+
+
+@pytest.fixture
+def two_stage_txt_conversion():
+    """Registers a txt to html conversion that, like PDF to HTML, finishes an intermediate stage first"""
+
+    def conversion(converter, input_file_path, output_file_path, ocr):
+        intermediate_path = converter.change_ext(output_file_path, "md")
+        txt_to_html(converter, input_file_path, intermediate_path, ocr)
+        txt_to_html(converter, intermediate_path, output_file_path, ocr)
+
+    default_registry.register("txt", "html", conversion)
+    yield
+    del default_registry.conversions[("txt", "html")]
+
+
+@pytest.mark.parametrize("worker_count", [1, 2])
+def test_live_table_counts_each_file_once(
+    analysis_path, run_merger, two_stage_txt_conversion, worker_count
+):
+    write_file(os.path.join(analysis_path, "a", "notes.txt"), "a notes")
+    write_file(os.path.join(analysis_path, "a", "more.txt"), "more a notes")
+    write_file(os.path.join(analysis_path, "b", "notes.txt"), "b notes")
+
+    merger = run_merger(
+        print_status_table=True,
+        status_mode="live",
+        worker_count=worker_count,
+        keep_temp_files=True,
+    )
+    assert merger.status_table.completed_count == 3
+
+    # a's inputs are reused from the first run, b's edited input is converted again
+    write_file(os.path.join(analysis_path, "a", "copy.txt"), "a notes")
+    write_file(os.path.join(analysis_path, "b", "notes.txt"), "new b notes")
+    merger = run_merger(
+        print_status_table=True,
+        status_mode="live",
+        worker_count=worker_count,
+        keep_temp_files=True,
+    )
+    assert merger.status_table.completed_count == 4
@@ -0,0 +1,97 @@
+import os
+import sys
+
+import pytest
+
+from document_merger.StreamingImageFilter import StreamingImageFilter
+
+from helpers import write_file
+
+DOCUMENT = (
+    "<p>before</p>"
+    '<img alt="logo" src="data:image/png;base64,iVBORw0KGgoAAAANSUhEUg==" width="10">'
+    "<p>between &lt;img</p>"
+    '<img src="diagram.png">'
+    "<img src='data:image/jpeg;base64,/9j/4AAQSkZJRg=='/>"
+    "<p>after <im</p>"
+)
+
+
+def filter_in_chunks(document, chunk_size, on_image=None):
+    image_filter = StreamingImageFilter(on_image=on_image)
+    output = [
+        image_filter.feed(document[i : i + chunk_size])
+        for i in range(0, len(document), chunk_size)
+    ]
+    output.append(image_filter.flush())
+    return "".join(output)
+
+
+def filter_split_at(document, split, on_image=None):
+    image_filter = StreamingImageFilter(on_image=on_image)
+    return (
+        image_filter.feed(document[:split])
+        + image_filter.feed(document[split:])
+        + image_filter.flush()
+    )
+
+
+def replace_with_data(tag_start, data, tag_end):
+    return f"[{tag_start}|{data}|{tag_end}]"
+
+
+def test_base64_images_are_removed():
+    assert filter_in_chunks(DOCUMENT, len(DOCUMENT)) == (
+        "<p>before</p><p>between &lt;img</p>" '<img src="diagram.png"><p>after <im</p>'
+    )
+
+
+def test_base64_images_are_replaced_with_on_image():
+    assert filter_in_chunks(DOCUMENT, len(DOCUMENT), replace_with_data) == (
+        "<p>before</p>"
+        '[<img alt="logo" src="data:image/png;base64,|iVBORw0KGgoAAAANSUhEUg==|" width="10">]'
+        "<p>between &lt;img</p>"
+        '<img src="diagram.png">'
+        "[<img src='data:image/jpeg;base64,|/9j/4AAQSkZJRg==|'/>]"
+        "<p>after <im</p>"
+    )
+
+
+@pytest.mark.parametrize("on_image", [None, replace_with_data])
+def test_output_is_the_same_wherever_the_chunks_are_split(on_image):
+    expected = filter_in_chunks(DOCUMENT, len(DOCUMENT), on_image)
+    for split in range(len(DOCUMENT) + 1):
+        assert filter_split_at(DOCUMENT, split, on_image) == expected, split
+    for chunk_size in range(1, 12):
+        assert filter_in_chunks(DOCUMENT, chunk_size, on_image) == expected
+
+
+def test_partial_tag_start_at_the_end_of_the_document_is_kept():
+    assert filter_in_chunks("<p>text</p><im", 3) == "<p>text</p><im"
+    assert filter_in_chunks('<p>text</p><img src="a.p', 3) == '<p>text</p><img src="a.p'
+
+
+def test_unfinished_base64_image_at_the_end_of_the_document():
+    document = '<p>text</p><img src="data:image/png;base64,iVBOR'
+    assert filter_in_chunks(document, 4) == "<p>text</p>"
+    assert filter_in_chunks(document, 4, replace_with_data) == document
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64 * 1024])
+def test_imageless_version_of_merged_file(
+    analysis_path, run_merger, monkeypatch, chunk_size
+):
+    monkeypatch.setattr(
+        sys.modules["document_merger.DocumentMerger"], "MERGE_CHUNK_SIZE", chunk_size
+    )
+    write_file(os.path.join(analysis_path, "course", "notes.html"), DOCUMENT)
+
+    run_merger(create_imageless_version=True)
+    with open(
+        os.path.join(analysis_path, "course", "course (Imageless).html"),
+        encoding="utf-8",
+    ) as f:
+        imageless = f.read()
+    assert "<p>before</p><p>between &lt;img</p>" in imageless
+    assert '<img src="diagram.png"><p>after <im</p>' in imageless
+    assert "base64" not in imageless
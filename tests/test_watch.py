@@ -0,0 +1,38 @@
+import os
+import shutil
+
+from document_merger import DocumentMerger
+from document_merger.FileWatcher import PollingWatcher
+
+from helpers import write_file
+
+
+def test_removed_directory_has_no_subdirectories(analysis_path, make_config):
+    merger = DocumentMerger(make_config())
+    write_file(os.path.join(analysis_path, "course", "notes.html"), "<p>notes</p>")
+    assert merger.discovery.subdirectories(str(analysis_path)) == ["course"]
+
+    shutil.rmtree(analysis_path)
+    assert merger.discovery.subdirectories(str(analysis_path)) == []
+
+
+def test_changes_after_analysis_path_is_removed(analysis_path, make_config):
+    merger = DocumentMerger(make_config())
+    write_file(os.path.join(analysis_path, "course", "notes.html"), "<p>notes</p>")
+
+    shutil.rmtree(analysis_path)
+    changes = {
+        (str(analysis_path), True),
+        (os.path.join(analysis_path, "course", "notes.html"), False),
+    }
+    assert merger.affected_directories(changes) == []
+
+
+def test_polling_watcher_reports_removed_files(tmp_path):
+    write_file(os.path.join(tmp_path, "course", "notes.html"), "<p>notes</p>")
+    watcher = PollingWatcher(str(tmp_path), lambda path: False, interval=0)
+
+    shutil.rmtree(tmp_path / "course")
+    assert watcher.changes(timeout=0) == {
+        (os.path.join(tmp_path, "course", "notes.html"), False)
+    }